@@ -0,0 +1,215 @@
+import numpy as np
+
+from atalanta_decode import AtalantaDecoder
+from atalanta_encode import AtalantaEncoder
+from bitpack import unpack_varwidth
+from probability_table import ProbabilityModel
+from table_store import TABLE_ENTRIES
+
+# Single-pass Atalanta: encoder and decoder start from the same initial table and
+# rebuild it from the values coded so far every UPDATE_INTERVAL symbols, so no table
+# is searched or transmitted, only the id of the initial table.
+VALUE_RANGE = 256  # Atalanta codes 8-bit values
+PROB_TOTAL = 1024  # The coder scales t_low/t_high by 2^10
+UPDATE_INTERVAL = 256
+COUNT_LIMIT = 1 << 16  # The running counts are halved past this, so the table follows the stream
+
+# Initial tables by id. Each is the table built from a prior histogram: flat, or
+# halving with every doubling of the distance from the mode (0 for ReLU activations,
+# 128 for the shifted int8 weights). The priors are weak (a few hundred counts) so the
+# first updates already follow the layer.
+INITIAL_TABLES = ('uniform', 'activations', 'weights')
+DEFAULT_TABLE_IDS = {'weights': INITIAL_TABLES.index('weights'), 'activations': INITIAL_TABLES.index('activations')}
+TABLE_ID_BITS = (len(INITIAL_TABLES) - 1).bit_length()
+
+
+def prior_histogram(name):
+    # Integer value counts the initial table `name` is built from
+    if name == 'uniform':
+        return np.ones(VALUE_RANGE, dtype=np.int64)
+    values = np.arange(VALUE_RANGE)
+    if name == 'activations':
+        distance = values
+    elif name == 'weights':
+        distance = np.abs(values - VALUE_RANGE // 2)
+    else:
+        raise ValueError(f"Unknown initial table {name}, expected one of {INITIAL_TABLES}.")
+    return np.array([max(64 >> int(d).bit_length(), 1) for d in distance], dtype=np.int64)
+
+def split_boundaries(histogram, rows=TABLE_ENTRIES):
+    """
+    Splits the value range into table rows like a binary tree: starting from one row
+    over all values, the row holding the most values is halved until there are `rows`
+    rows. Every row is a power-of-two aligned range, so its offsets use exactly
+    log2(width) bits.
+
+    Ties go to the wider, then the lower row, so the split only depends on the counts
+    and the decoder repeats it exactly.
+
+    Args:
+        histogram (np.ndarray): The count of every value.
+        rows (int): How many rows the table gets.
+
+    Returns:
+        list: (v_min, width) of every row, in value order.
+    """
+    cumulative = np.concatenate(([0], np.cumsum(histogram))).tolist()
+    leaves = [(0, len(histogram))]
+    while len(leaves) < rows:
+        splittable = [i for i, (_, width) in enumerate(leaves) if width > 1]
+        if not splittable:
+            break
+        i = max(splittable, key=lambda i: (cumulative[leaves[i][0] + leaves[i][1]] - cumulative[leaves[i][0]],
+                                           leaves[i][1], -leaves[i][0]))
+        v_min, width = leaves[i]
+        half = width // 2
+        leaves[i:i + 1] = [(v_min, half), (v_min + half, half)]
+    return leaves
+
+
+class AdaptiveModel:
+    """
+    The probability table an adaptive encoder and decoder keep in step.
+
+    The model only changes in `update`, from values both sides know, with integer
+    arithmetic; the decoder calling `update` with the same values at the same symbol
+    gets the same tables as the encoder.
+
+    Attributes:
+        histogram (np.ndarray): Running count of every value, seeded with the prior of
+            the initial table and halved whenever it passes COUNT_LIMIT.
+        boundaries (list): (v_min, width) of every table row.
+        update_boundaries (bool): Whether `update` also re-splits the rows; otherwise
+            only the probabilities of the initial rows follow the counts.
+    """
+    __slots__ = ('histogram', 'boundaries', 'update_boundaries')
+
+    def __init__(self, table_id=0, update_boundaries=False):
+        """
+        Raises:
+            ValueError: If `table_id` is not an id of INITIAL_TABLES.
+        """
+        if not 0 <= table_id < len(INITIAL_TABLES):
+            raise ValueError(f"Unknown initial table id {table_id}, expected 0 to {len(INITIAL_TABLES) - 1}.")
+        self.histogram = prior_histogram(INITIAL_TABLES[table_id])
+        self.boundaries = split_boundaries(self.histogram)
+        self.update_boundaries = update_boundaries
+
+    def table(self):
+        """
+        Builds the current probability table: contiguous ranges summing to PROB_TOTAL,
+        every row at least one unit wide (any row may still be used), proportional to
+        the row counts, with the largest row absorbing the rounding.
+
+        Returns:
+            list: The table rows, with the TABLE_FIELDS keys.
+        """
+        starts = np.array([v_min for v_min, _ in self.boundaries])
+        counts = np.add.reduceat(self.histogram, starts)
+        freq = 1 + counts * (PROB_TOTAL - counts.size) // counts.sum()
+        freq[np.argmax(counts)] += PROB_TOTAL - freq.sum()
+        bounds = np.concatenate(([0], np.cumsum(freq))).tolist()
+        return [{'v_min': v_min, 'v_max': v_min + width - 1, 'OL': (width - 1).bit_length(),
+                 't_low': bounds[i], 't_high': bounds[i + 1]} for i, (v_min, width) in enumerate(self.boundaries)]
+
+    def update(self, values):
+        # Counts the coded values (0 to VALUE_RANGE - 1) into the model
+        self.histogram += np.bincount(values, minlength=VALUE_RANGE)
+        if self.histogram.sum() > COUNT_LIMIT:
+            self.histogram = (self.histogram + 1) >> 1
+        if self.update_boundaries:
+            self.boundaries = split_boundaries(self.histogram)
+
+
+class AdaptiveAtalantaEncoder(AtalantaEncoder):
+    """
+    An Atalanta encoder that needs no table up front: it codes the stream in one pass,
+    rebuilding its table from the values coded so far every `interval` symbols.
+
+    Attributes:
+        model (AdaptiveModel): The table model shared with the decoder.
+        interval (int): Symbols coded between table updates.
+    """
+    __slots__ = ('model', 'interval')
+
+    def __init__(self, table_id=0, interval=UPDATE_INTERVAL, update_boundaries=False):
+        """
+        Args:
+            table_id (int): Id of the initial table (see INITIAL_TABLES).
+            interval (int): Symbols coded between table updates.
+            update_boundaries (bool): Whether the row boundaries are re-split too.
+        """
+        self.model = AdaptiveModel(table_id, update_boundaries)
+        self.interval = interval
+        super().__init__(self.model.table())
+
+    def encode(self, input_stream):
+        """
+        Encodes an input stream of symbols, updating the table every `interval` symbols.
+
+        Raises:
+            ValueError: If a symbol is outside 0 to VALUE_RANGE - 1.
+        """
+        values = np.asarray(input_stream, dtype=np.int64).ravel()
+        for start in range(0, values.size, self.interval):
+            chunk = values[start:start + self.interval]
+            self.PCNT = ProbabilityModel(self.model.table())
+            self.encode_symbols(chunk.tolist())
+            self.model.update(chunk)
+        self.flush()
+
+    def count(self, input_stream):
+        # The table depends on the coded values, so the bits are counted on a full encode
+        symbol_bits, underflow_bits, offset_bits = len(self.CODE_out), self.UBC_events, sum(self.OFS_r)
+        self.encode(input_stream)
+        return len(self.CODE_out) - symbol_bits, self.UBC_events - underflow_bits, sum(self.OFS_r) - offset_bits
+
+
+class AdaptiveAtalantaDecoder(AtalantaDecoder):
+    """
+    Decodes the streams of an `AdaptiveAtalantaEncoder` with the same settings.
+
+    The offsets of every `interval` symbols are read as soon as their rows are decoded,
+    so the model sees the same values at the same symbol as the encoder's did.
+
+    Attributes:
+        model (AdaptiveModel): The table model shared with the encoder.
+        interval (int): Symbols decoded between table updates.
+    """
+    __slots__ = ('model', 'interval')
+
+    def __init__(self, table_id=0, interval=UPDATE_INTERVAL, update_boundaries=False):
+        self.model = AdaptiveModel(table_id, update_boundaries)
+        self.interval = interval
+        super().__init__(self.model.table())
+
+    def decode_values(self, symbol_bits, offset_bits, n_symbols):
+        """
+        Decodes the values of a stream.
+
+        Args:
+            symbol_bits (list or np.ndarray): The symbol stream as 0/1 bits.
+            offset_bits (np.ndarray): The offset stream as 0/1 bits.
+            n_symbols (int): How many values were encoded.
+
+        Returns:
+            np.ndarray: The values (int64).
+
+        Raises:
+            ValueError: If the offset stream is shorter than the decoded rows require.
+        """
+        offset_bits = np.asarray(offset_bits, dtype=np.uint8)
+        values = np.empty(n_symbols, dtype=np.int64)
+        self.load(symbol_bits)
+        position = 0
+        for start in range(0, n_symbols, self.interval):
+            self.PCNT = self.model.table()
+            rows = np.asarray(self.next_rows(min(self.interval, n_symbols - start)), dtype=np.int64)
+            v_min = np.array([entry['v_min'] for entry in self.PCNT], dtype=np.int64)
+            OL = np.array([entry['OL'] for entry in self.PCNT], dtype=np.int64)
+            widths = OL[rows]
+            chunk = v_min[rows] + unpack_varwidth(offset_bits, widths, position).astype(np.int64)
+            position += int(widths.sum())
+            values[start:start + chunk.size] = chunk
+            self.model.update(chunk)
+        return values
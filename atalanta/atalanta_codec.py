@@ -0,0 +1,249 @@
+import os
+import sys
+
+import numpy as np
+
+from atalanta_adaptive import (TABLE_ID_BITS, UPDATE_INTERVAL, VALUE_RANGE, AdaptiveAtalantaDecoder,
+                               AdaptiveAtalantaEncoder)
+from atalanta_decode import AtalantaDecoder
+from atalanta_encode import AtalantaEncoder
+from bitpack import pack_varwidth, unpack_bits, unpack_varwidth
+from codec import Codec, EncodedTensor, register_codec
+from encoded_archive import TABLE_FIELDS, pack_layer
+from range_coder import AtalantaRangeDecoder, AtalantaRangeEncoder
+from rans_coder import N_STATES, AtalantaRansDecoder, AtalantaRansEncoder
+from table_bank import (BANK_SIZE, BLOCK_SIZE, block_histograms, build_bank, decode_blocks, encode_blocks,
+                        select_tables, table_id_bits)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@register_codec
+class AtalantaCodec(Codec):
+    """
+    Atalanta as an array codec.
+
+    The payload is the packed symbol stream followed by the packed offsets, as in the
+    encoded archive; the table and both stream lengths travel in the tensor meta.
+
+    Attributes:
+        table (list): The probability table, or None to search one per array (with
+            contiguous ranges, so every array decodes).
+    """
+    __slots__ = ('table',)
+    name = 'atalanta'
+    encoder_class = AtalantaEncoder
+
+    def __init__(self, table=None):
+        self.table = table
+
+    def encode_array(self, values):
+        """
+        Raises:
+            ValueError: If a value is not covered by the table, or falls in a row with an
+                empty probability range (t_high <= t_low), which no decoder can recover.
+        """
+        values = np.asarray(values)
+        flat = values.ravel()
+        table = self.table
+        if table is None and flat.size == 0:
+            # Nothing to model; any table covering the byte range encodes the empty stream
+            table = [{'v_min': 0, 'v_max': 255, 'OL': 8, 't_low': 0, 't_high': 1024}]
+        elif table is None:
+            sys.path.append(os.path.join(REPO_ROOT, 'data_prep'))
+            from probability_table_gen import contiguous_ranges, search_table
+            table = contiguous_ranges(search_table(flat.astype(np.int64)), flat)
+
+        encoder = self.new_encoder(table)
+        encoder.PCNT.check_decodable(flat)
+        encoder.encode(flat.tolist())
+        packed = pack_layer(*encoder.finalize())
+        meta = {
+            'table': [{field: int(entry[field]) for field in TABLE_FIELDS} for entry in table],
+            'symbol_bits': packed['symbol_bits'],
+            'offset_bits': packed['offset_bits'],
+        }
+        return EncodedTensor(self.name, values.shape, values.dtype, packed['symbol_data'] + packed['offset_data'],
+                             packed['symbol_bits'] + packed['offset_bits'], meta)
+
+    def decode(self, tensor):
+        table = tensor.meta['table']
+        symbol_bytes = -(-tensor.meta['symbol_bits'] // 8)
+        rows = self.decode_rows(tensor.meta, tensor.payload[:symbol_bytes], tensor.n_values)
+
+        # Every offset is stored on the OL bits of its symbol's row
+        rows = np.asarray(rows, dtype=np.int64)
+        v_min = np.array([entry['v_min'] for entry in table], dtype=np.int64)
+        OL = np.array([entry['OL'] for entry in table], dtype=np.int64)
+        offsets = unpack_varwidth(tensor.payload[symbol_bytes:], OL[rows]).astype(np.int64)
+        return (v_min[rows] + offsets).astype(tensor.dtype).reshape(tensor.shape)
+
+    def new_encoder(self, table):
+        # The encoder of one array
+        return self.encoder_class(table)
+
+    def decode_rows(self, meta, symbol_data, n_values):
+        # Table row of every value, from the packed symbol stream
+        return AtalantaDecoder(meta['table']).decode_rows(unpack_bits(symbol_data, meta['symbol_bits']), n_values)
+
+
+@register_codec
+class AtalantaRangeCodec(AtalantaCodec):
+    """
+    `AtalantaCodec` with the byte-wise 32-bit range coder backend (see range_coder.py):
+    same tables and offsets, a faster software symbol stream.
+    """
+    __slots__ = ()
+    name = 'atalanta_range'
+    encoder_class = AtalantaRangeEncoder
+
+    def decode_rows(self, meta, symbol_data, n_values):
+        return AtalantaRangeDecoder(meta['table']).decode_rows(symbol_data, n_values)
+
+
+@register_codec
+class AtalantaRansCodec(AtalantaCodec):
+    """
+    `AtalantaCodec` with the interleaved rANS backend (see rans_coder.py): same tables
+    and offsets, the fastest decode.
+
+    Attributes:
+        n_states (int): The number of interleaved rANS states.
+    """
+    __slots__ = ('n_states',)
+    name = 'atalanta_rans'
+
+    def __init__(self, table=None, n_states=N_STATES):
+        super().__init__(table)
+        self.n_states = n_states
+
+    def new_encoder(self, table):
+        return AtalantaRansEncoder(table, self.n_states)
+
+    def encode_array(self, values):
+        tensor = super().encode_array(values)
+        tensor.meta['n_states'] = self.n_states
+        return tensor
+
+    def decode_rows(self, meta, symbol_data, n_values):
+        return AtalantaRansDecoder(meta['table'], meta['n_states']).decode_rows(symbol_data, n_values)
+
+
+@register_codec
+class AdaptiveAtalantaCodec(Codec):
+    """
+    Single-pass Atalanta as an array codec: no table search, the table adapts to the
+    values as they are coded (see atalanta_adaptive.py).
+
+    Only the initial table id is charged on top of the two streams; the update
+    settings are fixed configuration shared by encoder and decoder.
+
+    Attributes:
+        table_id (int): Id of the initial table.
+        interval (int): Symbols coded between table updates.
+        update_boundaries (bool): Whether the row boundaries adapt too.
+    """
+    __slots__ = ('table_id', 'interval', 'update_boundaries')
+    name = 'atalanta_adaptive'
+
+    def __init__(self, table_id=0, interval=UPDATE_INTERVAL, update_boundaries=False):
+        self.table_id = table_id
+        self.interval = interval
+        self.update_boundaries = update_boundaries
+
+    def encode_array(self, values):
+        """
+        Raises:
+            ValueError: If a value is outside the 8-bit range.
+        """
+        values = np.asarray(values)
+        flat = values.ravel()
+        if flat.size and (flat.min() < 0 or flat.max() >= VALUE_RANGE):
+            raise ValueError(f"Values must be in 0 to {VALUE_RANGE - 1} for the adaptive tables.")
+        encoder = AdaptiveAtalantaEncoder(self.table_id, self.interval, self.update_boundaries)
+        encoder.encode(flat)
+        packed = pack_layer(*encoder.finalize())
+        meta = {
+            'table_id': self.table_id,
+            'interval': self.interval,
+            'update_boundaries': self.update_boundaries,
+            'symbol_bits': packed['symbol_bits'],
+            'offset_bits': packed['offset_bits'],
+        }
+        return EncodedTensor(self.name, values.shape, values.dtype, packed['symbol_data'] + packed['offset_data'],
+                             TABLE_ID_BITS + packed['symbol_bits'] + packed['offset_bits'], meta)
+
+    def decode(self, tensor):
+        meta = tensor.meta
+        symbol_bytes = -(-meta['symbol_bits'] // 8)
+        decoder = AdaptiveAtalantaDecoder(meta['table_id'], meta['interval'], meta['update_boundaries'])
+        values = decoder.decode_values(unpack_bits(tensor.payload[:symbol_bytes], meta['symbol_bits']),
+                                       unpack_bits(tensor.payload[symbol_bytes:], meta['offset_bits']),
+                                       tensor.n_values)
+        return values.astype(tensor.dtype).reshape(tensor.shape)
+
+
+@register_codec
+class AtalantaBlockCodec(Codec):
+    """
+    Atalanta with a table per block: every `block_size` values are coded with the
+    cheapest table of a small bank (see table_bank.py).
+
+    The payload is the packed table id of every block, then the symbol and offset
+    streams; the bank travels in the tensor meta, like the table of `AtalantaCodec`.
+
+    Attributes:
+        bank (list): The candidate tables, or None to build a bank per array.
+        bank_size (int): Tables of a bank built per array.
+        block_size (int): Values per block.
+    """
+    __slots__ = ('bank', 'bank_size', 'block_size')
+    name = 'atalanta_blocks'
+
+    def __init__(self, bank=None, bank_size=BANK_SIZE, block_size=BLOCK_SIZE):
+        self.bank = bank
+        self.bank_size = bank_size
+        self.block_size = block_size
+
+    def encode_array(self, values):
+        """
+        Raises:
+            ValueError: If a value is outside the 8-bit range, or no table of a given
+                bank codes some block.
+        """
+        values = np.asarray(values)
+        flat = values.ravel().astype(np.int64)
+        if flat.size and (flat.min() < 0 or flat.max() >= VALUE_RANGE):
+            raise ValueError(f"Values must be in 0 to {VALUE_RANGE - 1} for the table bank.")
+        if self.bank is not None:
+            bank = self.bank
+        elif flat.size:
+            bank = build_bank(flat, self.bank_size, self.block_size)
+        else:
+            bank = [[{'v_min': 0, 'v_max': 255, 'OL': 8, 't_low': 0, 't_high': 1024}]]
+
+        table_ids, _ = select_tables(block_histograms(flat, self.block_size), bank)
+        id_bits = table_id_bits(bank)
+        packed = pack_layer(*encode_blocks(flat, bank, table_ids, self.block_size).finalize())
+        id_data = pack_varwidth(table_ids, np.full(table_ids.size, id_bits))
+        meta = {
+            'bank': [[{field: int(entry[field]) for field in TABLE_FIELDS} for entry in table] for table in bank],
+            'block_size': self.block_size,
+            'id_bytes': len(id_data),
+            'symbol_bits': packed['symbol_bits'],
+            'offset_bits': packed['offset_bits'],
+        }
+        return EncodedTensor(self.name, values.shape, values.dtype, id_data + packed['symbol_data'] + packed['offset_data'],
+                             table_ids.size * id_bits + packed['symbol_bits'] + packed['offset_bits'], meta)
+
+    def decode(self, tensor):
+        meta = tensor.meta
+        bank = meta['bank']
+        n_blocks = -(-tensor.n_values // meta['block_size'])
+        table_ids = unpack_varwidth(tensor.payload[:meta['id_bytes']], np.full(n_blocks, table_id_bits(bank))).astype(np.int64)
+        symbol_start = meta['id_bytes']
+        offset_start = symbol_start + -(-meta['symbol_bits'] // 8)
+        values = decode_blocks(unpack_bits(tensor.payload[symbol_start:offset_start], meta['symbol_bits']),
+                               unpack_bits(tensor.payload[offset_start:], meta['offset_bits']),
+                               bank, table_ids, meta['block_size'], tensor.n_values)
+        return values.astype(tensor.dtype).reshape(tensor.shape)
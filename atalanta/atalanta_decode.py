@@ -1,105 +1,138 @@
-from codec import Codec
-from probability_table import ProbabilityModel
+import numpy as np
+
+from codec import ArithmeticCoder
+
+class AtalantaDecoder(ArithmeticCoder):
+    """
+    A class representing the Atalanta Decoder, which recovers the table row of every
+    symbol from the symbol stream of an `AtalantaEncoder`.
+
+    Attributes:
+        PCNT (list): The symbol & probability count table the stream was encoded with.
+        value (int): The 16 stream bits currently under the decoder window.
+        bits (list): The symbol stream being decoded.
+        position (int): The next bit of the stream to read.
+    """
+    __slots__ = ('PCNT', 'value', 'bits', 'position')
 
-class AtalantaDecoder(Codec):
     def __init__(self, PCNT):
         """
         Initialize the decoder with the given probability count table (PCNT).
         """
-        self.HIGH = 0xFFFF  # Max value for 16 bits
-        self.LOW = 0x0000  # Min value for 16 bits
+        super().__init__()  # HIGH and LOW span the full 16-bit range.
         self.PCNT = PCNT   # Symbol & Probability Count Table
         self.value = 0     # Decoded value from input bits
-        self.input_bits = []  # Input bitstream (to be provided for decoding)
+        self.bits = []     # Symbol stream being decoded
+        self.position = 0  # Next bit to read
 
-    def mask_16(self, value):
+    def decode_rows(self, bitstream, n_symbols=None):
         """
-        Mask the given value to ensure it fits within 16 bits.
-        """
-        return value & 0xFFFF
+        Decodes the table row of every symbol.
 
-    def load_initial_value(self):
-        """
-        Load the initial value by reading the first 16 bits from the input bitstream.
-        """
-        self.value = 0
-        for _ in range(16):  # Read 16 bits
-            if self.input_bits:
-                bit = self.input_bits.pop(0)
-                self.value = (self.value << 1) | bit
-                self.value = self.mask_16(self.value)  # Keep `value` within 16 bits
-            else:
-                raise ValueError("Insufficient bits in the input stream to load initial value.")
-
-    def get_symbol_from_range(self):
-        """
-        Identify the symbol corresponding to the current range.
+        The bits are read by position and the coder state is kept in local variables,
+        so decoding is linear in the stream length.
+
+        Args:
+            bitstream (list or np.ndarray): The symbol stream as 0/1 bits.
+            n_symbols (int, optional): How many symbols to decode. Without it, symbols
+                are decoded until the stream is consumed.
+
+        Returns:
+            list: The row index of every decoded symbol.
+
+        Raises:
+            ValueError: If the stream is shorter than 16 bits and `n_symbols` is not given,
+                or a scaled value matches no range of the table (the stream does not
+                belong to the table).
         """
-        range_val = self.HIGH - self.LOW + 1
-        scaled_value = ((self.value - self.LOW + 1) * 1024 - 1) // range_val
+        if len(bitstream) < 16 and n_symbols is None:
+            raise ValueError("Insufficient bits in the input stream to load initial value.")
+        self.load(bitstream)
+        return self.next_rows(n_symbols)
 
-        # Find the symbol whose range includes the scaled value
-        for entry in self.PCNT:
-            if entry['t_low'] <= scaled_value < entry['t_high']:
-                return entry
-        raise ValueError(f"Scaled value {scaled_value} does not match any range in PCNT.")
+    def load(self, bitstream):
+        """
+        Starts decoding a symbol stream: loads the initial value from its first 16 bits
+        (a short stream is zero padded) and resets the range.
 
-    def decode(self, bitstream):
+        Args:
+            bitstream (list or np.ndarray): The symbol stream as 0/1 bits.
         """
-        Decodes the given bitstream into the original symbols.
-        :param bitstream: A list of bits representing the encoded input stream.
-        :return: A list of decoded symbols.
+        self.bits = bitstream.tolist() if isinstance(bitstream, np.ndarray) else list(bitstream)
+        value = 0
+        for bit in self.bits[:16] + [0] * (16 - len(self.bits)):
+            value = (value << 1) | bit
+        self.value = value
+        self.position = 16
+        self.HIGH, self.LOW = 0xFFFF, 0x0000
+
+    def next_rows(self, n_symbols=None):
         """
-        self.input_bits = bitstream  # Initialize the input bitstream
-        self.load_initial_value()   # Load the initial value from the first 16 bits
+        Decodes the next symbols of the loaded stream with the current table. The
+        table can be swapped between calls, as long as the encoder swapped it at the
+        same symbol.
+
+        Args:
+            n_symbols (int, optional): How many symbols to decode. Without it, symbols
+                are decoded until the stream is consumed.
 
-        decoded_symbols = []
+        Returns:
+            list: The row index of every decoded symbol.
 
-        while self.input_bits:
+        Raises:
+            ValueError: If a scaled value matches no range of the table.
+        """
+        bits = self.bits
+        n_bits = len(bits)
+        t_low = [int(entry['t_low']) for entry in self.PCNT]
+        t_high = [int(entry['t_high']) for entry in self.PCNT]
+        # Row of every scaled value; walking backwards lets the first matching row win
+        scaled_row = [-1] * 1024
+        for i in range(len(self.PCNT) - 1, -1, -1):
+            for scaled in range(max(t_low[i], 0), min(t_high[i], 1024)):
+                scaled_row[scaled] = i
+
+        HIGH, LOW, value, position = self.HIGH, self.LOW, self.value, self.position
+        limit = n_symbols if n_symbols is not None else -1
+        rows = []
+        while len(rows) != limit and (n_symbols is not None or position < n_bits):
             # Step 1: Get the symbol from the current range
-            symbol_entry = self.get_symbol_from_range()
-            decoded_symbols.append(symbol_entry['v_min'])
+            range_val = HIGH - LOW + 1
+            scaled_value = ((value - LOW + 1) * 1024 - 1) // range_val
+            r = scaled_row[scaled_value] if 0 <= scaled_value < 1024 else -1
+            if r < 0:
+                raise ValueError(f"Scaled value {scaled_value} does not match any range in PCNT.")
+            rows.append(r)
 
             # Step 2: Update HIGH and LOW based on the symbol's range
-            range_val = self.HIGH - self.LOW + 1
-            self.HIGH = self.LOW + ((range_val * symbol_entry['t_high']) >> 10) - 1
-            self.LOW = self.LOW + ((range_val * symbol_entry['t_low']) >> 10)
-
-            # Ensure HIGH and LOW remain 16-bit values
-            self.HIGH = self.mask_16(self.HIGH)
-            self.LOW = self.mask_16(self.LOW)
+            HIGH = (LOW + ((range_val * t_high[r]) >> 10) - 1) & 0xFFFF
+            LOW = (LOW + ((range_val * t_low[r]) >> 10)) & 0xFFFF
 
             # Step 3: Adjust HIGH and LOW by processing input bits to stabilize the range
             while True:
-                if self.HIGH < 0x8000:  # Case 1: MSB of both HIGH and LOW is 0
-                    self.HIGH = (self.HIGH << 1) | 1
-                    self.LOW = (self.LOW << 1)
-                    self.value = (self.value << 1) | self._consume_bit()
-
-                elif self.LOW >= 0x8000:  # Case 2: MSB of both HIGH and LOW is 1
-                    self.HIGH = (self.HIGH << 1) | 1
-                    self.LOW = (self.LOW << 1)
-                    self.value = (self.value << 1) | self._consume_bit()
-
-                elif self.LOW >= 0x4000 and self.HIGH < 0xC000:  # Case 3: Underflow
-                    self.HIGH = ((self.HIGH << 1) & 0xFFFF) | 0x8001
-                    self.LOW = ((self.LOW << 1) & 0x7FFF)
-                    self.value = ((self.value << 1) | self._consume_bit()) & 0x7FFF
-
+                if HIGH < 0x8000 or LOW >= 0x8000:  # Cases 1 and 2: MSB of both HIGH and LOW is equal
+                    bit = bits[position] if position < n_bits else 0  # Past the end, the stream reads as 0
+                    position += 1
+                    HIGH = ((HIGH << 1) & 0xFFFF) | 1
+                    LOW = (LOW << 1) & 0xFFFF
+                    value = ((value << 1) & 0xFFFF) | bit
+                elif LOW >= 0x4000 and HIGH < 0xC000:  # Case 3: Underflow, drop the second MSB
+                    bit = bits[position] if position < n_bits else 0
+                    position += 1
+                    HIGH = ((HIGH << 1) & 0xFFFF) | 0x8001
+                    LOW = (LOW << 1) & 0x7FFF
+                    value = (((value << 1) ^ 0x8000) & 0xFFFF) | bit
                 else:
                     break
 
-                # Mask all values to keep them 16 bits
-                self.HIGH = self.mask_16(self.HIGH)
-                self.LOW = self.mask_16(self.LOW)
-                self.value = self.mask_16(self.value)
-
-        return decoded_symbols
+        self.HIGH, self.LOW, self.value, self.position = HIGH, LOW, value, position
+        return rows
 
-    def _consume_bit(self):
+    def decode(self, bitstream, n_symbols=None):
         """
-        Consumes the next bit from the input stream. If no bits are left, appends a 0.
+        Decodes the given bitstream into the original symbols.
+        :param bitstream: A list of bits representing the encoded input stream.
+        :param n_symbols: How many symbols to decode (default: until the stream is consumed).
+        :return: A list of decoded symbols (the v_min of their table rows).
         """
-        if self.input_bits:
-            return self.input_bits.pop(0)
-        return 0
+        return [self.PCNT[r]['v_min'] for r in self.decode_rows(bitstream, n_symbols)]
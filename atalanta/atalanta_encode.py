@@ -1,7 +1,9 @@
-from codec import Codec
+import numpy as np
+
+from codec import ArithmeticCoder
 from probability_table import ProbabilityModel
 
-class AtalantaEncoder(Codec):
+class AtalantaEncoder(ArithmeticCoder):
     """
     A class representing the Atalanta Encoder, responsible for encoding a stream of data using an arithmetic coding technique.
     
@@ -10,9 +12,13 @@ class AtalantaEncoder(Codec):
         OFS_out (list): The list storing the offset bit stream.
         OFS_r (list): The list storing the offset bit length stream.
         CODE_out (list): The list storing the symbol stream.
-        CODE_c (list): The list storing the symbol length stream.
+        CODE_c (list): The list storing the symbol length stream (renormalization shifts per symbol).
+        UBC_events (int): Underflow (case 3) shifts so far.
+        max_UBC (int): The most underflow bits that were pending at once.
         PCNT (list): The model representing probability values for each character.
     """
+    __slots__ = ('OFS_out', 'OFS_r', 'CODE_out', 'CODE_c', 'UBC_events', 'max_UBC', 'PCNT')
+    FLUSH_BITS = 2  # Symbol stream bits written by `flush` besides the pending underflow bits
 
     def __init__(self, model):
         """
@@ -21,7 +27,7 @@ class AtalantaEncoder(Codec):
         Args:
             model (list): The probability model to use for encoding.
         """
-        self.UBC = 0  # Underflow bit counter initialized to 0.
+        super().__init__()  # HIGH, LOW and the underflow bit counter (UBC).
 
         self.OFS_out = []  # List for storing the offset bit stream.
         self.OFS_r = []  # List for storing the offset bit length stream.
@@ -29,6 +35,9 @@ class AtalantaEncoder(Codec):
         self.CODE_out = []  # List for storing the symbol stream.
         self.CODE_c = []  # List for storing the symbol length stream.
 
+        self.UBC_events = 0  # Underflow shifts, for the per-layer counters.
+        self.max_UBC = 0  # Peak of the underflow bit counter.
+
         self.PCNT = ProbabilityModel(model)  # Probability model used for encoding.
 
     def output_bit(self, bit):
@@ -66,61 +75,174 @@ class AtalantaEncoder(Codec):
         Raises:
             ValueError: If a character in the input stream is not found in the probability model.
         """
+        self.encode_symbols(input_stream)
+        self.flush()
+
+    def encode_symbols(self, input_stream):
+        """
+        Encodes symbols with the current model without terminating the stream, so the
+        model can be swapped between calls; `flush` ends the stream.
+
+        The coder state is kept in local variables for the whole call and written
+        back at the end; table rows come from a value -> row lookup.
+
+        Args:
+            input_stream (iterable): An iterable containing the stream of symbols to encode.
+
+        Raises:
+            ValueError: If a character in the input stream is not found in the probability model.
+        """
+        table = self.PCNT.PCNT
+        v_min = [int(entry['v_min']) for entry in table]
+        OL = [int(entry['OL']) for entry in table]
+        t_low = [int(entry['t_low']) for entry in table]
+        t_high = [int(entry['t_high']) for entry in table]
+        lookup = self.PCNT.row_lookup(max(int(entry['v_max']) for entry in table) + 1).tolist()
+        lookup_size = len(lookup)
+
+        HIGH, LOW, UBC = self.HIGH, self.LOW, self.UBC
+        UBC_events, max_UBC = self.UBC_events, self.max_UBC
+        output_bit = self.CODE_out.append
+        output_pending = self.CODE_out.extend
+        output_offset = self.OFS_out.append
+        output_offset_length = self.OFS_r.append
+        output_shifts = self.CODE_c.append
         for c in input_stream:
             # Step 1: Get the probability entry for the current symbol.
-            PCNT_row = self.PCNT.get_probability_of_symbol(c)
-            if PCNT_row is None:
+            r = lookup[c] if 0 <= c < lookup_size else -1
+            if r < 0:
                 raise ValueError(f"Character {c} not found in the probability model.")
 
             # Step 2: Calculate the offset for the symbol and check its validity.
-            offset = c - PCNT_row['v_min']
-            if offset.bit_length() > PCNT_row['OL']:
+            offset = c - v_min[r]
+            if offset.bit_length() > OL[r]:
                 raise ValueError(f"Offset {offset} is larger than OL.")
-            else:
-                # Append the offset and its length to the corresponding streams.
-                self.OFS_out.append(offset)
-                self.OFS_r.append(PCNT_row['OL'])
+            # Append the offset and its length to the corresponding streams.
+            output_offset(offset)
+            output_offset_length(OL[r])
 
             # Step 3: Update HIGH and LOW bounds based on the symbol's probability range.
-            range_val = self.HIGH - self.LOW + 1
-            self.HIGH = self.LOW + ((range_val * PCNT_row['t_high']) >> 10) - 1
-            self.LOW = self.LOW + ((range_val * PCNT_row['t_low']) >> 10)
+            range_val = HIGH - LOW + 1
+            HIGH = LOW + ((range_val * t_high[r]) >> 10) - 1
+            LOW = LOW + ((range_val * t_low[r]) >> 10)
 
             # Step 4: Perform arithmetic encoding by shifting HIGH and LOW.
+            shifts = 0  # Renormalization shifts, i.e. the bits the decoder reads for this symbol.
             while True:
-                if self.HIGH < 0x8000:  # Case 1: MSB of both HIGH and LOW is 0.
-                    self.output_bit_plus_pending(0)
-                    self.LOW <<= 1
-                    self.LOW = self.mask_16(self.LOW)
-                    self.HIGH <<= 1
-                    self.HIGH = self.mask_16(self.HIGH)
-                    self.HIGH |= 1  # Set LSB of HIGH to 1.
-                elif self.LOW >= 0x8000:  # Case 2: MSB of both HIGH and LOW is 1.
-                    self.output_bit_plus_pending(1)
-                    self.LOW <<= 1
-                    self.LOW = self.mask_16(self.LOW)
-                    self.HIGH <<= 1
-                    self.HIGH = self.mask_16(self.HIGH)
-                    self.HIGH |= 1  # Set LSB of HIGH to 1.
-                elif self.LOW >= 0x4000 and self.HIGH < 0xC000:  # Case 3: Handling overlapping MSBs.
-                    self.UBC += 1  # Increment the underflow bit counter.
-                    self.LOW <<= 1
-                    self.LOW &= 0x7FFF  # Set MSB of LOW to 0.
-                    self.LOW = self.mask_16(self.LOW)
-
-                    self.HIGH <<= 1
-                    self.HIGH = self.mask_16(self.HIGH)
-                    self.HIGH |= 0x8001  # Set MSB and LSB of HIGH to 1.
+                if HIGH < 0x8000:  # Case 1: MSB of both HIGH and LOW is 0.
+                    output_bit(0)
+                    if UBC:  # Pending underflow bits are the inverse of the MSB.
+                        output_pending([1] * UBC)
+                        UBC = 0
+                    LOW = (LOW << 1) & 0xFFFF
+                    HIGH = ((HIGH << 1) & 0xFFFF) | 1  # Set LSB of HIGH to 1.
+                elif LOW >= 0x8000:  # Case 2: MSB of both HIGH and LOW is 1.
+                    output_bit(1)
+                    if UBC:
+                        output_pending([0] * UBC)
+                        UBC = 0
+                    LOW = (LOW << 1) & 0xFFFF
+                    HIGH = ((HIGH << 1) & 0xFFFF) | 1
+                elif LOW >= 0x4000 and HIGH < 0xC000:  # Case 3: Handling overlapping MSBs.
+                    UBC += 1  # Increment the underflow bit counter.
+                    UBC_events += 1
+                    if UBC > max_UBC:
+                        max_UBC = UBC
+                    LOW = (LOW << 1) & 0x7FFF  # Set MSB of LOW to 0.
+                    HIGH = ((HIGH << 1) & 0xFFFF) | 0x8001  # Set MSB and LSB of HIGH to 1.
                 else:
                     # If no matching condition, break out of the loop.
                     break
+                shifts += 1
+            output_shifts(shifts)
+
+        self.HIGH, self.LOW, self.UBC = HIGH, LOW, UBC
+        self.UBC_events, self.max_UBC = UBC_events, max_UBC
+
+    def flush(self):
+        """
+        Step 5: Finalizes the encoding process for the last symbol, emitting the bits
+        that select a value inside the final range.
+        """
+        UBC = self.UBC + 1
+        bit = 0 if self.LOW < 0x4000 else 1
+        self.CODE_out.append(bit)
+        self.CODE_out.extend([1 - bit] * UBC)
+        self.UBC = 0
+
+    def count(self, input_stream):
+        """
+        Counts the bits `encode` would produce without materializing any stream.
+
+        The offset total is computed vectorized from the table rows of the symbols. The
+        arithmetic coder runs the exact state machine of `encode` on local variables,
+        tallying emitted bits instead of appending them, so the counts always match
+        `len(CODE_out)` and `sum(OFS_r)` of a full encode. The coder state, `UBC_events`
+        and `max_UBC` are left as `encode` would leave them.
+
+        Args:
+            input_stream (iterable): An iterable containing the stream of symbols to encode.
+
+        Returns:
+            tuple: (symbol_bits, underflow_bits, offset_bits), where underflow_bits counts
+                the underflow (case 3) shifts whose bits were emitted as pending bits.
+
+        Raises:
+            ValueError: If a character in the input stream is not found in the probability model,
+                or its offset is larger than OL.
+        """
+        table = self.PCNT.PCNT
+        values = np.asarray(input_stream, dtype=np.int64)
+        if values.size and values.min() < 0:
+            raise ValueError(f"Character {values.min()} not found in the probability model.")
+        v_max = max(int(entry['v_max']) for entry in table)
+        lookup_size = max(v_max, int(values.max()) if values.size else 0) + 1
+        rows = self.PCNT.row_lookup(lookup_size)[values]
+
+        # Step 1-2, vectorized: table rows, offset validity and the offset stream length.
+        if np.any(rows < 0):
+            raise ValueError(f"Character {values[rows < 0][0]} not found in the probability model.")
+        v_min = np.array([int(entry['v_min']) for entry in table], dtype=np.int64)
+        OL = np.array([int(entry['OL']) for entry in table], dtype=np.int64)
+        offsets = values - v_min[rows]
+        too_long = (offsets >> OL[rows]) != 0
+        if np.any(too_long):
+            raise ValueError(f"Offset {offsets[too_long][0]} is larger than OL.")
+        offset_bits = int(OL[rows].sum())
+
+        # Steps 3-5 on locals: the same state machine as `encode`, counting bits only.
+        t_low = [int(entry['t_low']) for entry in table]
+        t_high = [int(entry['t_high']) for entry in table]
+        HIGH, LOW, UBC = self.HIGH, self.LOW, self.UBC
+        max_UBC = self.max_UBC
+        symbol_bits = 0
+        underflow_bits = 0
+        for r in rows.tolist():
+            range_val = HIGH - LOW + 1
+            HIGH = LOW + ((range_val * t_high[r]) >> 10) - 1
+            LOW = LOW + ((range_val * t_low[r]) >> 10)
+            while True:
+                if HIGH < 0x8000 or LOW >= 0x8000:  # Cases 1 and 2: emit the MSB plus pending bits.
+                    symbol_bits += 1 + UBC
+                    UBC = 0
+                    LOW = (LOW << 1) & 0xFFFF
+                    HIGH = ((HIGH << 1) & 0xFFFF) | 1
+                elif LOW >= 0x4000 and HIGH < 0xC000:  # Case 3: underflow.
+                    UBC += 1
+                    underflow_bits += 1
+                    if UBC > max_UBC:
+                        max_UBC = UBC
+                    LOW = (LOW << 1) & 0x7FFF
+                    HIGH = ((HIGH << 1) & 0xFFFF) | 0x8001
+                else:
+                    break
 
-        # Step 5: Finalize the encoding process for the last symbol.
-        self.UBC += 1
-        if self.LOW < 0x4000:
-            self.output_bit_plus_pending(0)
-        else:
-            self.output_bit_plus_pending(1)
+        UBC += 1
+        symbol_bits += 1 + UBC
+        self.HIGH, self.LOW, self.UBC = HIGH, LOW, 0
+        self.UBC_events += underflow_bits
+        self.max_UBC = max_UBC
+        return symbol_bits, underflow_bits, offset_bits
 
     def finalize(self):
         """
@@ -0,0 +1,105 @@
+import numpy as np
+
+# Fields handled per vectorized step; bounds the (fields x max width) scratch matrices.
+CHUNK = 1 << 18
+
+
+def pack_bits(bits):
+    """
+    Packs a stream of 0/1 bits (MSB first) into bytes. The last byte is zero padded.
+
+    Args:
+        bits (list or np.ndarray): The bits to pack.
+
+    Returns:
+        bytes: The packed bits.
+    """
+    return np.packbits(np.asarray(bits, dtype=np.uint8)).tobytes()
+
+def unpack_bits(data, n_bits):
+    """
+    Unpacks the first `n_bits` bits of a byte string.
+
+    Args:
+        data (bytes): The packed bits.
+        n_bits (int): How many bits to return.
+
+    Returns:
+        np.ndarray: The bits as a uint8 array of 0/1 values.
+    """
+    return np.unpackbits(np.frombuffer(data, dtype=np.uint8), count=n_bits)
+
+def varwidth_bits(values, widths):
+    """
+    Lays out each value on its own bit width, MSB first, as one stream of 0/1 bits.
+
+    Args:
+        values (array-like): Non-negative integers.
+        widths (array-like): The bit width of each value (0 writes nothing).
+
+    Returns:
+        np.ndarray: The bits as a uint8 array of 0/1 values.
+
+    Raises:
+        ValueError: If a value does not fit in its width.
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    widths = np.asarray(widths, dtype=np.int64)
+    if values.size == 0 or widths.max() == 0:
+        return np.zeros(0, dtype=np.uint8)
+    if np.any(values >> widths.astype(np.uint64)):
+        raise ValueError("Value does not fit in its bit width.")
+
+    max_width = int(widths.max())
+    shifts = np.arange(max_width - 1, -1, -1, dtype=np.uint64)
+    columns = np.arange(max_width)
+    chunks = []
+    for start in range(0, values.size, CHUNK):
+        v = values[start:start + CHUNK]
+        w = widths[start:start + CHUNK]
+        bits = ((v[:, None] >> shifts) & 1).astype(np.uint8)
+        # Row-major selection keeps the fields in order and each field MSB first.
+        chunks.append(bits[columns >= (max_width - w)[:, None]])
+    return np.concatenate(chunks)
+
+def pack_varwidth(values, widths):
+    """
+    Packs each value on its own bit width into bytes. See `varwidth_bits`.
+
+    Returns:
+        bytes: The packed fields, zero padded to a whole byte.
+    """
+    return np.packbits(varwidth_bits(values, widths)).tobytes()
+
+def unpack_varwidth(data, widths, bit_offset=0):
+    """
+    Reads back fields written by `pack_varwidth`.
+
+    Args:
+        data (bytes or np.ndarray): The packed bytes, or an already unpacked 0/1 bit array.
+        widths (array-like): The bit width of each field.
+        bit_offset (int): Where the first field starts in the stream.
+
+    Returns:
+        np.ndarray: The field values as uint64.
+    """
+    widths = np.asarray(widths, dtype=np.int64)
+    if widths.size == 0 or widths.max() == 0:
+        return np.zeros(widths.size, dtype=np.uint64)
+    bits = data if isinstance(data, np.ndarray) else np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+    ends = np.cumsum(widths) + bit_offset
+    starts = ends - widths
+    if ends[-1] > bits.size:
+        raise ValueError("Bit stream is shorter than the field widths require.")
+
+    max_width = max(int(widths.max()), 1)
+    columns = np.arange(max_width)
+    values = np.empty(widths.size, dtype=np.uint64)
+    for start in range(0, widths.size, CHUNK):
+        s = starts[start:start + CHUNK]
+        w = widths[start:start + CHUNK]
+        valid = columns < w[:, None]
+        field_bits = bits[np.where(valid, s[:, None] + columns, 0)].astype(np.uint64) * valid
+        shifts = np.where(valid, w[:, None] - 1 - columns, 0).astype(np.uint64)
+        values[start:start + CHUNK] = (field_bits << shifts).sum(axis=1)
+    return values
@@ -0,0 +1,81 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from codec import Codec, EncodedTensor, get_codec, register_codec
+
+INDEX_ENTRY_BITS = 32  # Bits of one tile's entry in the size index (its byte length)
+
+
+def tile_bounds(n_channels, channels_per_tile):
+    # (first, last + 1) output channel of every tile
+    return [(start, min(start + channels_per_tile, n_channels)) for start in range(0, n_channels, channels_per_tile)]
+
+def encode_tile(codec_name, options, values):
+    # Encodes one tile with a fresh inner codec; module level so worker processes can run it
+    return get_codec(codec_name, **options).encode_array(values)
+
+def decode_tile(tensor):
+    return get_codec(tensor.codec).decode(tensor)
+
+
+@register_codec
+class ChannelCodec(Codec):
+    """
+    Encodes a weight tensor per output channel (axis 0), or per tile of consecutive
+    output channels, each as an independent stream of an inner codec.
+
+    Channels quantized with their own scales get their own tables (or ShapeShifter
+    groups that never straddle two channels), and any channel decodes on its own: the
+    payload is the tile streams back to back, and the size index in the meta gives
+    every tile's byte length, bits and inner meta. Tensors with fewer than two
+    dimensions are a single tile.
+
+    Attributes:
+        codec (str): The registry name of the inner codec.
+        channels_per_tile (int): Output channels per stream.
+        workers (int): Processes encoding and decoding tiles in parallel; 1 codes them
+            in this process.
+        options (dict): Constructor arguments of the inner codec.
+    """
+    __slots__ = ('codec', 'channels_per_tile', 'workers', 'options')
+    name = 'per_channel'
+
+    def __init__(self, codec='atalanta', channels_per_tile=1, workers=1, **options):
+        self.codec = codec
+        self.channels_per_tile = channels_per_tile
+        self.workers = workers
+        self.options = options
+
+    def map_tiles(self, fn, *iterables):
+        # fn over the tiles, in tile order, in worker processes when there are several
+        if self.workers > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                return list(executor.map(fn, *iterables, chunksize=max(1, len(iterables[0]) // (4 * self.workers))))
+        return list(map(fn, *iterables))
+
+    def encode_array(self, values):
+        values = np.asarray(values)
+        channels = values if values.ndim >= 2 else values.reshape(1, -1)
+        tiles = [channels[start:end] for start, end in tile_bounds(len(channels), self.channels_per_tile)]
+        n = len(tiles)
+        tensors = self.map_tiles(encode_tile, [self.codec] * n, [self.options] * n, tiles)
+
+        index = [{'channels': len(tile), 'bytes': len(tensor.payload), 'bits': tensor.bits, 'meta': tensor.meta}
+                 for tile, tensor in zip(tiles, tensors)]
+        meta = {'codec': self.codec, 'channels_per_tile': self.channels_per_tile, 'index': index}
+        bits = sum(tensor.bits for tensor in tensors) + n * INDEX_ENTRY_BITS
+        return EncodedTensor(self.name, values.shape, values.dtype, b''.join(tensor.payload for tensor in tensors),
+                             bits, meta)
+
+    def decode(self, tensor):
+        shape = tensor.shape if len(tensor.shape) >= 2 else (1, tensor.n_values)
+        tiles = []
+        position = 0
+        for entry in tensor.meta['index']:
+            tiles.append(EncodedTensor(tensor.meta['codec'], (entry['channels'],) + tuple(shape[1:]), tensor.dtype,
+                                       tensor.payload[position:position + entry['bytes']], entry['bits'], entry['meta']))
+            position += entry['bytes']
+        if not tiles:
+            return np.zeros(tensor.shape, dtype=tensor.dtype)
+        return np.concatenate(self.map_tiles(decode_tile, tiles)).reshape(tensor.shape)
@@ -1,18 +1,138 @@
+import importlib
+import os
+import sys
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class EncodedTensor:
+    """
+    A compressed array: the encoded bytes, the codec that wrote them and what that
+    codec needs to restore the array.
+
+    Attributes:
+        codec (str): The registry name of the codec.
+        shape (tuple): The shape of the original array.
+        dtype (str): The dtype of the original array.
+        payload (bytes): The encoded data.
+        bits (int): The compressed size in bits, as the codec accounts it (before any
+            byte padding of the payload).
+        meta (dict): The codec parameters needed to decode (table, group size, ...).
+    """
+    __slots__ = ('codec', 'shape', 'dtype', 'payload', 'bits', 'meta')
+
+    def __init__(self, codec, shape, dtype, payload, bits, meta=None):
+        self.codec = codec
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype).str
+        self.payload = payload
+        self.bits = int(bits)
+        self.meta = meta or {}
+
+    @property
+    def n_values(self):
+        return int(np.prod(self.shape, dtype=np.int64))
+
+
 class Codec:
     """
-    A base class for encoding streams using arithmetic coding.
-    This class defines the basic structure for encoding.
+    The interface every array codec implements: `encode_array` turns an array into an
+    `EncodedTensor`, and `decode` turns that back into the array.
+
+    Implementations set `name` and are made available by name with `register_codec`,
+    so drivers and benchmarks can swap codecs with `get_codec`.
+    """
+    __slots__ = ()
+    name = None
+
+    def encode_array(self, values):
+        """
+        Encodes an array.
+
+        Args:
+            values (np.ndarray): The values to encode, of any shape.
+
+        Returns:
+            EncodedTensor: The encoded array.
+        """
+        raise NotImplementedError("Subclasses must implement the encode_array method.")
+
+    def decode(self, tensor):
+        """
+        Decodes an array written by `encode_array`.
+
+        Args:
+            tensor (EncodedTensor): The encoded array.
+
+        Returns:
+            np.ndarray: The values, with the original shape and dtype.
+        """
+        raise NotImplementedError("Subclasses must implement the decode method.")
+
+
+# Name -> codec class, filled by register_codec.
+CODECS = {}
+
+# Modules of the built-in codecs (repository directory, module), imported on first use.
+CODEC_MODULES = {
+    'atalanta': ('atalanta', 'atalanta_codec'),
+    'atalanta_adaptive': ('atalanta', 'atalanta_codec'),
+    'atalanta_blocks': ('atalanta', 'atalanta_codec'),
+    'atalanta_range': ('atalanta', 'atalanta_codec'),
+    'atalanta_rans': ('atalanta', 'atalanta_codec'),
+    'per_channel': ('atalanta', 'channel_codec'),
+    'shapeshifter': ('shapeshifter', 'shapeshifter_codec'),
+}
+
+def register_codec(cls):
+    # Class decorator making a Codec available to get_codec under its name
+    CODECS[cls.name] = cls
+    return cls
+
+def get_codec(name, **options):
+    """
+    Creates a codec by name.
+
+    Args:
+        name (str): The registry name ('atalanta', 'shapeshifter', ...).
+        **options: Constructor arguments of the codec.
+
+    Returns:
+        Codec: The codec.
+
+    Raises:
+        ValueError: If no codec is registered under `name`.
+    """
+    if name not in CODECS and name in CODEC_MODULES:
+        directory, module = CODEC_MODULES[name]
+        path = os.path.join(REPO_ROOT, directory)
+        if path not in sys.path:
+            sys.path.append(path)
+        importlib.import_module(module)
+    if name not in CODECS:
+        raise ValueError(f"Unknown codec {name}, expected one of {sorted(set(CODECS) | set(CODEC_MODULES))}.")
+    return CODECS[name](**options)
+
+
+class ArithmeticCoder:
+    """
+    The 16-bit range state shared by the Atalanta encoder and decoder.
+
+    The state lives in slots; the coding loops copy it into local variables and write
+    it back once per call, so no bit goes through an attribute lookup.
 
     Attributes:
         HIGH (int): The upper bound for the encoding range.
         LOW (int): The lower bound for the encoding range.
-        range_length (int): The length of the encoding range (fixed to 16).
-
+        UBC (int): The underflow bit counter.
     """
-    
-    def __init__(self, model):
+    __slots__ = ('HIGH', 'LOW', 'UBC')
+
+    def __init__(self):
         """
-        Initializes the base Encoder class with required parameters for encoding.
+        Initializes the coder with the full range.
         """
         self.HIGH = 0xFFFF  # Upper bound of the encoding range.
         self.LOW = 0x0000  # Lower bound of the encoding range.
@@ -21,10 +141,10 @@ class Codec:
     def mask_16(self, value):
         """
         Masks the given value to fit within 16 bits.
-        
+
         Args:
             value (int): The value to mask.
-        
+
         Returns:
             int: The masked value.
         """
@@ -38,7 +158,7 @@ class Codec:
             string (str): A label to print before the value.
             value (int): The value to print.
         """
-        print(f"{string}: ", self.decimal_to_bits(value), 
+        print(f"{string}: ", self.decimal_to_bits(value),
               self.decimal_to_hex(value), value)
 
     def decimal_to_bits(self, n, bit_length=None):
@@ -84,13 +204,3 @@ class Codec:
             raise ValueError("Input must be an integer.")
 
         return hex(decimal_num).upper()
-
-    def finalize(self):
-        """
-        Finalizes the encoding process and returns the resulting streams.
-        This is a placeholder function for subclasses to implement.
-
-        Returns:
-            tuple: A tuple containing the symbol stream (CODE_out).
-        """
-        raise NotImplementedError("Subclasses must implement the finalize method.")
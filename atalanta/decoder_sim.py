@@ -0,0 +1,134 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from atalanta_encode import AtalantaEncoder
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(REPO_ROOT, 'data_prep'))
+from atalanta_numpy import TABLE_OVERHEAD
+
+
+def encode_lanes(values, table, lanes):
+    """
+    Encodes a layer as `lanes` independent streams, one per decoder lane.
+
+    The layer is cut into contiguous, equally sized chunks and each chunk is encoded
+    by its own `AtalantaEncoder`, as a multi-lane decoder needs.
+
+    Returns:
+        list: Per lane, (n_symbols, renormalization shifts per symbol as an array,
+            symbol stream bits, offset stream bits).
+    """
+    streams = []
+    for chunk in np.array_split(np.asarray(values), lanes):
+        encoder = AtalantaEncoder(table)
+        encoder.encode(chunk.tolist())
+        symbol_stream, _, offset_length_stream = encoder.finalize()
+        streams.append((len(chunk), np.asarray(encoder.CODE_c, dtype=np.int64),
+                        len(symbol_stream), int(np.sum(offset_length_stream, dtype=np.int64))))
+    return streams
+
+def lane_cycles(shifts, symbols_per_cycle=1, renorm_bits_per_cycle=2, lookup_latency=1):
+    """
+    Replays the renormalization shifts of one lane through the decoder model.
+
+    A lane issues at most `symbols_per_cycle` symbols per cycle. The next symbol can
+    only be looked up once the range of the previous one is renormalized, so a symbol
+    takes max(1 / symbols_per_cycle, lookup_latency - 1 + ceil(shifts / renorm_bits_per_cycle))
+    cycles: the table lookup overlaps the last renormalization cycle. Offsets are
+    fixed-width fields read from their own stream and never stall the lane.
+
+    Returns:
+        tuple: (cycles, stall_cycles) - stall cycles are those beyond the peak rate.
+    """
+    ideal = 1 / symbols_per_cycle
+    renorm = -(-shifts // renorm_bits_per_cycle)
+    cycles = np.maximum(ideal, lookup_latency - 1 + renorm)
+    total = float(cycles.sum())
+    return total, total - ideal * shifts.size
+
+def simulate_layer(values, table, symbols_per_cycle=1, renorm_bits_per_cycle=2, lanes=1,
+                   lookup_latency=1, clock_ghz=1.0, bandwidth_gbps=25.6):
+    """
+    Simulates decoding one layer on the hardware decoder model.
+
+    Lanes decode their streams in parallel, so the layer takes as long as its slowest
+    lane. The decoder keeps up when it produces values at least as fast as the memory
+    delivers the compressed layer (streams plus one probability table per lane).
+
+    Args:
+        values (np.ndarray): The layer values.
+        table (list): The probability table of the layer.
+        symbols_per_cycle (float): Peak symbols a lane decodes per cycle.
+        renorm_bits_per_cycle (int): Renormalization shifts a lane performs per cycle.
+        lanes (int): Decoder lanes.
+        lookup_latency (int): Cycles of the probability table lookup.
+        clock_ghz (float): Decoder clock in GHz.
+        bandwidth_gbps (float): Off-chip bandwidth in GB/s.
+
+    Returns:
+        dict: Cycles and stall cycles of the slowest lane, decode time, effective
+            output GB/s of the decoder and of the memory, and whether the decoder keeps up.
+    """
+    streams = encode_lanes(values, table, lanes)
+    slowest = (0.0, 0.0)
+    for n_symbols, shifts, _, _ in streams:
+        slowest = max(slowest, lane_cycles(shifts, symbols_per_cycle, renorm_bits_per_cycle, lookup_latency))
+    cycles, stall_cycles = slowest
+
+    n_bytes = len(values)
+    compressed_bits = sum(symbol_bits + offset_bits for _, _, symbol_bits, offset_bits in streams) + lanes * TABLE_OVERHEAD
+    decode_seconds = cycles / (clock_ghz * 1e9)
+    memory_seconds = compressed_bits / 8 / (bandwidth_gbps * 1e9)
+    decoder_gbps = n_bytes / decode_seconds / 1e9 if decode_seconds else float('inf')
+    memory_gbps = n_bytes / memory_seconds / 1e9 if memory_seconds else float('inf')
+    return {
+        'Lanes': lanes,
+        'Values': n_bytes,
+        'Compressed (bits)': compressed_bits,
+        'Cycles': int(np.ceil(cycles)),
+        'Stall_Cycles': int(np.ceil(stall_cycles)),
+        'Stall (%)': stall_cycles / cycles * 100 if cycles else 0.0,
+        'Decode_Time (us)': decode_seconds * 1e6,
+        'Decoder_Output (GB/s)': decoder_gbps,
+        'Memory_Fed_Output (GB/s)': memory_gbps,
+        'Keeps_Up': decoder_gbps >= memory_gbps,
+    }
+
+def main(argv=None):
+    from run_atalanta import get_probability_tables, read_layers, print_encoded_summary_table, output_summary_to_csv
+
+    project = '/content/drive/MyDrive/CSCE_614/Project'
+    parser = argparse.ArgumentParser(description="Cycle-level throughput model of the Atalanta hardware decoder.")
+    parser.add_argument('--values', default=os.path.join(project, 'weights_all_layers.csv'), help="values CSV of the layers")
+    parser.add_argument('--tables', default=os.path.join(project, 'probability_table_gen_results/weights_probability_tables.pts'),
+                        help="probability table store (or pt_*.csv directory)")
+    parser.add_argument('--lanes', type=int, nargs='+', default=[1, 2, 4, 8], help="lane counts to simulate")
+    parser.add_argument('--symbols-per-cycle', type=float, default=1)
+    parser.add_argument('--renorm-bits', type=int, default=2, help="renormalization shifts per cycle")
+    parser.add_argument('--lookup-latency', type=int, default=1, help="table lookup latency in cycles")
+    parser.add_argument('--clock', type=float, default=1.0, help="decoder clock in GHz")
+    parser.add_argument('--bandwidth', type=float, default=25.6, help="off-chip bandwidth in GB/s")
+    parser.add_argument('--max-layers', type=int, default=None)
+    parser.add_argument('--output', default=os.path.join(project, 'atalanta_outputs/decoder_simulation.csv'))
+    args = parser.parse_args(argv)
+
+    rows = []
+    layers = read_layers(args.values, get_probability_tables(args.tables))
+    for i, (row, input_array, prob_table) in enumerate(layers):
+        if args.max_layers is not None and i >= args.max_layers:
+            break
+        for lanes in args.lanes:
+            result = simulate_layer(input_array, prob_table, args.symbols_per_cycle, args.renorm_bits, lanes,
+                                    args.lookup_latency, args.clock, args.bandwidth)
+            rows.append({'Model_Name': row['Model Name'], 'Layer_Number': row['Layer Number'], 'Type': row['Type'], **result})
+
+    print_encoded_summary_table(rows)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    output_summary_to_csv(rows, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+import json
+import os
+import struct
+
+import numpy as np
+
+from bitpack import pack_bits, pack_varwidth, unpack_bits, unpack_varwidth
+
+# Encoded archive layout:
+#   MAGIC (4 bytes) | version (u32) | index offset (u64) | index length (u64)
+#   per layer: packed symbol stream, then packed offset stream
+#   JSON index (one entry per layer, including its probability table) at the end
+MAGIC = b'ATEA'
+VERSION = 1
+HEADER = struct.Struct('<4sIQQ')
+TABLE_FIELDS = ('v_min', 'v_max', 'OL', 't_low', 't_high')
+WRITE_BUFFER = 1 << 20
+
+
+def pack_layer(symbol_stream, offset_stream, offset_length_stream):
+    """
+    Packs the streams produced by `AtalantaEncoder.finalize()`.
+
+    The symbol stream is stored one bit per bit and every offset on its own OL bits.
+    The offset length stream itself is not stored: the decoder recovers each OL from
+    the table row of the decoded symbol.
+
+    The byte-wise range coder and rANS backends hand over their symbol streams as bytes,
+    which are stored as they are.
+
+    Returns:
+        dict: 'symbol_bits' and 'offset_bits' (stream lengths in bits) and the packed
+            'symbol_data' and 'offset_data' bytes.
+    """
+    if isinstance(symbol_stream, (bytes, bytearray)):
+        symbol_bits, symbol_data = 8 * len(symbol_stream), bytes(symbol_stream)
+    else:
+        symbol_bits, symbol_data = len(symbol_stream), pack_bits(symbol_stream)
+    return {
+        'symbol_bits': symbol_bits,
+        'offset_bits': int(np.sum(offset_length_stream, dtype=np.int64)),
+        'symbol_data': symbol_data,
+        'offset_data': pack_varwidth(offset_stream, offset_length_stream),
+    }
+
+
+def read_index(file):
+    # Entries of an archive opened in binary mode, or None if the file is not a complete archive
+    header = file.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return None
+    magic, version, index_offset, index_length = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION or index_offset == 0:
+        return None
+    file.seek(index_offset)
+    return json.loads(file.read(index_length))['layers'], index_offset + index_length
+
+def write_index(file, position, entries):
+    # Writes the index at `position`, then repoints the header at it
+    index = json.dumps({'layers': entries}).encode()
+    file.seek(position)
+    file.write(index)
+    file.flush()
+    file.seek(0)
+    file.write(HEADER.pack(MAGIC, VERSION, position, len(index)))
+    file.flush()
+    return len(index)
+
+def payload_size(entry):
+    # Bytes taken by the packed streams of one layer
+    return -(-entry['symbol_bits'] // 8) + -(-entry['offset_bits'] // 8)
+
+def output_location(path, entry):
+    # Where a layer went, as recorded in run manifests; stable across compaction
+    return {'path': path, 'symbol_bits': entry['symbol_bits'], 'offset_bits': entry['offset_bits']}
+
+
+class EncodedArchiveWriter:
+    """
+    Writes the packed Atalanta streams of many layers into one archive file through a
+    single buffered handle.
+
+    Layers are appended to the file in place. `checkpoint()` writes an index after the
+    last layer and only then repoints the header at it, so the file on disk is always a
+    complete archive of the layers written up to the last checkpoint. With `resume=True`
+    an existing archive is kept and new layers replace or extend its entries; `close()`
+    compacts away replaced layers and superseded indexes.
+
+    Attributes:
+        path (str): The path of the archive.
+        entries (dict): (model, layer, type) -> index entry of every live layer.
+    """
+
+    def __init__(self, path, resume=False):
+        """
+        Opens an archive for writing.
+
+        Args:
+            path (str): Where the archive is written.
+            resume (bool): Keep the layers of an existing archive at `path`.
+        """
+        self.path = path
+        self.entries = {}
+        index = None
+        if resume and os.path.exists(path):
+            with open(path, 'rb') as file:
+                index = read_index(file)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if index is None:
+            self.file = open(path, 'wb', buffering=WRITE_BUFFER)
+            self.file.write(HEADER.pack(MAGIC, VERSION, 0, 0))
+            self.position = HEADER.size
+        else:
+            layers, end = index
+            self.entries = {(e['model'], e['layer'], e['type']): e for e in layers}
+            self.file = open(path, 'r+b', buffering=WRITE_BUFFER)
+            self.file.seek(end)
+            self.position = end
+
+    def holds(self, model, layer_name, vtype, output):
+        """
+        True if the archive holds the layer as described by `output_location(entry)`.
+        """
+        entry = self.entries.get((model, layer_name, vtype))
+        return entry is not None and output_location(self.path, entry) == output
+
+    def add(self, model, layer_name, vtype, n_values, packed, prob_table, backend='bit16'):
+        """
+        Appends the encoded streams of one layer, replacing any previous version of it.
+
+        Args:
+            model (str): The model name.
+            layer_name (str): The layer name.
+            vtype (str): The value type ('weights' or 'activations').
+            n_values (int): How many values were encoded.
+            packed (dict): The result of `pack_layer`.
+            prob_table (list): The probability table the layer was encoded with.
+            backend (str): The coder that wrote the symbol stream ('bit16', 'range32' or 'rans').
+
+        Returns:
+            dict: The index entry of the layer.
+        """
+        entry = {
+            'model': model,
+            'layer': layer_name,
+            'type': vtype,
+            'n_values': int(n_values),
+            'symbol_bits': packed['symbol_bits'],
+            'offset_bits': packed['offset_bits'],
+            'symbol_offset': self.position,
+            'offset_offset': self.position + len(packed['symbol_data']),
+            'table': [{k: int(row[k]) for k in TABLE_FIELDS} for row in prob_table],
+            'backend': backend,
+        }
+        self.entries[(model, layer_name, vtype)] = entry
+        self.file.write(packed['symbol_data'])
+        self.file.write(packed['offset_data'])
+        self.position += len(packed['symbol_data']) + len(packed['offset_data'])
+        return entry
+
+    def checkpoint(self):
+        """
+        Makes every layer added so far durable. New layers go after the new index, so
+        the previous index stays valid until the header points past it.
+        """
+        self.position += write_index(self.file, self.position, list(self.entries.values()))
+        self.file.seek(self.position)
+
+    def close(self, order=None):
+        """
+        Finishes the archive. If replaced layers, old indexes or layers missing from
+        `order` left dead space, the live layers are copied into a fresh file.
+
+        Args:
+            order (list, optional): (model, layer, type) keys in the order the index should
+                list them; layers not in it are dropped.
+        """
+        keys = list(self.entries) if order is None else [k for k in order if k in self.entries]
+        entries = [self.entries[k] for k in keys]
+        live = HEADER.size + sum(payload_size(e) for e in entries)
+        in_order = all(a['symbol_offset'] < b['symbol_offset'] for a, b in zip(entries, entries[1:]))
+        if live == self.position and in_order:
+            write_index(self.file, self.position, entries)
+            self.file.close()
+            return
+
+        # Compact: copy the live layers, in order, into a new file and swap it in.
+        self.file.flush()
+        tmp_path = self.path + '.tmp'
+        with open(self.path, 'rb') as old, open(tmp_path, 'wb', buffering=WRITE_BUFFER) as new:
+            new.write(HEADER.pack(MAGIC, VERSION, 0, 0))
+            position = HEADER.size
+            compacted = []
+            for entry in entries:
+                old.seek(entry['symbol_offset'])
+                data = old.read(payload_size(entry))
+                entry = dict(entry, symbol_offset=position,
+                             offset_offset=position + entry['offset_offset'] - entry['symbol_offset'])
+                new.write(data)
+                position += len(data)
+                compacted.append(entry)
+            write_index(new, position, compacted)
+        self.file.close()
+        os.replace(tmp_path, self.path)
+        self.entries = {(e['model'], e['layer'], e['type']): e for e in compacted}
+
+    def __enter__(self):
+        return self
+
+    def close_partial(self):
+        """
+        Closes an interrupted archive, keeping every layer written so far as a valid archive.
+        """
+        self.checkpoint()
+        self.file.close()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.close_partial()
+
+
+class EncodedArchive:
+    """
+    Read-only view of an encoded archive.
+
+    Attributes:
+        path (str): The path of the archive.
+        entries (list): One index entry per layer, in write order.
+    """
+
+    def __init__(self, path):
+        """
+        Opens an existing archive.
+
+        Raises:
+            ValueError: If the file is not an encoded archive.
+        """
+        self.path = path
+        with open(path, 'rb') as file:
+            index = read_index(file)
+        if index is None:
+            raise ValueError(f"{path} is not a complete version {VERSION} encoded archive.")
+        self.entries = index[0]
+        self.data = np.memmap(path, dtype=np.uint8, mode='r')
+        self.by_key = {(e['model'], e['layer'], e['type']): e for e in self.entries}
+
+    def symbol_stream(self, entry):
+        """
+        Returns the symbol stream of a layer as a uint8 array of 0/1 bits (for layers of
+        the 'range32' and 'rans' backends, the bits of their bytes).
+        """
+        start = entry['symbol_offset']
+        return unpack_bits(self.data[start:entry['offset_offset']], entry['symbol_bits'])
+
+    def offset_stream(self, entry, offset_length_stream):
+        """
+        Returns the offsets of a layer, given the OL of every decoded symbol.
+        """
+        start = entry['offset_offset']
+        end = start + -(-entry['offset_bits'] // 8)
+        return unpack_varwidth(np.unpackbits(self.data[start:end]), offset_length_stream)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
@@ -1,3 +1,5 @@
+import numpy as np
+
 class ProbabilityModel:
     """
     A class representing the probability model used for encoding in Atalanta.
@@ -5,6 +7,7 @@ class ProbabilityModel:
     Attributes:
         PCNT (list): The probability model containing entries for the symbols.
     """
+    __slots__ = ('PCNT',)
     
     def __init__(self, model):
         """
@@ -33,6 +36,48 @@ class ProbabilityModel:
             # If no match is found, return None.
             return None
         
+    def row_lookup(self, size=256):
+        """
+        Builds a lookup table from every value to the index of its probability model entry,
+        using the same first-match rule as `get_probability_of_symbol`.
+
+        Args:
+            size (int): How many values (0 to size - 1) the lookup covers.
+
+        Returns:
+            np.ndarray: The entry index of each value, or -1 for values no entry covers.
+        """
+        lookup = np.full(size, -1, dtype=np.int64)
+        # Walk the entries backwards so earlier entries overwrite later ones.
+        for i in range(len(self.PCNT) - 1, -1, -1):
+            entry = self.PCNT[i]
+            lo = max(int(entry['v_min']), 0)
+            hi = min(int(entry['v_max']), size - 1)
+            if lo <= hi:
+                lookup[lo:hi + 1] = i
+        return lookup
+
+    def check_decodable(self, values):
+        """
+        Checks that a stream of `values` coded with this model can be decoded. A value in
+        a row with an empty probability range (t_high <= t_low) still encodes, but no
+        decoder can recover it.
+
+        Args:
+            values (np.ndarray): The values to be coded.
+
+        Raises:
+            ValueError: If a value falls in a row with an empty probability range.
+        """
+        values = np.asarray(values, dtype=np.int64).ravel()
+        empty = [i for i, entry in enumerate(self.PCNT) if int(entry['t_high']) <= int(entry['t_low'])]
+        if not empty or values.size == 0:
+            return
+        lookup = self.row_lookup(max(int(entry['v_max']) for entry in self.PCNT) + 1)
+        if np.any(np.isin(lookup[values[(values >= 0) & (values < lookup.size)]], empty)):
+            raise ValueError("Values fall in table rows with an empty probability range; "
+                             "the stream could not be decoded.")
+
     def get_symbol_from_probability_range(self, value, high, low):
         """
         Retrieves the probability model entry based on the current encoding range (LOW to HIGH).
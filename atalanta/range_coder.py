@@ -0,0 +1,235 @@
+import numpy as np
+
+from probability_table import ProbabilityModel
+
+# A byte-wise range coder for the Atalanta tables, for fast software coding (archival,
+# analysis). The range is 32 bits wide and renormalized a byte at a time, with carries
+# propagated through pending 0xFF bytes as in LZMA. The symbol stream differs from the
+# hardware-faithful 16-bit coder of atalanta_encode.py; the offset stream is the same.
+TOP = 1 << 24  # Renormalize once the range drops below this
+PROB_BITS = 10  # t_low/t_high are scaled by 2^10
+
+
+def row_ranges(table):
+    # t_low and width of the probability range of every table row
+    t_low = np.array([int(entry['t_low']) for entry in table], dtype=np.int64)
+    return t_low, np.array([int(entry['t_high']) for entry in table], dtype=np.int64) - t_low
+
+def symbol_rows(model, input_stream):
+    """
+    Looks up the table row, offset and offset length of every symbol, vectorized.
+
+    Args:
+        model (ProbabilityModel): The probability model.
+        input_stream (list or np.ndarray): The symbols.
+
+    Returns:
+        tuple: The row, the offset and the offset length (OL) of every symbol (np.ndarray).
+
+    Raises:
+        ValueError: If a symbol is not found in the probability model, its offset is
+            larger than OL, or its row has an empty probability range (which the
+            bit-serial coder would encode undecodably).
+    """
+    table = model.PCNT
+    values = np.asarray(input_stream, dtype=np.int64).ravel()
+    if values.size and values.min() < 0:
+        raise ValueError(f"Character {values.min()} not found in the probability model.")
+    v_max = max(int(entry['v_max']) for entry in table)
+    rows = model.row_lookup(max(v_max, int(values.max()) if values.size else 0) + 1)[values]
+    if np.any(rows < 0):
+        raise ValueError(f"Character {values[rows < 0][0]} not found in the probability model.")
+    v_min = np.array([int(entry['v_min']) for entry in table], dtype=np.int64)
+    OL = np.array([int(entry['OL']) for entry in table], dtype=np.int64)
+    freq = row_ranges(table)[1]
+    offsets = values - v_min[rows]
+    too_long = (offsets >> OL[rows]) != 0
+    if np.any(too_long):
+        raise ValueError(f"Offset {offsets[too_long][0]} is larger than OL.")
+    if np.any(freq[rows] <= 0):
+        raise ValueError(f"Character {values[freq[rows] <= 0][0]} falls in a row with an empty probability range.")
+    return rows, offsets, OL[rows]
+
+def scaled_rows(table):
+    # Row of every scaled value 0 to 2^PROB_BITS - 1 (-1 where none); walking backwards lets the first matching row win
+    t_low, freq = row_ranges(table)
+    lookup = np.full(1 << PROB_BITS, -1, dtype=np.int64)
+    for i in range(len(table) - 1, -1, -1):
+        lookup[max(t_low[i], 0):max(min(t_low[i] + freq[i], 1 << PROB_BITS), 0)] = i
+    return lookup
+
+
+class AtalantaRangeEncoder:
+    """
+    An Atalanta encoder with a 32-bit range coder backend.
+
+    It takes the same probability tables and produces the same offset streams as
+    `AtalantaEncoder`; only the symbol stream is coded differently, as bytes.
+
+    Attributes:
+        low (int): The low end of the range; bit 32 holds a pending carry.
+        range (int): The width of the range.
+        cache (int): The last byte not yet written, which a carry may still increment.
+        cache_size (int): The cached byte plus the pending 0xFF bytes behind it.
+        CODE_out (bytearray): The symbol stream, including the leading byte every range
+            coder stream starts with (always 0, dropped by `finalize`).
+        OFS_out (list): Arrays of offsets, one per `encode_symbols` call.
+        OFS_r (list): Arrays of offset lengths, one per `encode_symbols` call.
+        UBC_events (int): Always 0; a range coder has no underflow, only carries.
+        max_UBC (int): Always 0.
+        PCNT (ProbabilityModel): The probability model used for encoding.
+    """
+    __slots__ = ('low', 'range', 'cache', 'cache_size', 'CODE_out', 'OFS_out', 'OFS_r', 'UBC_events', 'max_UBC', 'PCNT')
+    FLUSH_BITS = 32  # Symbol stream bits written by `flush`
+
+    def __init__(self, model):
+        """
+        Args:
+            model (list): The probability model to use for encoding.
+        """
+        self.low = 0
+        self.range = 0xFFFFFFFF
+        self.cache = 0
+        self.cache_size = 1
+        self.CODE_out = bytearray()
+        self.OFS_out = []
+        self.OFS_r = []
+        self.UBC_events = 0
+        self.max_UBC = 0
+        self.PCNT = ProbabilityModel(model)
+
+    def encode(self, input_stream):
+        """
+        Encodes an input stream of symbols and terminates the stream.
+
+        Raises:
+            ValueError: If a symbol is not found in the probability model, its offset is
+                larger than OL, or its row has an empty probability range.
+        """
+        self.encode_symbols(input_stream)
+        self.flush()
+
+    def encode_symbols(self, input_stream):
+        """
+        Encodes symbols with the current model without terminating the stream.
+
+        Table rows, offsets and their checks are computed vectorized; only the range
+        update runs per symbol, on local variables.
+
+        Raises:
+            ValueError: If a symbol is not found in the probability model, its offset is
+                larger than OL, or its row has an empty probability range (which the
+                bit-serial coder would encode undecodably).
+        """
+        rows, offsets, lengths = symbol_rows(self.PCNT, input_stream)
+        self.OFS_out.append(offsets)
+        self.OFS_r.append(lengths)
+
+        t_low, freq = row_ranges(self.PCNT.PCNT)
+        t_low = t_low.tolist()
+        freq = freq.tolist()
+        low, rng, cache, cache_size = self.low, self.range, self.cache, self.cache_size
+        out = self.CODE_out
+        for r in rows.tolist():
+            q = rng >> PROB_BITS
+            low += q * t_low[r]
+            rng = q * freq[r]
+            while rng < TOP:
+                rng <<= 8
+                # Shift the top byte of low out: write it once no carry can reach it
+                if low < 0xFF000000 or low > 0xFFFFFFFF:
+                    carry = low >> 32
+                    out.append((cache + carry) & 0xFF)
+                    if cache_size > 1:
+                        out.extend(bytes([(0xFF + carry) & 0xFF]) * (cache_size - 1))
+                    cache_size = 0
+                    cache = (low >> 24) & 0xFF
+                cache_size += 1
+                low = (low & 0xFFFFFF) << 8
+        self.low, self.range, self.cache, self.cache_size = low, rng, cache, cache_size
+
+    def flush(self):
+        """
+        Terminates the stream by shifting out all of low (and the pending bytes).
+        """
+        out = self.CODE_out
+        for _ in range(5):
+            low = self.low
+            if low < 0xFF000000 or low > 0xFFFFFFFF:
+                carry = low >> 32
+                out.append((self.cache + carry) & 0xFF)
+                out.extend(bytes([(0xFF + carry) & 0xFF]) * (self.cache_size - 1))
+                self.cache_size = 0
+                self.cache = (low >> 24) & 0xFF
+            self.cache_size += 1
+            self.low = (low & 0xFFFFFF) << 8
+
+    def count(self, input_stream):
+        # Bytes are cheap to produce here, so the bits are counted on a full encode
+        self.encode(input_stream)
+        symbol_stream, _, offset_length_stream = self.finalize()
+        return 8 * len(symbol_stream), 0, int(np.sum(offset_length_stream, dtype=np.int64))
+
+    def finalize(self):
+        """
+        Returns the resulting streams.
+
+        Returns:
+            tuple: The symbol stream (bytes), the offset stream and the offset length
+                stream (np.ndarray).
+        """
+        offsets = np.concatenate(self.OFS_out) if self.OFS_out else np.zeros(0, dtype=np.int64)
+        lengths = np.concatenate(self.OFS_r) if self.OFS_r else np.zeros(0, dtype=np.int64)
+        return bytes(self.CODE_out[1:]), offsets, lengths
+
+
+class AtalantaRangeDecoder:
+    """
+    Decodes the symbol stream of an `AtalantaRangeEncoder` into table rows.
+
+    Attributes:
+        PCNT (list): The probability table the stream was encoded with.
+    """
+    __slots__ = ('PCNT',)
+
+    def __init__(self, PCNT):
+        self.PCNT = PCNT
+
+    def decode_rows(self, data, n_symbols):
+        """
+        Decodes the table row of every symbol.
+
+        Args:
+            data (bytes): The symbol stream.
+            n_symbols (int): How many symbols to decode.
+
+        Returns:
+            list: The row index of every decoded symbol.
+
+        Raises:
+            ValueError: If a scaled value matches no range of the table.
+        """
+        data = bytes(data)
+        n_bytes = len(data)
+        t_low, freq = (ranges.tolist() for ranges in row_ranges(self.PCNT))
+        scaled_row = scaled_rows(self.PCNT).tolist()
+
+        # The encoder dropped the leading zero byte, so the first 4 bytes fill the code
+        code = int.from_bytes(data[:4].ljust(4, b'\0'), 'big')
+        position = 4
+        rng = 0xFFFFFFFF
+        rows = []
+        for _ in range(n_symbols):
+            q = rng >> PROB_BITS
+            scaled = code // q
+            r = scaled_row[scaled] if scaled < 1 << PROB_BITS else -1
+            if r < 0:
+                raise ValueError(f"Scaled value {scaled} does not match any range in PCNT.")
+            rows.append(r)
+            code -= q * t_low[r]
+            rng = q * freq[r]
+            while rng < TOP:
+                code = (code << 8) | (data[position] if position < n_bytes else 0)
+                position += 1
+                rng <<= 8
+        return rows
@@ -0,0 +1,175 @@
+import numpy as np
+
+from probability_table import ProbabilityModel
+from range_coder import PROB_BITS, row_ranges, scaled_rows, symbol_rows
+
+# An interleaved rANS coder for the Atalanta tables, for storage where decode speed
+# matters more than hardware fidelity. Symbol i is coded on state i % n_states; each
+# state is 32 bits, kept in [RANS_L, 2^32) by renormalizing 16 bits at a time, so a
+# decode step reads at most one word per state and all states decode as one vector.
+# Probabilities are the table's t_low/t_high, scaled by 2^PROB_BITS = 1024.
+RANS_L = 1 << 16
+WORD_BITS = 16
+N_STATES = 32
+STATE_BYTES = 4
+
+
+class AtalantaRansEncoder:
+    """
+    An Atalanta encoder with an interleaved rANS backend.
+
+    It takes the same probability tables and produces the same offset streams as
+    `AtalantaEncoder`. rANS codes in reverse, so the whole stream is coded by `encode`;
+    there is no incremental `encode_symbols`. Every row the stream uses needs a non-empty
+    range, as in the tables probability_table_gen writes (see `contiguous_ranges`).
+
+    Attributes:
+        n_states (int): The number of interleaved states.
+        CODE_out (bytes): The symbol stream: the final states, then the 16-bit words.
+        OFS_out (np.ndarray): The offsets.
+        OFS_r (np.ndarray): The offset lengths.
+        UBC_events (int): Always 0; rANS has no underflow.
+        max_UBC (int): Always 0.
+        PCNT (ProbabilityModel): The probability model used for encoding.
+    """
+    __slots__ = ('n_states', 'CODE_out', 'OFS_out', 'OFS_r', 'UBC_events', 'max_UBC', 'PCNT')
+
+    def __init__(self, model, n_states=N_STATES):
+        """
+        Args:
+            model (list): The probability model to use for encoding.
+            n_states (int): The number of interleaved states.
+        """
+        self.n_states = n_states
+        self.CODE_out = b''
+        self.OFS_out = np.zeros(0, dtype=np.int64)
+        self.OFS_r = np.zeros(0, dtype=np.int64)
+        self.UBC_events = 0
+        self.max_UBC = 0
+        self.PCNT = ProbabilityModel(model)
+
+    @property
+    def FLUSH_BITS(self):
+        # Symbol stream bits of the final states
+        return 8 * STATE_BYTES * self.n_states
+
+    def encode(self, input_stream):
+        """
+        Encodes an input stream of symbols.
+
+        The symbols are coded last to first, each state renormalizing before it codes
+        a symbol; the words come out in reverse of the order the decoder reads them.
+
+        Raises:
+            ValueError: If a symbol is not found in the probability model, its offset is
+                larger than OL, or its row has an empty probability range.
+        """
+        rows, self.OFS_out, self.OFS_r = symbol_rows(self.PCNT, input_stream)
+        t_low, freq = row_ranges(self.PCNT.PCNT)
+        # A state at or above this would pass 2^32 when coding the row
+        x_max = (((RANS_L >> PROB_BITS) << WORD_BITS) * freq).tolist()
+        t_low = t_low.tolist()
+        freq = freq.tolist()
+
+        n_states = self.n_states
+        states = [RANS_L] * n_states
+        words = []
+        rows = rows.tolist()
+        for i in range(len(rows) - 1, -1, -1):
+            r = rows[i]
+            j = i % n_states
+            x = states[j]
+            if x >= x_max[r]:
+                words.append(x & 0xFFFF)
+                x >>= WORD_BITS
+            f = freq[r]
+            states[j] = ((x // f) << PROB_BITS) + x % f + t_low[r]
+        words.reverse()
+        self.CODE_out = np.array(states, dtype='<u4').tobytes() + np.array(words, dtype='<u2').tobytes()
+
+    def count(self, input_stream):
+        # The words are only known after coding, so the bits are counted on a full encode
+        self.encode(input_stream)
+        return 8 * len(self.CODE_out), 0, int(np.sum(self.OFS_r, dtype=np.int64))
+
+    def finalize(self):
+        """
+        Returns the resulting streams.
+
+        Returns:
+            tuple: The symbol stream (bytes), the offset stream and the offset length
+                stream (np.ndarray).
+        """
+        return self.CODE_out, self.OFS_out, self.OFS_r
+
+
+class AtalantaRansDecoder:
+    """
+    Decodes the symbol stream of an `AtalantaRansEncoder` into table rows.
+
+    Every step decodes one symbol on each state with NumPy: the low PROB_BITS of the
+    states pick their rows by table lookup, and the states that drop below RANS_L read
+    the next words in state order. More states mean fewer steps (faster decode) at
+    32 bits of final state each.
+
+    Attributes:
+        PCNT (list): The probability table the stream was encoded with.
+        n_states (int): The number of interleaved states.
+    """
+    __slots__ = ('PCNT', 'n_states')
+
+    def __init__(self, PCNT, n_states=N_STATES):
+        self.PCNT = PCNT
+        self.n_states = n_states
+
+    def decode_rows(self, data, n_symbols):
+        """
+        Decodes the table row of every symbol.
+
+        Args:
+            data (bytes): The symbol stream.
+            n_symbols (int): How many symbols to decode.
+
+        Returns:
+            np.ndarray: The row index of every decoded symbol.
+
+        Raises:
+            ValueError: If a state matches no range of the table, or the stream is
+                shorter than the symbols require.
+        """
+        n_states = self.n_states
+        header = n_states * STATE_BYTES
+        if len(data) < header or (len(data) - header) % 2:
+            raise ValueError(f"rANS stream of {len(data)} bytes does not fit {n_states} states.")
+        states = np.frombuffer(data, dtype='<u4', count=n_states).astype(np.int64)
+        words = np.frombuffer(data, dtype='<u2', offset=header).astype(np.int64)
+        # Per scaled value: its row, and the width and bias that step a state past it
+        t_low, freq = row_ranges(self.PCNT)
+        scaled_row = scaled_rows(self.PCNT)
+        slot_freq = np.where(scaled_row >= 0, freq[scaled_row], 0)
+        slot_bias = np.arange(1 << PROB_BITS) - t_low[scaled_row]
+        mask = (1 << PROB_BITS) - 1
+
+        n_steps = -(-n_symbols // n_states)
+        slots = np.empty((n_steps, n_states), dtype=np.int64)
+        position = 0
+        x = states
+        for step in range(n_steps):
+            if step == n_steps - 1:
+                x = x[:n_symbols - step * n_states]  # The last step may not use every state
+            slot = x & mask
+            slots[step, :slot.size] = slot
+            x = slot_freq[slot] * (x >> PROB_BITS) + slot_bias[slot]
+            low = x < RANS_L
+            n_reads = int(np.count_nonzero(low))
+            if n_reads:
+                if position + n_reads > words.size:
+                    raise ValueError("rANS stream ended before all symbols were decoded.")
+                x[low] = (x[low] << WORD_BITS) | words[position:position + n_reads]
+                position += n_reads
+
+        slots = slots.ravel()[:n_symbols]
+        rows = scaled_row[slots]
+        if np.any(rows < 0):
+            raise ValueError(f"Scaled value {slots[rows < 0][0]} does not match any range in PCNT.")
+        return rows
@@ -1,120 +1,467 @@
 import numpy as np
-import pandas as pd
 import os
-import dask.dataframe as dd
+import sys
+import argparse
+import time
+import multiprocessing as mp
 import csv
-from tabulate import tabulate
+from functools import partial
+
+from atalanta_encode import AtalantaEncoder
+from probability_table import ProbabilityModel
+from encoded_archive import EncodedArchiveWriter, output_location, pack_layer
+from range_coder import AtalantaRangeEncoder
+from rans_coder import AtalantaRansEncoder
+from table_store import TableStore
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_DIR = '/content/drive/MyDrive/CSCE_614/Project'
+sys.path.append(os.path.join(REPO_ROOT, 'comparison'))
+from sampled_estimate import estimate_compressed_bits, estimate_summary, print_model_estimates
+sys.path.append(os.path.join(REPO_ROOT, 'data_prep'))
+from run_manifest import RunManifest, hash_params, hash_values
+from profiling import StageTimer, write_rows
+from async_pipeline import QUEUE_DEPTH, print_stage_utilization, run_pipeline
+
+# Symbol coder backends: the hardware-faithful 16-bit bit-serial coder, the byte-wise
+# 32-bit range coder for fast software runs, or interleaved rANS for the fastest decode
+# (all with the same tables and offset streams).
+BACKENDS = {'bit16': AtalantaEncoder, 'range32': AtalantaRangeEncoder, 'rans': AtalantaRansEncoder}
+
+def filename_to_key(filename):
+    # Remove the prefix and suffix
+    base_name = filename.removeprefix("pt_").removesuffix(".csv")
+    # Split the remaining part into components
+    #parts = base_name.split("_")
+    return base_name
+
+def csv_to_dict(csv_path):
+    import pandas as pd
+
+    # Load the CSV into a DataFrame
+    df = pd.read_csv(csv_path)
+    # Convert the DataFrame to a list of dictionaries
+    data_dict = df.to_dict(orient='records')
+    return data_dict
+
+
+def get_probability_tables(path):
+    # A consolidated table store is opened lazily; tables decode on first use
+    if os.path.isfile(path):
+        return TableStore(path)
+
+    csv_paths = []
+    pt_dict = dict()
+    # Ensure the path exists
+    if os.path.exists(path):
+        # Get list of all files and directories in the specified path
+        files_and_dirs = os.listdir(path)
+
+        # Filter out directories to get only files
+        csv_paths = [f for f in files_and_dirs if os.path.isfile(os.path.join(path, f))]
+
+    else:
+        print(f"The specified path '{path}' does not exist.")
+    for csv_path in csv_paths:
+        pt_dict[filename_to_key(csv_path)] = csv_to_dict(os.path.join(path, csv_path))
+    return pt_dict
+
+def run_quantization(input_array):
+    # Handle non-finite values
+    input_array = np.nan_to_num(input_array, nan=0, posinf=255, neginf=0)
+
+    # Normalize to 0-255 range and convert to uint8
+    input_array = ((input_array - input_array.min()) / (input_array.max() - input_array.min()) * 255).astype(np.uint8)
+
+    return input_array
+
+def run_atalanta(input_stream, prob_table):
+    # Initialize the encoder
+    encoder = AtalantaEncoder(prob_table)
+
+    # Run the encoder
+    encoder.encode(input_stream.tolist())
+
+    # Finalize the encoding process
+    symbol_stream, offset_stream, offset_length_stream = encoder.finalize()
+
+    return symbol_stream, offset_stream, offset_length_stream
+
+def count_atalanta(input_stream, prob_table, backend='bit16'):
+    # Symbol and offset stream lengths in bits, without building the streams
+    symbol_bits, underflow_bits, offset_bits = BACKENDS[backend](prob_table).count(input_stream)
+    return symbol_bits, offset_bits
+
+def atalanta_size(input_stream, prob_table, backend='bit16'):
+    # Compressed size in bits: symbol stream plus offset stream
+    return sum(count_atalanta(input_stream, prob_table, backend))
+
+def print_encoded_summary_table(summary_table):
+    from tabulate import tabulate
+
+    # Convert rows to tabulate format
+    table = [list(row.values()) for row in summary_table]
+    headers = summary_table[0].keys()  # Use keys of the first row as headers
+
+    # Pretty-print the table
+    print(tabulate(table, headers=headers, tablefmt="grid"))
+
+def output_summary_to_csv(csv_table, output_file):
+
+    # Write to the CSV file
+    with open(output_file, mode='w', newline='') as file:
+        # Create a CSV DictWriter object
+        writer = csv.DictWriter(file, fieldnames=csv_table[0].keys())
 
+        # Write the header row
+        writer.writeheader()
 
-def main():
-
-    def filename_to_key(filename):
-        # Remove the prefix and suffix
-        base_name = filename.removeprefix("pt_").removesuffix(".csv")
-        # Split the remaining part into components
-        #parts = base_name.split("_")
-        return base_name
-
-    def csv_to_dict(csv_path):
-        # Load the CSV into a DataFrame
-        df = pd.read_csv(csv_path)
-        # Convert the DataFrame to a list of dictionaries
-        data_dict = df.to_dict(orient='records')
-        return data_dict
-
-
-    def get_probability_tables(path):
-        csv_paths = []
-        pt_dict = dict()
-        # Ensure the path exists
-        if os.path.exists(path):
-            # Get list of all files and directories in the specified path
-            files_and_dirs = os.listdir(path)
-
-            # Filter out directories to get only files
-            csv_paths = [f for f in files_and_dirs if os.path.isfile(os.path.join(path, f))]
-
-        else:
-            print(f"The specified path '{path}' does not exist.")
-        for csv_path in csv_paths:
-            pt_dict[filename_to_key(csv_path)] = csv_to_dict(os.path.join(path, csv_path))
-        return pt_dict
-
-    def run_quantization(input_array):
-        # Handle non-finite values
-        input_array = np.nan_to_num(input_array, nan=0, posinf=255, neginf=0)
-
-        # Normalize to 0-255 range and convert to uint8
-        input_array = ((input_array - input_array.min()) / (input_array.max() - input_array.min()) * 255).astype(np.uint8)
-
-        return input_array
-
-    def add_row_to_csv(row, output_file):
-        # Append the row to the file
-        with open(output_file, mode='a', newline='') as file:
-            writer = csv.DictWriter(file, fieldnames=['Model_Name', 'Layer', 'Type', 'Symbol_Stream', 'Offset_Stream', 'Offset_Length_Stream'])
+        # Write each row
+        for row in csv_table:
             writer.writerow(row)
 
-    def run_atalanta(input_stream, prob_table):
-        # Initialize the encoder
-        encoder = AtalantaEncoder(prob_table)
-
-        # Run the encoder
-        encoder.encode(input_stream.tolist())
-
-        # Finalize the encoding process
-        symbol_stream, offset_stream, offset_length_stream = encoder.finalize()
-
-        return symbol_stream, offset_stream, offset_length_stream
-
-    def print_encoded_summary_table(summary_table):
-
-        # Convert rows to tabulate format
-        table = [list(row.values()) for row in summary_table]
-        headers = summary_table[0].keys()  # Use keys of the first row as headers
-
-        # Pretty-print the table
-        print(tabulate(table, headers=headers, tablefmt="grid"))
-
-    def output_summary_to_csv(csv_table, output_file):
-
-        # Write to the CSV file
-        with open(output_file, mode='w', newline='') as file:
-            # Create a CSV DictWriter object
-            writer = csv.DictWriter(file, fieldnames=csv_table[0].keys())
-
-            # Write the header row
-            writer.writeheader()
-
-            # Write each row
-            for row in csv_table:
-                writer.writerow(row)
+    print(f"Data has been written to {output_file}")
+
+def read_layers(values_csv_path, probability_tables, timer=None):
+    # Yields (row, input_array, prob_table) for every layer of the values CSV
+    timer = timer or StageTimer(enabled=False)
+    with open(values_csv_path, 'r') as csvfile:
+        csvreader = csv.reader(csvfile)
+        headers = next(csvreader)  # Read header row
+
+        while True:
+            with timer.stage('parse'):
+                row_data = next(csvreader, None)
+            if row_data is None:
+                break
+            try:
+                with timer.stage('parse'):
+                    row = {'Model Name':row_data[0] , 'Layer Number':row_data[1], 'Type':row_data[2]}
 
-        print(f"Data has been written to {output_file}")
+                    # Extract numeric values after the first three columns
+                    input_array = np.array(row_data[3:], dtype=np.uint8)
 
+                # Get the probability table
+                with timer.stage('table_lookup'):
+                    pt_file_name = f"{row['Model Name']}_{row['Layer Number']}_{row['Type']}"
+                    prob_table = probability_tables[pt_file_name]
+            except Exception as e:
+                print(f"Error processing row: {e}")
+                continue
+            yield row, input_array, prob_table
+
+def layer_counters(row, encoder, input_array, symbol_bits, offset_bits):
+    """
+    Collects the coder counters of one encoded layer.
+
+    Renormalization shifts are not tallied separately: every shift emits one bit
+    (directly or as a pending underflow bit) and the final flush emits FLUSH_BITS more.
+    For the range coder backend a shift is a byte and for rANS a 16-bit word, so
+    'Renorm_Bits' counts 8 or 16 per shift.
+
+    Args:
+        row (dict): The layer metadata ('Model Name', 'Layer Number', 'Type').
+        encoder: The encoder of the layer's backend (see BACKENDS) after `encode` or
+            `count`.
+        input_array (np.ndarray): The layer values.
+        symbol_bits (int): Length of the symbol stream.
+        offset_bits (int): Length of the offset stream.
+
+    Returns:
+        dict: Symbols, symbol and offset bits, renormalization bits, underflow events,
+            the peak of pending underflow bits, and the symbols coded with each table row.
+    """
+    table = encoder.PCNT.PCNT
+    values = np.asarray(input_array, dtype=np.int64)
+    v_max = max(int(entry['v_max']) for entry in table)
+    rows = encoder.PCNT.row_lookup(max(v_max, int(values.max()) if values.size else 0) + 1)[values]
+    per_row = np.bincount(rows, minlength=len(table))
+
+    counters = {
+        'Model_Name': row['Model Name'],
+        'Layer_Number': row['Layer Number'],
+        'Type': row['Type'],
+        'Symbols': len(values),
+        'Symbol_Bits': symbol_bits,
+        'Offset_Bits': offset_bits,
+        'Renorm_Bits': symbol_bits - encoder.FLUSH_BITS,
+        'Underflow_Events': encoder.UBC_events,
+        'Max_Pending_Underflow': encoder.max_UBC,
+        'Symbol_Bits_per_Value': symbol_bits / len(values) if len(values) else 0.0,
+    }
+    for i, n_symbols in enumerate(per_row.tolist()):
+        counters[f'Row_{i}_Symbols'] = n_symbols
+    return counters
+
+def encode_layer(row, input_array, prob_table, estimate_args=None, count_only=False, instrument=False, backend='bit16'):
+    """
+    Encodes one layer and builds its summary rows.
+
+    Args:
+        row (dict): The layer metadata ('Model Name', 'Layer Number', 'Type').
+        input_array (np.ndarray): The layer values.
+        prob_table (list): The probability table of the layer; every backend codes with it,
+            so their summaries compare the coders alone.
+        estimate_args (dict, optional): Keyword arguments of `estimate_compressed_bits`.
+            When given, only a sample of the layer is encoded.
+        count_only (bool): Only count the stream lengths; nothing is packed.
+        instrument (bool): Also collect the coder counters and time the coding stages.
+        backend (str): The symbol coder, a key of BACKENDS.
+
+    Returns:
+        dict: 'packed' (the packed streams, None when estimating), 'summary', 'csv_summary',
+            'estimate', 'counters' (see `layer_counters`, None unless instrumented) and
+            'timings' (stage -> seconds, empty unless instrumented).
+    """
+    timer = StageTimer(instrument)
+    # Tables from before probability_table_gen wrote contiguous ranges can leave used rows
+    # empty; such a layer is rejected rather than archived as a stream no one can decode
+    ProbabilityModel(prob_table).check_decodable(input_array)
+    if estimate_args is not None:
+        # Encode a random sample of blocks and extrapolate
+        with timer.stage('encode'):
+            layer_estimate = estimate_compressed_bits(
+                input_array, lambda block: atalanta_size(block, prob_table, backend), **estimate_args)
+        csv_summary = estimate_summary(row, input_array, layer_estimate)
+        return {'packed': None, 'summary': csv_summary, 'csv_summary': csv_summary,
+                'estimate': layer_estimate, 'counters': None, 'timings': timer.seconds}
+
+    encoder = BACKENDS[backend](prob_table)
+    if count_only:
+        # Sizes are all the comparisons need
+        packed = None
+        with timer.stage('encode'):
+            symbol_stream_length, _, offset_length_stream_length = encoder.count(input_array)
+    else:
+        # encode using Atalanta Encoder
+        with timer.stage('encode'):
+            encoder.encode(input_array.tolist())
+            symbol_stream, offset_stream, offset_length_stream = encoder.finalize()
+
+        # Pack the streams here so only bytes travel back from worker processes
+        with timer.stage('pack'):
+            packed = pack_layer(symbol_stream, offset_stream, offset_length_stream)
+        symbol_stream_length = packed['symbol_bits']
+        offset_length_stream_length = packed['offset_bits']
+
+    counters = None
+    if instrument:
+        with timer.stage('counters'):
+            counters = layer_counters(row, encoder, input_array, symbol_stream_length, offset_length_stream_length)
+
+    input_stream_length = len(input_array)
+    input_stream_length_bits = input_stream_length*8
+    compression_ratio = (input_stream_length_bits)/(symbol_stream_length + offset_length_stream_length)
+    compression_percentage = (1-(1/compression_ratio))*100
+
+    output_summary = {
+        'Model_Name': row['Model Name'],
+        'Layer_Number': row['Layer Number'],
+        'Type': row['Type'],
+        'Input_Stream_Length (values)': input_stream_length,
+        'Original_Length (bits)': input_stream_length_bits,
+        'Symbol_Stream_Length (bits)': symbol_stream_length,
+        'Offset_Stream_Length (bits)': offset_length_stream_length,
+        'After Compression (bits)': (symbol_stream_length + offset_length_stream_length),
+        'Compression_Ratio': compression_ratio,
+        'Compression_Percentage': compression_percentage
+        }
+
+    csv_summary = {
+        'Model_Name': row['Model Name'],
+        'Layer_Number': row['Layer Number'],
+        'Type': row['Type'],
+        'Input_Stream_Length (values)': input_stream_length,
+        'Original (bits)': input_stream_length_bits,
+        'After Compression (bits)': (symbol_stream_length + offset_length_stream_length),
+        'Compression_Ratio': compression_ratio,
+        'Compression_Percentage': compression_percentage
+        }
+
+    return {'packed': packed, 'summary': output_summary, 'csv_summary': csv_summary, 'estimate': None,
+            'counters': counters, 'timings': timer.seconds}
+
+def encode_layers(layers, estimate_args=None, count_only=False, instrument=False, backend='bit16'):
+    # Encodes the layers one after another in this process, yielding (layer, result)
+    for layer in layers:
+        try:
+            yield layer, encode_layer(*layer, estimate_args, count_only, instrument, backend)
+        except Exception as e:
+            print(f"Error processing row: {e}")
+
+def encode_planned(plan, estimate_args=None, count_only=False, instrument=False, backend='bit16'):
+    # Encode stage of the asyncio pipeline: the layer of a `plan_layers` plan
+    return encode_layer(*plan['layer'], estimate_args, count_only, instrument, backend)
+
+# Layers of the current parallel run. Forked workers inherit this list from the parent,
+# so the layer arrays are never pickled; other start methods receive it once per worker.
+_worker_layers = []
+_worker_options = (None, False, False, 'bit16')
+
+def _init_worker(layers, options):
+    global _worker_layers, _worker_options
+    _worker_layers = layers
+    _worker_options = options
+
+def _encode_layer_at(index):
+    # Worker side of encode_layers_parallel: only the layer index crosses the process boundary
+    row, input_array, prob_table = _worker_layers[index]
+    start = time.perf_counter()
+    try:
+        result, error = encode_layer(row, input_array, prob_table, *_worker_options), None
+    except Exception as e:
+        result, error = None, str(e)
+    return index, result, error, os.getpid(), time.perf_counter() - start, len(input_array)
+
+def encode_layers_parallel(layers, workers, estimate_args=None, count_only=False, worker_stats=None, instrument=False,
+                           backend='bit16'):
+    """
+    Encodes the layers on a pool of worker processes.
+
+    Layers are scheduled largest first to balance the workers, and the results are
+    yielded in input order as soon as every earlier layer has finished.
+
+    Args:
+        layers (list): (row, input_array, prob_table) tuples.
+        workers (int): The number of worker processes.
+        estimate_args (dict, optional): See `encode_layer`.
+        count_only (bool): See `encode_layer`.
+        worker_stats (dict, optional): Filled with the layers, values and busy time of
+            each worker, keyed by process id.
+        instrument (bool): See `encode_layer`.
+        backend (str): See `encode_layer`.
+
+    Yields:
+        tuple: (layer, `encode_layer` result) in input order.
+    """
+    global _worker_layers, _worker_options
+    options = (estimate_args, count_only, instrument, backend)
+    if 'fork' in mp.get_all_start_methods():
+        context = mp.get_context('fork')
+        _worker_layers, _worker_options = layers, options
+        initargs = None
+    else:
+        context = mp.get_context()
+        initargs = (layers, options)
+
+    order = sorted(range(len(layers)), key=lambda i: len(layers[i][1]), reverse=True)
+    if worker_stats is None:
+        worker_stats = {}
+    finished = {}
+    next_index = 0
+    try:
+        with context.Pool(workers, initializer=_init_worker if initargs else None, initargs=initargs or ()) as pool:
+            for index, result, error, pid, elapsed, n_values in pool.imap_unordered(_encode_layer_at, order):
+                stats = worker_stats.setdefault(pid, {'Layers': 0, 'Values': 0, 'Busy (s)': 0.0})
+                stats['Layers'] += 1
+                stats['Values'] += n_values
+                stats['Busy (s)'] += elapsed
+                if error is not None:
+                    print(f"Error processing row: {error}")
+                finished[index] = result
+
+                # Release every result whose predecessors are all done
+                while next_index in finished:
+                    result = finished.pop(next_index)
+                    if result is not None:
+                        yield layers[next_index], result
+                    next_index += 1
+    finally:
+        _worker_layers, _worker_options = [], (None, False, False, 'bit16')
+
+def plan_layers(layers, manifest, params, archive=None, require_counters=False, timer=None):
+    """
+    Checks every layer against the run manifest.
+
+    Args:
+        layers (iterable): (row, input_array, prob_table) tuples.
+        manifest (RunManifest): The manifest of the previous runs.
+        params (dict): The run parameters that affect the output (besides the table).
+        archive (EncodedArchiveWriter, optional): Where unchanged layers must still be.
+        require_counters (bool): Treat unchanged layers recorded without counters as changed.
+        timer (StageTimer, optional): Times the hashing as the 'plan' stage.
+
+    Yields:
+        dict: 'layer', its manifest 'key', 'input_hash', 'params_hash', and the manifest
+            'entry' if the layer is unchanged (None if it has to be encoded).
+    """
+    timer = timer or StageTimer(enabled=False)
+    for layer in layers:
+        row, input_array, prob_table = layer
+        with timer.stage('plan'):
+            key = RunManifest.key(row['Model Name'], row['Layer Number'], row['Type'])
+            input_hash = hash_values(input_array)
+            params_hash = hash_params(dict(params, table=prob_table))
+            output_exists = None
+            if archive is not None:
+                output_exists = lambda output: archive.holds(row['Model Name'], row['Layer Number'], row['Type'], output)
+            entry = manifest.lookup(key, input_hash, params_hash, output_exists)
+            if entry is not None and require_counters and entry['result'].get('counters') is None:
+                entry = None
+        yield {'layer': layer, 'key': key, 'input_hash': input_hash, 'params_hash': params_hash, 'entry': entry}
+
+def run_plan(planned, workers, estimate_args=None, count_only=False, worker_stats=None, instrument=False, backend='bit16'):
+    # Yields (plan, result) in input order, encoding only the layers without a manifest
+    # entry; result is None for unchanged layers. Layers that fail to encode are dropped.
+    if workers > 1:
+        planned = list(planned)
+        todo = [plan['layer'] for plan in planned if plan['entry'] is None]
+        results = encode_layers_parallel(todo, workers, estimate_args, count_only, worker_stats, instrument, backend)
+        pending = next(results, None)
+        for plan in planned:
+            if plan['entry'] is not None:
+                yield plan, None
+            elif pending is not None and pending[0] is plan['layer']:
+                yield plan, pending[1]
+                pending = next(results, None)
+    else:
+        for plan in planned:
+            if plan['entry'] is not None:
+                yield plan, None
+            else:
+                for layer, result in encode_layers([plan['layer']], estimate_args, count_only, instrument, backend):
+                    yield plan, result
+
+def print_worker_throughput(worker_stats):
+    # Per-worker load and encoding throughput of a parallel run
+    from tabulate import tabulate
+    table = [[pid, s['Layers'], s['Values'], f"{s['Busy (s)']:.2f}",
+              f"{s['Values'] / s['Busy (s)']:.0f}" if s['Busy (s)'] > 0 else '-']
+             for pid, s in sorted(worker_stats.items())]
+    print(tabulate(table, headers=['Worker', 'Layers', 'Values', 'Busy (s)', 'Values/s'], tablefmt="grid"))
+
+def print_stage_timings(timer):
+    # Where the time of a run went, per stage
+    from tabulate import tabulate
+    print(tabulate([list(row.values()) for row in timer.rows()], headers=['Stage', 'Calls', 'Time (s)', 'Share (%)'],
+                   tablefmt="grid", floatfmt=".3f"))
+
+def main(estimate=False, n_blocks=32, block_size=4096, confidence=0.95, seed=0, workers=1, count_only=False, resume=True,
+         project_dir=PROJECT_DIR, profile=False, backend='bit16', pipeline=False, queue_depth=QUEUE_DEPTH, calibrate=False):
 
     # Path to your CSV file
-    pt_weights_csv_path = '/content/drive/MyDrive/CSCE_614/Project/probability_table_gen_results/weights_probability_tables'
-    pt_act_csv_path = '/content/drive/MyDrive/CSCE_614/Project/probability_table_gen_results/activations_probability_tables'
+    # (a pt_*.csv directory also works)
+    pt_weights_csv_path = os.path.join(project_dir, 'probability_table_gen_results/weights_probability_tables.pts')
+    pt_act_csv_path = os.path.join(project_dir, 'probability_table_gen_results/activations_probability_tables.pts')
 
-    weights_csv_path = '/content/drive/MyDrive/CSCE_614/Project/weights_all_layers.csv'
-    act_csv_path = '/content/drive/MyDrive/CSCE_614/Project/activations_all_layers.csv'
+    weights_csv_path = os.path.join(project_dir, 'weights_all_layers.csv')
+    act_csv_path = os.path.join(project_dir, 'activations_all_layers.csv')
 
     #results_output_directory = '/content/drive/MyDrive/CSCE_614/Project/atalanta_outputs'
     # Create the output directory if it doesn't exist
     #os.makedirs(os.path.dirname(results_output_directory), exist_ok=True)
 
     # Output file paths
-    weights_encoded_output_file = '/content/drive/MyDrive/CSCE_614/Project/atalanta_outputs/atalanta_encoded_output_weights.csv'
-    act_encoded_output_file = '/content/drive/MyDrive/CSCE_614/Project/atalanta_outputs/atalanta_encoded_output_activations.csv'
+    weights_encoded_output_file = os.path.join(project_dir, 'atalanta_outputs/atalanta_encoded_output_weights.atl')
+    act_encoded_output_file = os.path.join(project_dir, 'atalanta_outputs/atalanta_encoded_output_activations.atl')
 
 
     # Output CSV file paths
-    weights_summary_file = '/content/drive/MyDrive/CSCE_614/Project/atalanta_outputs/atalanta_encoded_summary_weights.csv'
-    act_summary_file = '/content/drive/MyDrive/CSCE_614/Project/atalanta_outputs/atalanta_encoded_summary_activations.csv'
+    weights_summary_file = os.path.join(project_dir, 'atalanta_outputs/atalanta_encoded_summary_weights.csv')
+    act_summary_file = os.path.join(project_dir, 'atalanta_outputs/atalanta_encoded_summary_activations.csv')
+
 
 
-    
 
     file_path_dict = {
     'weights' : {'pt_tables': pt_weights_csv_path , 'input_stream': weights_csv_path, 'encoded_output': weights_encoded_output_file, 'encoded_summary': weights_summary_file},
@@ -127,10 +474,13 @@ def main():
         encoded_output_file = file_path_dict[vtype]['encoded_output']
         csv_summary_file = file_path_dict[vtype]['encoded_summary']
 
-        # Write the header row (only once)
-        with open(encoded_output_file, mode='w', newline='') as file:
-            writer = csv.DictWriter(file, fieldnames=['Model_Name', 'Layer', 'Type', 'Symbol_Stream', 'Offset_Stream', 'Offset_Length_Stream'])
-            writer.writeheader()
+        if backend != 'bit16':
+            # Other backends keep their own summaries and archives next to the hardware-faithful ones
+            csv_summary_file = csv_summary_file.replace('.csv', f'_{backend}.csv')
+            encoded_output_file = encoded_output_file.replace('.atl', f'_{backend}.atl')
+        if estimate:
+            # Estimates never overwrite the results of a full run
+            csv_summary_file = csv_summary_file.replace('.csv', '_estimated.csv')
 
         # Get the probability tables
         probability_tables = get_probability_tables(pt_csv_path)
@@ -141,81 +491,127 @@ def main():
 
         summary_table = []
         csv_file_out = []
-
-        # Process CSV line by line
-        with open(values_csv_path, 'r') as csvfile:
-            csvreader = csv.reader(csvfile)
-            headers = next(csvreader)  # Read header row
-
-            for row_data in csvreader:
-                try:
-                    row = {'Model Name':row_data[0] , 'Layer Number':row_data[1], 'Type':row_data[2]}
-
-                    # Extract numeric values after the first three columns
-                    input_array = np.array(row_data[3:], dtype=np.uint8)
-
-
-                    # Get the probability table
-                    pt_file_name = f"{row['Model Name']}_{row['Layer Number']}_{row['Type']}"
-                    prob_table = probability_tables[pt_file_name]
-
-                    # encode using Atalanta Encoder
-                    symbol_stream, offset_stream, offset_length_stream = run_atalanta(input_array,prob_table)
-
-                    output_row = {
-                        'Model_Name': row['Model Name'],
-                        'Layer': row['Layer Number'],
-                        'Type': row['Type'],
-                        'Symbol_Stream': symbol_stream,
-                        'Offset_Stream': offset_stream,
-                        'Offset_Length_Stream': offset_length_stream
-                    }
-
-                    # Append the row to the CSV file
-                    add_row_to_csv(output_row, encoded_output_file)
-
-                    input_stream_length = len(input_array)
-                    input_stream_length_bits = input_stream_length*8
-                    symbol_stream_length = len(symbol_stream)
-                    offset_length_stream_length = sum(offset_length_stream)
-                    compression_ratio = (input_stream_length_bits)/(symbol_stream_length + offset_length_stream_length)
-                    compression_percentage = (1-(1/compression_ratio))*100
-
-                    output_summary = {
-                        'Model_Name': row['Model Name'],
-                        'Layer_Number': row['Layer Number'],
-                        'Type': row['Type'],
-                        'Input_Stream_Length (values)': input_stream_length,
-                        'Original_Length (bits)': input_stream_length_bits,
-                        'Symbol_Stream_Length (bits)': symbol_stream_length,
-                        'Offset_Stream_Length (bits)': offset_length_stream_length,
-                        'After Compression (bits)': (symbol_stream_length + offset_length_stream_length),
-                        'Compression_Ratio': compression_ratio,
-                        'Compression_Percentage': compression_percentage
-                        }
-
-                    summary_table.append(output_summary)
-
-                    csv_summary = {
-                        'Model_Name': row['Model Name'],
-                        'Layer_Number': row['Layer Number'],
-                        'Type': row['Type'],
-                        'Input_Stream_Length (values)': input_stream_length,
-                        'Original (bits)': input_stream_length_bits,
-                        'After Compression (bits)': (symbol_stream_length + offset_length_stream_length),
-                        'Compression_Ratio': compression_ratio,
-                        'Compression_Percentage': compression_percentage
-                        }
-
-                    csv_file_out.append(csv_summary)
-                except Exception as e:
-                    print(f"Error processing row: {e}")
-                    continue
-
+        estimates_by_model = {}
+        counter_rows = []
+        timer = StageTimer(profile)
+
+        estimate_args = None
+        if estimate:
+            estimate_args = {'n_blocks': n_blocks, 'block_size': block_size, 'confidence': confidence, 'seed': seed,
+                             'calibrate': calibrate}
+
+        # Layers whose input, table and mode are unchanged since the last run are reused
+        manifest_path = os.path.splitext(csv_summary_file)[0] + ('_count' if count_only else '') + '_manifest.json'
+        manifest = RunManifest(manifest_path, resume)
+        params = {'estimate': estimate_args, 'count_only': count_only}
+
+        # One archive per value type holding every model's layers (the index keys them by model),
+        # written through a single buffered handle
+        archive = None if estimate or count_only else EncodedArchiveWriter(encoded_output_file, resume)
+
+        # Process CSV line by line, hand the layers to a worker pool, or overlap all stages in a pipeline
+        layers = read_layers(values_csv_path, probability_tables, timer)
+        planned = plan_layers(layers, manifest, params, archive, require_counters=profile and not estimate, timer=timer)
+        worker_stats = {}
+        order = []
+        utilization = None
+
+        def write_result(plan, result):
+            # Writes one layer's result (None if unchanged) to the archive, manifest and summaries
+            row, input_array, prob_table = plan['layer']
+            if result is None:
+                # Unchanged since the last run: reuse the recorded summary
+                manifest.skip()
+                result = plan['entry']['result']
+            else:
+                for stage, seconds in result['timings'].items():
+                    timer.add(stage, seconds)
+                with timer.stage('write'):
+                    output = None
+                    if result['packed'] is not None:
+                        entry = archive.add(row['Model Name'], row['Layer Number'], row['Type'], len(input_array),
+                                            result['packed'], prob_table, backend)
+                        output = output_location(encoded_output_file, entry)
+                    result = {k: result[k] for k in ('summary', 'csv_summary', 'estimate', 'counters')}
+                    manifest.record(plan['key'], plan['input_hash'], plan['params_hash'], output, result)
+                    if manifest.due():
+                        # The manifest may only point at layers that are on disk
+                        if archive is not None:
+                            archive.checkpoint()
+                        manifest.save()
+            order.append((row['Model Name'], row['Layer Number'], row['Type']))
+            if profile and result.get('counters') is not None:
+                counter_rows.append(result['counters'])
+
+            if result['estimate'] is not None:
+                estimates_by_model.setdefault(row['Model Name'], []).append(result['estimate'])
+
+            summary_table.append(result['summary'])
+            csv_file_out.append(result['csv_summary'])
+
+        try:
+            if pipeline:
+                # Read, encode and write overlap; layers unchanged since the last run skip the encoders
+                encode = partial(encode_planned, estimate_args=estimate_args, count_only=count_only,
+                                 instrument=profile, backend=backend)
+                utilization = run_pipeline(planned, encode, write_result, workers, queue_depth,
+                                           skip=lambda plan: plan['entry'] is not None)
+            else:
+                for plan, result in run_plan(planned, workers, estimate_args, count_only, worker_stats, profile, backend):
+                    write_result(plan, result)
+        except BaseException:
+            # Keep the finished layers so that a rerun picks up from here
+            if archive is not None:
+                archive.close_partial()
+            manifest.save()
+            raise
+        with timer.stage('write'):
+            if archive is not None:
+                archive.close(order)
+            manifest.save()
+        manifest.report(vtype)
 
         # Print the summary table
         print_encoded_summary_table(summary_table)
-        output_summary_to_csv(csv_file_out, csv_summary_file)
+        with timer.stage('write'):
+            output_summary_to_csv(csv_file_out, csv_summary_file)
+        if estimate:
+            print_model_estimates(estimates_by_model)
+        if worker_stats:
+            print_worker_throughput(worker_stats)
+        if utilization:
+            print_stage_utilization(utilization)
+        if profile:
+            # Counters and stage times go next to the summary
+            if counter_rows:
+                write_rows(counter_rows, csv_summary_file.replace('.csv', '_counters.csv'))
+            print_stage_timings(timer)
+            write_rows(timer.rows(vtype), csv_summary_file.replace('.csv', '_timings.csv'))
+            if utilization:
+                write_rows(utilization, csv_summary_file.replace('.csv', '_pipeline.csv'))
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Encode the extracted layers with Atalanta.")
+    parser.add_argument("--estimate", action="store_true", help="encode a random sample of blocks per layer and extrapolate")
+    parser.add_argument("--blocks", type=int, default=32, help="blocks sampled per layer in --estimate mode")
+    parser.add_argument("--block-size", type=int, default=4096, help="values per sampled block")
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--calibrate", action="store_true",
+                        help="in --estimate mode, also encode every layer in full to measure the speedup and estimate error")
+    parser.add_argument("--workers", type=int, default=1, help="encode layers on this many worker processes")
+    parser.add_argument("--count-only", action="store_true", help="only count the compressed sizes; no encoded archive is written")
+    parser.add_argument("--no-resume", dest="resume", action="store_false", help="ignore the run manifest and recompute every layer")
+    parser.add_argument("--project-dir", default=PROJECT_DIR, help="directory holding the extracted layers and the outputs")
+    parser.add_argument("--profile", action="store_true", help="write per-layer coder counters and per-stage timings next to the summary")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default='bit16',
+                        help="symbol coder: the hardware-faithful 16-bit coder, the faster byte-wise range coder, "
+                             "or interleaved rANS (fastest decode)")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="overlap reading, encoding (on --workers processes) and writing with an asyncio pipeline")
+    parser.add_argument("--queue-depth", type=int, default=QUEUE_DEPTH, help="layers the --pipeline reader prefetches")
+    args = parser.parse_args()
+    main(estimate=args.estimate, n_blocks=args.blocks, block_size=args.block_size,
+         confidence=args.confidence, seed=args.seed, workers=args.workers, count_only=args.count_only,
+         resume=args.resume, project_dir=args.project_dir, profile=args.profile, backend=args.backend,
+         pipeline=args.pipeline, queue_depth=args.queue_depth, calibrate=args.calibrate)
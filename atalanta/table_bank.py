@@ -0,0 +1,138 @@
+import os
+import sys
+
+import numpy as np
+
+from atalanta_decode import AtalantaDecoder
+from atalanta_encode import AtalantaEncoder
+from bitpack import unpack_varwidth
+from probability_table import ProbabilityModel
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Per-block table selection: a layer is cut into fixed-size blocks and every block is
+# coded with the table of a small bank that codes it in the fewest bits. The blocks
+# share one arithmetic-coded stream; only the table changes at block boundaries.
+VALUE_RANGE = 256
+BLOCK_SIZE = 4096
+BANK_SIZE = 4
+
+
+def table_id_bits(bank):
+    # Bits of one table id of the bank
+    return (len(bank) - 1).bit_length()
+
+def block_histograms(values, block_size=BLOCK_SIZE):
+    # Value counts of every block, (blocks, VALUE_RANGE); the last block may be shorter
+    values = np.asarray(values, dtype=np.int64).ravel()
+    n_blocks = -(-values.size // block_size)
+    blocks = np.repeat(np.arange(n_blocks), block_size)[:values.size]
+    return np.bincount(blocks * VALUE_RANGE + values, minlength=n_blocks * VALUE_RANGE).reshape(n_blocks, VALUE_RANGE)
+
+def value_bit_costs(bank):
+    """
+    The bits every value costs under every table of a bank: the offset length of its
+    row plus the ideal arithmetic-code length of the row, log2(1024 / range).
+
+    Returns:
+        np.ndarray: (tables, VALUE_RANGE) costs, inf where the table cannot code the
+            value (no covering row, or a row with an empty range).
+    """
+    costs = np.full((len(bank), VALUE_RANGE), np.inf)
+    for t, table in enumerate(bank):
+        rows = ProbabilityModel(table).row_lookup(VALUE_RANGE)
+        OL = np.array([int(entry['OL']) for entry in table], dtype=np.float64)
+        width = np.array([int(entry['t_high']) - int(entry['t_low']) for entry in table], dtype=np.float64)
+        valid = rows >= 0
+        valid[valid] = width[rows[valid]] > 0
+        costs[t, valid] = OL[rows[valid]] + np.log2(1024 / width[rows[valid]])
+    return costs
+
+def select_tables(histograms, bank):
+    """
+    Picks the cheapest table of the bank for every block.
+
+    The estimated size of every block under every table is one matrix product of the
+    block histograms with the per-value costs of the tables.
+
+    Args:
+        histograms (np.ndarray): The block histograms, (blocks, VALUE_RANGE).
+        bank (list): The candidate tables.
+
+    Returns:
+        tuple: (table id of every block, estimated bits of every block with its table).
+
+    Raises:
+        ValueError: If no table of the bank can code some block.
+    """
+    costs = value_bit_costs(bank)
+    finite = np.where(np.isfinite(costs), costs, 0)
+    block_bits = histograms @ finite.T
+    # A table that cannot code a value the block holds is never picked
+    block_bits[(histograms @ (~np.isfinite(costs)).T) > 0] = np.inf
+    table_ids = np.argmin(block_bits, axis=1)
+    chosen = block_bits[np.arange(len(table_ids)), table_ids]
+    if np.any(np.isinf(chosen)):
+        raise ValueError(f"No table of the bank codes block {int(np.argmax(np.isinf(chosen)))}.")
+    return table_ids, chosen
+
+def build_bank(values, bank_size=BANK_SIZE, block_size=BLOCK_SIZE):
+    """
+    Builds the table bank of a layer (or of all layers of a model, concatenated) by
+    clustering its block histograms and searching one table per cluster, like
+    shared_tables.py does for whole layers.
+
+    Returns:
+        list: At most `bank_size` tables, each able to code every block of its cluster.
+    """
+    sys.path.append(os.path.join(REPO_ROOT, 'data_prep'))
+    from shared_tables import cluster_histograms, cluster_tables
+
+    histograms = block_histograms(values, block_size)
+    return cluster_tables(histograms, cluster_histograms(histograms, bank_size))
+
+def encode_blocks(values, bank, table_ids, block_size=BLOCK_SIZE):
+    """
+    Encodes the blocks of a layer on one stream, each with the table of its id.
+
+    Returns:
+        AtalantaEncoder: The finished encoder; `finalize()` gives its streams.
+    """
+    values = np.asarray(values, dtype=np.int64).ravel()
+    models = [ProbabilityModel(table) for table in bank]
+    encoder = AtalantaEncoder(bank[0])
+    for block, table_id in enumerate(table_ids.tolist()):
+        encoder.PCNT = models[table_id]
+        encoder.encode_symbols(values[block * block_size:(block + 1) * block_size].tolist())
+    encoder.flush()
+    return encoder
+
+def decode_blocks(symbol_bits, offset_bits, bank, table_ids, block_size, n_values):
+    """
+    Decodes the values written by `encode_blocks`.
+
+    Args:
+        symbol_bits (list or np.ndarray): The symbol stream as 0/1 bits.
+        offset_bits (np.ndarray): The offset stream as 0/1 bits.
+        bank (list): The table bank.
+        table_ids (np.ndarray): The table id of every block.
+        block_size (int): Values per block.
+        n_values (int): How many values were encoded.
+
+    Returns:
+        np.ndarray: The values (int64).
+    """
+    v_min = [np.array([entry['v_min'] for entry in table], dtype=np.int64) for table in bank]
+    OL = [np.array([entry['OL'] for entry in table], dtype=np.int64) for table in bank]
+    values = np.empty(n_values, dtype=np.int64)
+    decoder = AtalantaDecoder(bank[0])
+    decoder.load(symbol_bits)
+    position = 0
+    for block, table_id in enumerate(np.asarray(table_ids).tolist()):
+        start = block * block_size
+        decoder.PCNT = bank[table_id]
+        rows = np.asarray(decoder.next_rows(min(block_size, n_values - start)), dtype=np.int64)
+        widths = OL[table_id][rows]
+        values[start:start + rows.size] = v_min[table_id][rows] + unpack_varwidth(offset_bits, widths, position).astype(np.int64)
+        position += int(widths.sum())
+    return values
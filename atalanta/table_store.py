@@ -0,0 +1,138 @@
+import csv
+import json
+import os
+import struct
+import sys
+from collections.abc import Mapping
+
+import numpy as np
+
+# Probability table store layout:
+#   MAGIC (4 bytes) | version (u32) | index offset (u64) | index length (u64)
+#   one fixed-width record block per table: TABLE_ENTRIES rows of TABLE_DTYPE
+#   JSON index (table name -> [record block number, used rows]) at the end
+MAGIC = b'ATPT'
+VERSION = 1
+HEADER = struct.Struct('<4sIQQ')
+TABLE_ENTRIES = 16
+TABLE_DTYPE = np.dtype([('v_min', '<i2'), ('v_max', '<i2'), ('OL', '<i2'), ('t_low', '<i2'), ('t_high', '<i2')])
+TABLE_FIELDS = TABLE_DTYPE.names
+
+
+def write_table_store(path, tables):
+    """
+    Writes probability tables into one compact store file.
+
+    Args:
+        path (str): Where the store is created.
+        tables (dict): Table name (e.g. 'Resnet50_conv1.weight_weights') -> list of
+            probability table rows with the TABLE_FIELDS keys.
+
+    Raises:
+        ValueError: If a table has more than TABLE_ENTRIES rows.
+    """
+    records = np.zeros((len(tables), TABLE_ENTRIES), dtype=TABLE_DTYPE)
+    index = {}
+    for i, (name, table) in enumerate(tables.items()):
+        if len(table) > TABLE_ENTRIES:
+            raise ValueError(f"Table {name} has {len(table)} rows, more than {TABLE_ENTRIES}.")
+        for j, row in enumerate(table):
+            records[i, j] = tuple(int(row[k]) for k in TABLE_FIELDS)
+        index[name] = [i, len(table)]
+
+    data = records.tobytes()
+    index = json.dumps(index).encode()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, HEADER.size + len(data), len(index)))
+        file.write(data)
+        file.write(index)
+    os.replace(tmp_path, path)
+
+def read_table_csv(csv_path):
+    # Rows of one pt_*.csv file as written by probability_table_gen.py
+    with open(csv_path, newline='') as file:
+        return [{k: int(float(row[k])) for k in TABLE_FIELDS} for row in csv.DictReader(file)]
+
+def build_table_store(csv_dir, path):
+    """
+    Consolidates a directory of pt_<name>.csv files into a table store.
+
+    probability_table_gen.py calls this once per value type, so a store holds the
+    tables of every model for that type (e.g. weights_probability_tables.pts), keyed
+    by '<model>_<layer>_<type>', rather than one store per model and type: the
+    encoders open a single file per type and look every layer up by name.
+
+    Args:
+        csv_dir (str): The directory written by probability_table_gen.py.
+        path (str): Where the store is created.
+
+    Returns:
+        int: The number of tables written.
+    """
+    tables = {}
+    for filename in sorted(os.listdir(csv_dir)):
+        if filename.startswith('pt_') and filename.endswith('.csv'):
+            name = filename.removeprefix("pt_").removesuffix(".csv")
+            tables[name] = read_table_csv(os.path.join(csv_dir, filename))
+    write_table_store(path, tables)
+    return len(tables)
+
+
+class TableStore(Mapping):
+    """
+    Read-only, lazily decoded view of a probability table store.
+
+    Opening the store only reads its index; the records are memory-mapped and a table
+    is decoded into the list-of-dicts form `AtalantaEncoder` expects on first access.
+
+    Attributes:
+        path (str): The path of the store.
+        index (dict): Table name -> [record block number, used rows].
+    """
+
+    def __init__(self, path):
+        """
+        Opens an existing table store.
+
+        Raises:
+            ValueError: If the file is not a table store.
+        """
+        self.path = path
+        with open(path, 'rb') as file:
+            magic, version, index_offset, index_length = HEADER.unpack(file.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} probability table store.")
+            file.seek(index_offset)
+            self.index = json.loads(file.read(index_length))
+        if self.index:
+            self.records = np.memmap(path, dtype=TABLE_DTYPE, mode='r', offset=HEADER.size,
+                                     shape=(len(self.index), TABLE_ENTRIES))
+        else:
+            self.records = np.zeros((0, TABLE_ENTRIES), dtype=TABLE_DTYPE)
+        self.cache = {}
+
+    def __getitem__(self, name):
+        table = self.cache.get(name)
+        if table is None:
+            block, rows = self.index[name]
+            table = [dict(zip(TABLE_FIELDS, map(int, record))) for record in self.records[block, :rows].tolist()]
+            self.cache[name] = table
+        return table
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, name):
+        return name in self.index
+
+
+if __name__ == "__main__":
+    # python table_store.py <pt csv directory> <store path>
+    csv_dir, store_path = sys.argv[1], sys.argv[2]
+    count = build_table_store(csv_dir, store_path)
+    print(f"{count} probability tables from {csv_dir} written to {store_path}")
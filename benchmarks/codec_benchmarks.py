@@ -0,0 +1,283 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(REPO_ROOT, 'atalanta'))
+sys.path.append(os.path.join(REPO_ROOT, 'shapeshifter'))
+sys.path.append(os.path.join(REPO_ROOT, 'data_prep'))
+sys.path.append(os.path.join(REPO_ROOT, 'comparison'))
+from atalanta_adaptive import DEFAULT_TABLE_IDS, INITIAL_TABLES
+from atalanta_encode import AtalantaEncoder
+from codec import get_codec
+from atalanta_decode import AtalantaDecoder
+from range_coder import AtalantaRangeEncoder
+from rans_coder import AtalantaRansDecoder, AtalantaRansEncoder
+from probability_table_gen import contiguous_ranges, search_table
+from layer_store import LayerStore
+from shapeshifter_encode import shapeshifter_size
+from traffic_model import value_kind
+
+# Codecs benchmarked through the array interface (encode_array / decode).
+CODEC_NAMES = ('atalanta', 'atalanta_range', 'atalanta_rans', 'atalanta_adaptive', 'atalanta_blocks', 'shapeshifter')
+DISTRIBUTIONS = ('uniform', 'laplace_weights', 'relu_activations')
+# Initial adaptive table of each synthetic distribution, as in comparison/atalanta_modes.py
+DISTRIBUTION_TABLE_IDS = {'uniform': INITIAL_TABLES.index('uniform'), 'laplace_weights': DEFAULT_TABLE_IDS['weights'],
+                          'relu_activations': DEFAULT_TABLE_IDS['activations']}
+DEFAULT_SIZES = (4096, 65536)
+
+
+def synthetic_layer(distribution, n_values, seed=0):
+    """
+    Generates a layer of uint8 values like the ones the extraction scripts produce.
+
+    Args:
+        distribution (str): 'uniform', 'laplace_weights' (int8 weights around zero,
+            shifted by 128) or 'relu_activations' (mostly zero, exponential tail).
+        n_values (int): The layer size.
+        seed (int): Seed of the generator.
+
+    Returns:
+        np.ndarray: The values (uint8).
+    """
+    rng = np.random.default_rng(seed)
+    if distribution == 'uniform':
+        values = rng.integers(0, 256, n_values)
+    elif distribution == 'laplace_weights':
+        values = np.round(rng.laplace(0, 8, n_values)) + 128
+    elif distribution == 'relu_activations':
+        values = np.where(rng.random(n_values) < 0.6, 0, np.round(rng.exponential(12, n_values)) + 1)
+    else:
+        raise ValueError(f"Unknown distribution {distribution}, expected one of {DISTRIBUTIONS}.")
+    return np.clip(values, 0, 255).astype(np.uint8)
+
+def atalanta_encode(values, table, encoder_class=AtalantaEncoder):
+    encoder = encoder_class(table)
+    encoder.encode(values.tolist())
+    return encoder
+
+def run_case(fn, repeat):
+    """
+    Times `fn` and measures its peak traced memory.
+
+    The best of `repeat` untraced runs is reported; the memory peak comes from one
+    extra run under tracemalloc, which would otherwise slow the timed runs down.
+
+    Returns:
+        tuple: (seconds, peak_bytes)
+    """
+    seconds = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        seconds = min(seconds, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn()
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return seconds, peak_bytes
+
+def benchmark_layer(dataset, values, repeat=3, table_id=0):
+    """
+    Runs every benchmark case on one layer.
+
+    Args:
+        dataset (str): The name the results are reported under.
+        values (np.ndarray): The layer (uint8).
+        repeat (int): Timed runs per case.
+        table_id (int): Initial table of the adaptive codecs, the default of the layer's
+            value kind (see atalanta_adaptive.DEFAULT_TABLE_IDS).
+
+    Returns:
+        list: One result dict per case: 'case', 'dataset', 'n_values', 'seconds',
+            'mb_per_s', 'symbols_per_s', 'peak_bytes' (or 'error' if the case failed);
+            the encode cases also report 'bits_per_value'.
+    """
+    values = np.ascontiguousarray(values, dtype=np.uint8)
+    table = search_table(values)
+    # The range and rANS coders reject rows with an empty range, so every coder gets the
+    # decodable table and their sizes compare on the same ranges
+    decodable = contiguous_ranges(table, values)
+    # Symbol streams for the symbol-only decode cases, which leave the shared offset unpacking out
+    bit16_symbols = atalanta_encode(values, decodable).finalize()[0]
+    rans_symbols = atalanta_encode(values, decodable, AtalantaRansEncoder).finalize()[0]
+
+    cases = {'table_search': lambda: search_table(values)}
+    bits = {}
+    encoders = (('atalanta_encode', AtalantaEncoder), ('atalanta_range_encode', AtalantaRangeEncoder),
+                ('atalanta_rans_encode', AtalantaRansEncoder))
+    for case, encoder_class in encoders:
+        symbol_bits, _, offset_bits = encoder_class(decodable).count(values)
+        bits[case] = symbol_bits + offset_bits
+        cases[case] = lambda encoder_class=encoder_class: atalanta_encode(values, decodable, encoder_class)
+    cases.update({
+        'atalanta_decode_rows': lambda: AtalantaDecoder(decodable).decode_rows(bit16_symbols, values.size),
+        'atalanta_rans_decode_rows': lambda: AtalantaRansDecoder(decodable).decode_rows(rans_symbols, values.size),
+        'atalanta_count': lambda: AtalantaEncoder(decodable).count(values),
+        'shapeshifter_size': lambda: shapeshifter_size(values),
+    })
+    # Round trips through the codec interface: the two-pass codecs with the decodable table,
+    # the adaptive ones from the initial table of the layer's value kind
+    options = {name: {'table': decodable} for name in ('atalanta', 'atalanta_range', 'atalanta_rans')}
+    options['atalanta_adaptive'] = {'table_id': table_id}
+    codecs = [(name, get_codec(name, **options.get(name, {}))) for name in CODEC_NAMES]
+    codecs.append(('atalanta_adaptive_split', get_codec('atalanta_adaptive', table_id=table_id, update_boundaries=True)))
+    for label, codec in codecs:
+        try:
+            tensor = codec.encode_array(values)
+        except ValueError:
+            tensor = None
+        else:
+            bits[f'{label}_encode_array'] = tensor.bits
+        cases[f'{label}_encode_array'] = lambda codec=codec: codec.encode_array(values)
+        cases[f'{label}_decode'] = lambda codec=codec, tensor=tensor: codec.decode(tensor)
+
+    results = []
+    for case, fn in cases.items():
+        result = {'case': case, 'dataset': dataset, 'n_values': int(values.size)}
+        try:
+            seconds, peak_bytes = run_case(fn, repeat)
+        except Exception as e:
+            result['error'] = str(e)
+        else:
+            result.update({
+                'seconds': seconds,
+                'mb_per_s': values.nbytes / 1e6 / seconds,
+                'symbols_per_s': values.size / seconds,
+                'peak_bytes': peak_bytes,
+            })
+            if case in bits:
+                result['bits_per_value'] = bits[case] / values.size
+        results.append(result)
+    return results
+
+def run_benchmarks(sizes=DEFAULT_SIZES, distributions=DISTRIBUTIONS, stores=(), max_layers=4, repeat=3, seed=0):
+    """
+    Runs the suite on synthetic layers and on layers of layer stores.
+
+    Args:
+        sizes (iterable): Synthetic layer sizes.
+        distributions (iterable): Synthetic distributions, see `synthetic_layer`.
+        stores (iterable): Layer store files (see data_prep/layer_store.py).
+        max_layers (int): Layers benchmarked per store.
+        repeat (int): Timed runs per case.
+        seed (int): Seed of the synthetic layers.
+
+    Returns:
+        dict: 'meta' (machine and library versions) and 'results'.
+    """
+    results = []
+    for distribution in distributions:
+        for n_values in sizes:
+            results += benchmark_layer(distribution, synthetic_layer(distribution, n_values, seed), repeat,
+                                       DISTRIBUTION_TABLE_IDS[distribution])
+    for path in stores:
+        store = LayerStore(path)
+        for model, layer_name, vtype, values in list(store)[:max_layers]:
+            results += benchmark_layer(f"{model}/{layer_name}/{vtype}", values, repeat,
+                                       DEFAULT_TABLE_IDS[value_kind(vtype)])
+    meta = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'repeat': repeat,
+    }
+    return {'meta': meta, 'results': results}
+
+def compare_results(baseline, current, threshold=0.10):
+    """
+    Flags cases that got slower or use more memory than in a saved baseline.
+
+    Args:
+        baseline (dict): Results of `run_benchmarks` to compare against.
+        current (dict): New results of `run_benchmarks`.
+        threshold (float): Tolerated relative change (0.10 = 10%).
+
+    Returns:
+        list: One row per case present in both runs, with the baseline and current
+            MB/s and peak memory, the relative changes and a 'Regression' flag.
+    """
+    def key(result):
+        return result['case'], result['dataset'], result['n_values']
+
+    previous = {key(r): r for r in baseline['results'] if 'error' not in r}
+    rows = []
+    for result in current['results']:
+        old = previous.get(key(result))
+        if old is None or 'error' in result:
+            continue
+        speed_change = result['mb_per_s'] / old['mb_per_s'] - 1
+        memory_change = result['peak_bytes'] / old['peak_bytes'] - 1 if old['peak_bytes'] else 0.0
+        rows.append({
+            'Case': result['case'],
+            'Dataset': result['dataset'],
+            'Values': result['n_values'],
+            'Baseline (MB/s)': old['mb_per_s'],
+            'Current (MB/s)': result['mb_per_s'],
+            'Speed_Change (%)': speed_change * 100,
+            'Memory_Change (%)': memory_change * 100,
+            'Regression': speed_change < -threshold or memory_change > threshold,
+        })
+    return rows
+
+def print_results(results):
+    from tabulate import tabulate
+    headers = ['case', 'dataset', 'n_values', 'mb_per_s', 'symbols_per_s', 'peak_bytes', 'bits_per_value']
+    table = []
+    for r in results['results']:
+        metrics = ([r['mb_per_s'], r['symbols_per_s'], r['peak_bytes'], r.get('bits_per_value', '')] if 'error' not in r
+                   else [f"error: {r['error']}", '', '', ''])
+        table.append([r['case'], r['dataset'], r['n_values']] + metrics)
+    print(tabulate(table, headers=headers, tablefmt="grid", floatfmt=".3f"))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Encode/decode throughput benchmarks for Atalanta and ShapeShifter.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="run the suite and write the results as JSON")
+    run.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help="synthetic layer sizes")
+    run.add_argument('--distributions', nargs='+', choices=DISTRIBUTIONS, default=list(DISTRIBUTIONS))
+    run.add_argument('--store', action='append', default=[], help="also benchmark layers of this layer store")
+    run.add_argument('--max-layers', type=int, default=4, help="layers benchmarked per store")
+    run.add_argument('--repeat', type=int, default=3)
+    run.add_argument('--seed', type=int, default=0)
+    run.add_argument('--output', default='benchmark_results.json')
+
+    compare = commands.add_parser('compare', help="flag regressions against a saved baseline")
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--threshold', type=float, default=0.10, help="tolerated relative slowdown or memory growth")
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        results = run_benchmarks(args.sizes, args.distributions, args.store, args.max_layers, args.repeat, args.seed)
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+        print_results(results)
+        print(f"Results written to {args.output}")
+        return 0
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.current) as file:
+        current = json.load(file)
+    rows = compare_results(baseline, current, args.threshold)
+    if rows:
+        from tabulate import tabulate
+        print(tabulate([list(row.values()) for row in rows], headers=rows[0].keys(), tablefmt="grid", floatfmt=".2f"))
+    regressions = [row for row in rows if row['Regression']]
+    print(f"{len(regressions)} regressions out of {len(rows)} cases (threshold {args.threshold:.0%})")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Entry-point modules (directory, module) and how long importing each may take, in
+# seconds. Importing must not run any work or load the heavy dependencies below;
+# those belong to the code paths that use them.
+IMPORT_BUDGETS = {
+    ('atalanta', 'run_atalanta'): 0.5,
+    ('atalanta', 'decoder_sim'): 0.5,
+    ('atalanta', 'atalanta_codec'): 0.5,
+    ('atalanta', 'atalanta_adaptive'): 0.5,
+    ('atalanta', 'table_bank'): 0.5,
+    ('atalanta', 'range_coder'): 0.5,
+    ('atalanta', 'rans_coder'): 0.5,
+    ('atalanta', 'channel_codec'): 0.5,
+    ('shapeshifter', 'shapeshifter_encode'): 0.5,
+    ('shapeshifter', 'shapeshifter_codec'): 0.5,
+    ('data_prep', 'probability_table_gen'): 0.5,
+    ('data_prep', 'shared_tables'): 0.5,
+    ('data_prep', 'async_pipeline'): 0.5,
+    ('data_prep', 'extract_weights'): 0.5,
+    ('data_prep', 'extract_activations'): 0.5,
+    ('data_prep', 'get_sample_activation_data'): 0.5,
+    ('comparison', 'comparison'): 0.5,
+    ('comparison', 'traffic_model'): 0.5,
+    ('comparison', 'atalanta_modes'): 0.5,
+    ('comparison', 'channel_comparison'): 0.5,
+    ('benchmarks', 'codec_benchmarks'): 0.5,
+    ('benchmarks', 'roundtrip_check'): 0.5,
+    ('pipeline', 'run_pipeline'): 0.5,
+}
+HEAVY_MODULES = ('torch', 'torchvision', 'dask', 'matplotlib', 'pandas')
+
+# Runs in a fresh interpreter: times the import and lists the heavy modules it loaded
+MEASURE = """import sys, time
+sys.path.insert(0, {directory!r})
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+print(','.join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+def measure_import(directory, module, repeat=3):
+    """
+    Measures the import of one module in fresh interpreters, run from the module's
+    directory like the scripts are.
+
+    Args:
+        directory (str): The repository directory of the module.
+        module (str): The module name.
+        repeat (int): Fresh imports measured; the fastest counts.
+
+    Returns:
+        dict: 'seconds' and the 'heavy' modules the import loaded, or 'error' if the
+            import failed.
+    """
+    path = os.path.join(REPO_ROOT, directory)
+    code = MEASURE.format(directory=path, module=module, heavy=HEAVY_MODULES)
+    seconds = float('inf')
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-c', code], cwd=path, capture_output=True, text=True)
+        if result.returncode != 0:
+            return {'error': result.stderr.strip().splitlines()[-1]}
+        lines = result.stdout.splitlines()
+        seconds = min(seconds, float(lines[-2]))
+        heavy = [m for m in lines[-1].split(',') if m]
+    return {'seconds': seconds, 'heavy': heavy}
+
+def check_budgets(budgets=IMPORT_BUDGETS, repeat=3):
+    # One row per module: its import time against the budget and the heavy modules it pulled in
+    rows = []
+    for (directory, module), budget in budgets.items():
+        result = measure_import(directory, module, repeat)
+        row = {'Module': f'{directory}/{module}', 'Budget (s)': budget}
+        if 'error' in result:
+            row.update({'Import (s)': None, 'Heavy_Imports': '', 'Status': f"error: {result['error']}"})
+        else:
+            ok = result['seconds'] <= budget and not result['heavy']
+            row.update({'Import (s)': result['seconds'], 'Heavy_Imports': ','.join(result['heavy']),
+                        'Status': 'ok' if ok else 'over budget'})
+        rows.append(row)
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the import time of the entry-point modules against their budgets.")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--scale', type=float, default=1.0, help="multiply every budget (slow machines)")
+    args = parser.parse_args(argv)
+
+    budgets = {key: budget * args.scale for key, budget in IMPORT_BUDGETS.items()}
+    rows = check_budgets(budgets, args.repeat)
+
+    from tabulate import tabulate
+    print(tabulate([list(row.values()) for row in rows], headers=rows[0].keys(), tablefmt="grid", floatfmt=".3f"))
+    # Modules that cannot be imported here (missing optional dependencies) are reported, not failed
+    over = [row for row in rows if row['Status'] == 'over budget']
+    print(f"{len(over)} of {len(rows)} modules over budget")
+    return 1 if over else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(REPO_ROOT, 'atalanta'))
+sys.path.append(os.path.join(REPO_ROOT, 'data_prep'))
+from atalanta_decode import AtalantaDecoder
+from atalanta_encode import AtalantaEncoder
+from codec import CODEC_MODULES, get_codec
+from encoded_archive import EncodedArchive, EncodedArchiveWriter, pack_layer
+from layer_store import LayerStore, LayerStoreWriter
+import probability_table_gen
+from probability_table_gen import contiguous_ranges, search_table
+from range_coder import AtalantaRangeDecoder
+from rans_coder import AtalantaRansDecoder
+import run_atalanta
+from table_store import TABLE_FIELDS, TableStore, write_table_store
+
+# Registry codecs checked beyond their defaults, as (name, constructor options)
+CODEC_OPTIONS = (
+    ('atalanta_rans', {'n_states': 4}),
+    ('per_channel', {'codec': 'shapeshifter', 'channels_per_tile': 3}),
+    ('shapeshifter', {'variant': 'zero_group'}),
+    ('shapeshifter', {'variant': 'zero_bitmap'}),
+)
+
+
+def edge_cases(seed=0):
+    """
+    The inputs every codec and format must restore exactly.
+
+    Short tails leave a last ShapeShifter group, rANS step or sampled block that is
+    not full; all-zero inputs give zero-width groups and single-row tables.
+
+    Returns:
+        dict: Case name -> uint8 array.
+    """
+    rng = np.random.default_rng(seed)
+    laplace = lambda shape: np.clip(np.abs(rng.laplace(0, 12, shape)), 0, 255).astype(np.uint8)
+    return {
+        'empty': np.zeros(0, dtype=np.uint8),
+        'single_value': np.array([7], dtype=np.uint8),
+        'single_zero': np.zeros(1, dtype=np.uint8),
+        'all_zero': np.zeros(21, dtype=np.uint8),
+        'all_zero_short_tail': np.zeros(19, dtype=np.uint8),
+        'short_tail': laplace(4096 + 21),
+        'zero_tail': np.concatenate([laplace(32), np.zeros(5, dtype=np.uint8)]),
+        'full_range': rng.integers(0, 256, 1000).astype(np.uint8),
+        'shaped': laplace((5, 3, 3, 3)),
+    }
+
+def check_codecs(cases):
+    # One row per codec configuration and case: whether decode(encode_array(x)) gives back x
+    configs = [(name, {}) for name in CODEC_MODULES] + list(CODEC_OPTIONS)
+    rows = []
+    for name, options in configs:
+        for case, values in cases.items():
+            try:
+                tensor = get_codec(name, **options).encode_array(values)
+                # A fresh instance decodes, so everything needed must travel in the tensor
+                decoded = get_codec(tensor.codec).decode(tensor)
+            except Exception as e:
+                status = f"error: {type(e).__name__}: {e}"
+            else:
+                status = 'ok' if same_array(values, decoded) else 'mismatch'
+            rows.append({'Check': codec_label(name, options), 'Case': case, 'Status': status})
+    return rows
+
+def check_formats(cases, directory):
+    # One row per file format and case: whether what is written reads back unchanged
+    layers = {case: values for case, values in cases.items() if values.size}
+    tables = {case: contiguous_ranges(search_table(values.ravel().astype(np.int64)), values.ravel())
+              for case, values in layers.items()}
+    rows = []
+
+    # Layer store: the values and their shapes
+    path = os.path.join(directory, 'layers.lst')
+    with LayerStoreWriter(path) as writer:
+        for case, values in cases.items():
+            writer.add('check', case, 'weights', values)
+    store = LayerStore(path)
+    for case, values in cases.items():
+        rows.append(format_row('layer_store', case, lambda: same_array(values, store.get('check', case, 'weights', shaped=True))))
+
+    # Table store: every table field of every row
+    path = os.path.join(directory, 'tables.pts')
+    write_table_store(path, tables)
+    table_store = TableStore(path)
+    for case, table in tables.items():
+        rows.append(format_row('table_store', case, lambda: [{k: int(row[k]) for k in TABLE_FIELDS} for row in table_store[case]]
+                               == [{k: int(row[k]) for k in TABLE_FIELDS} for row in table]))
+
+    # Encoded archive: the 16-bit coder's symbol and offset streams
+    path = os.path.join(directory, 'layers.atl')
+    streams = {}
+    writer = EncodedArchiveWriter(path)
+    for case, values in layers.items():
+        encoder = AtalantaEncoder(tables[case])
+        encoder.encode(values.ravel().tolist())
+        streams[case] = encoder.finalize()
+        writer.add('check', case, 'weights', values.size, pack_layer(*streams[case]), tables[case])
+    writer.close()
+    archive = EncodedArchive(path)
+    for case in layers:
+        entry = archive.by_key[('check', case, 'weights')]
+        symbol_stream, offset_stream, offset_length_stream = streams[case]
+        rows.append(format_row('encoded_archive', case, lambda: (
+            np.array_equal(archive.symbol_stream(entry), np.asarray(symbol_stream, dtype=np.uint8))
+            and np.array_equal(archive.offset_stream(entry, offset_length_stream), np.asarray(offset_stream, dtype=np.uint64)))))
+    return rows
+
+def check_driver_archive(cases, directory):
+    # One row per backend and case: the table probability_table_gen writes, through the table
+    # store, run_atalanta.encode_layer and the encoded archive, decodes back to the layer
+    layers = {case: values.ravel() for case, values in cases.items() if values.size}
+    path = os.path.join(directory, 'generated.pts')
+    write_table_store(path, {case: generated_table(values) for case, values in layers.items()})
+    tables = TableStore(path)
+    rows = []
+    for backend in sorted(run_atalanta.BACKENDS):
+        path = os.path.join(directory, f'driver_{backend}.atl')
+        writer = EncodedArchiveWriter(path)
+        failed = {}
+        for case, values in layers.items():
+            row = {'Model Name': 'check', 'Layer Number': case, 'Type': 'weights'}
+            try:
+                result = run_atalanta.encode_layer(row, values, tables[case], backend=backend)
+            except Exception as e:
+                failed[case] = f"error: {type(e).__name__}: {e}"
+            else:
+                writer.add('check', case, 'weights', values.size, result['packed'], tables[case], backend)
+        writer.close()
+        archive = EncodedArchive(path)
+        for case, values in layers.items():
+            check = f'driver_archive {backend}'
+            if case in failed:
+                rows.append({'Check': check, 'Case': case, 'Status': failed[case]})
+            else:
+                entry = archive.by_key[('check', case, 'weights')]
+                rows.append(format_row(check, case, lambda: np.array_equal(decode_entry(archive, entry), values)))
+    return rows
+
+def generated_table(values):
+    # The table probability_table_gen writes for a layer; its search runs atalanta_numpy.py
+    # from the data_prep directory through a temporary file there
+    cwd = os.getcwd()
+    os.chdir(os.path.join(REPO_ROOT, 'data_prep'))
+    try:
+        return probability_table_gen.run_atalanta(values).to_dict(orient='records')
+    finally:
+        if os.path.exists('temp_input.npy'):
+            os.remove('temp_input.npy')
+        os.chdir(cwd)
+
+def decode_entry(archive, entry):
+    # The values of an archived layer, decoded with the backend that wrote it
+    table = entry['table']
+    bits = archive.symbol_stream(entry)
+    if entry['backend'] == 'bit16':
+        rows = AtalantaDecoder(table).decode_rows(bits, entry['n_values'])
+    else:
+        decoder = AtalantaRangeDecoder if entry['backend'] == 'range32' else AtalantaRansDecoder
+        rows = decoder(table).decode_rows(np.packbits(bits).tobytes(), entry['n_values'])
+    rows = np.asarray(rows, dtype=np.int64)
+    v_min = np.array([row['v_min'] for row in table], dtype=np.int64)
+    OL = np.array([row['OL'] for row in table], dtype=np.int64)
+    return v_min[rows] + archive.offset_stream(entry, OL[rows]).astype(np.int64)
+
+def format_row(check, case, matches):
+    try:
+        status = 'ok' if matches() else 'mismatch'
+    except Exception as e:
+        status = f"error: {type(e).__name__}: {e}"
+    return {'Check': check, 'Case': case, 'Status': status}
+
+def same_array(expected, actual):
+    actual = np.asarray(actual)
+    return actual.shape == expected.shape and actual.dtype == expected.dtype and np.array_equal(actual, expected)
+
+def codec_label(name, options):
+    return name + ''.join(f" {key}={value}" for key, value in options.items())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that every registered codec and file format restores edge-case inputs exactly.")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    cases = edge_cases(args.seed)
+    rows = check_codecs(cases)
+    with tempfile.TemporaryDirectory() as directory:
+        rows += check_formats(cases, directory)
+        rows += check_driver_archive(cases, directory)
+
+    from tabulate import tabulate
+    print(tabulate([list(row.values()) for row in rows], headers=rows[0].keys(), tablefmt="grid"))
+    failed = [row for row in rows if row['Status'] != 'ok']
+    print(f"{len(failed)} of {len(rows)} round trips failed")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import argparse
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_DIR = '/content/drive/MyDrive/CSCE_614/Project'
+sys.path.append(os.path.join(REPO_ROOT, 'atalanta'))
+sys.path.append(os.path.join(REPO_ROOT, 'data_prep'))
+from atalanta_adaptive import DEFAULT_TABLE_IDS, TABLE_ID_BITS, UPDATE_INTERVAL, AdaptiveAtalantaEncoder
+from atalanta_encode import AtalantaEncoder
+from atalanta_numpy import TABLE_OVERHEAD
+from table_bank import BANK_SIZE, BLOCK_SIZE, block_histograms, build_bank, encode_blocks, select_tables, table_id_bits
+from probability_table_gen import contiguous_ranges
+from profiling import write_rows
+from run_atalanta import get_probability_tables, read_layers
+from traffic_model import value_kind
+
+# Value kind -> (values CSV, probability tables of the two-pass mode), relative to the project directory
+LAYER_FILES = {
+    'weights': ('weights_all_layers.csv', 'probability_table_gen_results/weights_probability_tables.pts'),
+    'activations': ('activations_all_layers.csv', 'probability_table_gen_results/activations_probability_tables.pts'),
+}
+MODES = ('Static', 'Adaptive', 'Adaptive_Split', 'Block_Bank')
+
+
+def compare_layer(input_array, prob_table, vtype, interval=UPDATE_INTERVAL, bank_size=BANK_SIZE, block_size=BLOCK_SIZE):
+    """
+    Compressed size of one layer in the static two-pass mode, the single-pass adaptive
+    modes and the per-block table bank mode.
+
+    The static size is coded with the table refitted to contiguous ranges, so it decodes
+    like every other mode, and carries its probability table (TABLE_OVERHEAD bits); the
+    block bank size carries every table of the bank plus a table id per block, and the
+    adaptive sizes only the initial table id, which is the default of the value kind.
+
+    Args:
+        input_array (np.ndarray): The layer values.
+        prob_table (list): The searched probability table of the layer.
+        vtype (str): The value type of the layer ('weights' or 'activations').
+        interval (int): Symbols coded between adaptive table updates.
+        bank_size (int): Tables of the block bank.
+        block_size (int): Values per block of the block bank mode.
+
+    Returns:
+        dict: '<mode>_Bits' for every mode in MODES.
+    """
+    symbol_bits, _, offset_bits = AtalantaEncoder(contiguous_ranges(prob_table, input_array)).count(input_array)
+    sizes = {'Static_Bits': TABLE_OVERHEAD + symbol_bits + offset_bits}
+    table_id = DEFAULT_TABLE_IDS[value_kind(vtype)]
+    for mode, update_boundaries in (('Adaptive', False), ('Adaptive_Split', True)):
+        encoder = AdaptiveAtalantaEncoder(table_id, interval, update_boundaries)
+        symbol_bits, _, offset_bits = encoder.count(input_array)
+        sizes[f'{mode}_Bits'] = TABLE_ID_BITS + symbol_bits + offset_bits
+
+    bank = build_bank(input_array, bank_size, block_size)
+    table_ids, _ = select_tables(block_histograms(input_array, block_size), bank)
+    symbol_stream, _, offset_length_stream = encode_blocks(input_array, bank, table_ids, block_size).finalize()
+    sizes['Block_Bank_Bits'] = (len(bank) * TABLE_OVERHEAD + table_ids.size * table_id_bits(bank)
+                                + len(symbol_stream) + sum(offset_length_stream))
+    return sizes
+
+def totals_by_kind(rows):
+    # Per value kind: original bits, bits of every mode and its ratio to the original
+    totals = {}
+    for row in rows:
+        kind = value_kind(row['Type'])
+        total = totals.setdefault(kind, {'Kind': kind, 'Layers': 0, 'Original_Bits': 0,
+                                         **{f'{mode}_Bits': 0 for mode in MODES}})
+        total['Layers'] += 1
+        for column in ['Original_Bits'] + [f'{mode}_Bits' for mode in MODES]:
+            total[column] += row[column]
+    for total in totals.values():
+        for mode in MODES:
+            total[f'{mode}_Ratio'] = total[f'{mode}_Bits'] / total['Original_Bits'] if total['Original_Bits'] else 0
+    return list(totals.values())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the Atalanta table modes per layer: two-pass static, single-pass adaptive and per-block table bank.")
+    parser.add_argument('--project-dir', default=PROJECT_DIR)
+    parser.add_argument('--interval', type=int, default=UPDATE_INTERVAL, help="symbols coded between table updates")
+    parser.add_argument('--bank-size', type=int, default=BANK_SIZE, help="tables of the block bank")
+    parser.add_argument('--block-size', type=int, default=BLOCK_SIZE, help="values per block of the block bank mode")
+    parser.add_argument('--output', default=None, help="per-layer CSV (default: comparison_reports/atalanta_modes.csv)")
+    args = parser.parse_args(argv)
+    output = args.output or os.path.join(args.project_dir, 'comparison_reports/atalanta_modes.csv')
+
+    rows = []
+    for values_file, tables_file in LAYER_FILES.values():
+        probability_tables = get_probability_tables(os.path.join(args.project_dir, tables_file))
+        for row, input_array, prob_table in read_layers(os.path.join(args.project_dir, values_file), probability_tables):
+            sizes = compare_layer(input_array, prob_table, row['Type'], args.interval, args.bank_size, args.block_size)
+            rows.append({'Model_Name': row['Model Name'], 'Layer_Number': row['Layer Number'], 'Type': row['Type'],
+                         'Original_Bits': 8 * input_array.size, **sizes})
+    if not rows:
+        print("No layers to compare.")
+        return
+
+    from tabulate import tabulate
+    totals = totals_by_kind(rows)
+    print(tabulate([list(total.values()) for total in totals], headers=totals[0].keys(), tablefmt="grid", floatfmt=".4f"))
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    write_rows(rows, output)
+
+if __name__ == "__main__":
+    main()
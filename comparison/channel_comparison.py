@@ -0,0 +1,102 @@
+import argparse
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_DIR = '/content/drive/MyDrive/CSCE_614/Project'
+sys.path.append(os.path.join(REPO_ROOT, 'atalanta'))
+sys.path.append(os.path.join(REPO_ROOT, 'data_prep'))
+from atalanta_numpy import TABLE_OVERHEAD
+from codec import get_codec
+from layer_store import LayerStore
+from profiling import write_rows
+
+CODECS = ('atalanta', 'shapeshifter')
+
+
+def table_bits(meta):
+    # Bits of the probability table an encoded stream carries, if its codec uses one
+    return TABLE_OVERHEAD if 'table' in meta else 0
+
+def compare_tensor(values, codec_name, channels_per_tile=1, workers=1):
+    """
+    Encodes one weight tensor whole and per output channel with the same codec.
+
+    Both sizes include TABLE_OVERHEAD bits for every probability table sent (one for
+    the whole tensor, one per tile) and the per-channel size also its size index.
+
+    Args:
+        values (np.ndarray): The tensor, output channels first.
+        codec_name (str): The registry name of the codec.
+        channels_per_tile (int): Output channels per stream.
+        workers (int): Processes encoding the tiles.
+
+    Returns:
+        tuple: The sizes and timings (dict) and the size index of the per-channel
+            encoding (list of dicts, one per tile).
+    """
+    start = time.perf_counter()
+    whole = get_codec(codec_name).encode_array(values)
+    whole_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    split = get_codec('per_channel', codec=codec_name, channels_per_tile=channels_per_tile, workers=workers).encode_array(values)
+    split_seconds = time.perf_counter() - start
+
+    index = split.meta['index']
+    whole_bits = whole.bits + table_bits(whole.meta)
+    split_bits = split.bits + sum(table_bits(entry['meta']) for entry in index)
+    sizes = {
+        'Codec': codec_name, 'Tiles': len(index), 'Whole_Bits': whole_bits, 'Per_Channel_Bits': split_bits,
+        'Per_Channel_vs_Whole': split_bits / whole_bits if whole_bits else 0,
+        'Whole_Time (s)': whole_seconds, 'Per_Channel_Time (s)': split_seconds,
+    }
+    return sizes, index
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare whole-tensor and per-output-channel encoding of the weight tensors in layer stores.")
+    parser.add_argument('stores', nargs='+', help="layer store files written by extract_weights.py")
+    parser.add_argument('--project-dir', default=PROJECT_DIR)
+    parser.add_argument('--codecs', nargs='+', default=list(CODECS), help="registry names of the codecs to compare")
+    parser.add_argument('--channels-per-tile', type=int, default=1, help="output channels per independent stream")
+    parser.add_argument('--workers', type=int, default=1, help="processes encoding the channels of a tensor")
+    parser.add_argument('--output', default=None, help="per-layer CSV (default: comparison_reports/channel_comparison.csv)")
+    parser.add_argument('--index-output', default=None,
+                        help="per-channel size index CSV (default: comparison_reports/channel_size_index.csv)")
+    args = parser.parse_args(argv)
+    reports = os.path.join(args.project_dir, 'comparison_reports')
+    output = args.output or os.path.join(reports, 'channel_comparison.csv')
+    index_output = args.index_output or os.path.join(reports, 'channel_size_index.csv')
+
+    rows = []
+    index_rows = []
+    for path in args.stores:
+        store = LayerStore(path)
+        for entry in store.entries:
+            values = store.read(entry, shaped=True)
+            if values.ndim < 2:
+                continue  # No output channels to split
+            for codec_name in args.codecs:
+                sizes, index = compare_tensor(values, codec_name, args.channels_per_tile, args.workers)
+                rows.append({'Model': entry['model'], 'Layer': entry['layer'], 'Shape': 'x'.join(map(str, values.shape)),
+                             'Original_Bits': 8 * values.size, **sizes})
+                channel = 0
+                for tile, tile_entry in enumerate(index):
+                    index_rows.append({'Model': entry['model'], 'Layer': entry['layer'], 'Codec': codec_name,
+                                       'Tile': tile, 'First_Channel': channel, 'Channels': tile_entry['channels'],
+                                       'Bytes': tile_entry['bytes'], 'Bits': tile_entry['bits']})
+                    channel += tile_entry['channels']
+    if not rows:
+        print("No shaped weight tensors to compare.")
+        return
+
+    from tabulate import tabulate
+    print(tabulate([list(row.values()) for row in rows], headers=rows[0].keys(), tablefmt="grid", floatfmt=".4f"))
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    os.makedirs(os.path.dirname(os.path.abspath(index_output)), exist_ok=True)
+    write_rows(rows, output)
+    write_rows(index_rows, index_output)
+
+if __name__ == "__main__":
+    main()
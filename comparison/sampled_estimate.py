@@ -0,0 +1,167 @@
+import time
+from statistics import NormalDist
+
+import numpy as np
+
+
+def estimate_compressed_bits(values, size_fn, n_blocks=32, block_size=4096, confidence=0.95, seed=0, calibrate=False):
+    """
+    Estimates the compressed size of a layer by encoding a random sample of its blocks.
+
+    The layer is cut into consecutive blocks of `block_size` values and `n_blocks` of them
+    are drawn without replacement. Each sampled block is encoded on its own with `size_fn`
+    and the bits-per-value of the sample (its bits over its values, so a short tail block
+    weighs by its length) is extrapolated to the whole layer. The confidence interval is
+    that of the ratio estimator, with the normal approximation and the finite population
+    correction, so it collapses to the exact size when every block is sampled.
+
+    The time a full encode would take is projected with the same ratio estimator: the
+    encode time per value of the sampled blocks times the layer length, which gives the
+    projected speedup. Costs that do not scale with the values (table search, setup) make
+    it approximate; with `calibrate` the whole layer is also encoded, timed and sized,
+    which measures the speedup and the estimate error.
+
+    Args:
+        values (np.ndarray): The layer values.
+        size_fn (callable): Returns the compressed size in bits of an array of values.
+        n_blocks (int): How many blocks to encode.
+        block_size (int): Values per block. Keep it a multiple of the codec's group size.
+        confidence (float): The confidence level of the interval.
+        seed (int): Seed of the block sampler, so runs are repeatable.
+        calibrate (bool): Also encode the whole layer once.
+
+    Returns:
+        dict: The estimate ('bits', 'ci_low', 'ci_high', 'std_err'), how much was encoded
+            ('sampled_values', 'total_values', 'sampled_fraction', 'exact'), the time it
+            took ('elapsed'), the projected full encode ('projected_time',
+            'projected_speedup') and, when calibrating, the measured full encode
+            ('full_bits', 'full_time', 'speedup').
+    """
+    n = len(values)
+    total_blocks = -(-n // block_size)
+    start = time.perf_counter()
+
+    if n_blocks >= total_blocks:
+        # Sampling everything: encode the layer in one piece and report the exact size.
+        bits = float(size_fn(values))
+        elapsed = time.perf_counter() - start
+        estimate = {
+            'bits': bits, 'ci_low': bits, 'ci_high': bits, 'std_err': 0.0,
+            'sampled_values': n, 'total_values': n, 'sampled_fraction': 1.0, 'exact': True, 'elapsed': elapsed,
+            'projected_time': elapsed, 'projected_speedup': 1.0,
+        }
+        if calibrate:
+            estimate.update({'full_bits': bits, 'full_time': elapsed, 'speedup': 1.0})
+        return estimate
+
+    rng = np.random.default_rng(seed)
+    picked = np.sort(rng.choice(total_blocks, size=n_blocks, replace=False))
+    sizes = np.empty(n_blocks)
+    lengths = np.empty(n_blocks)
+    times = np.empty(n_blocks)
+    for i, b in enumerate(picked):
+        block = values[b * block_size:(b + 1) * block_size]
+        block_start = time.perf_counter()
+        sizes[i] = size_fn(block)
+        times[i] = time.perf_counter() - block_start
+        lengths[i] = len(block)
+    elapsed = time.perf_counter() - start
+
+    sampled_values = int(lengths.sum())
+    rate = sizes.sum() / sampled_values
+    bits = float(n * rate)
+    # Ratio estimator: the spread of the block sizes around the sample rate times their lengths
+    residuals = sizes - rate * lengths
+    fpc = 1 - n_blocks / total_blocks
+    std_err = float(total_blocks * residuals.std(ddof=1) / np.sqrt(n_blocks) * np.sqrt(fpc)) if n_blocks > 1 else float('inf')
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    # The full encode time, extrapolated like the size: encode seconds per sampled value
+    projected_time = float(n * times.sum() / sampled_values)
+    estimate = {
+        'bits': bits, 'ci_low': max(bits - z * std_err, 0.0), 'ci_high': bits + z * std_err,
+        'std_err': std_err, 'sampled_values': sampled_values, 'total_values': n,
+        'sampled_fraction': sampled_values / n, 'exact': False, 'elapsed': elapsed,
+        'projected_time': projected_time,
+        'projected_speedup': projected_time / elapsed if elapsed > 0 else float('inf'),
+    }
+    if calibrate:
+        start = time.perf_counter()
+        full_bits = float(size_fn(values))
+        full_time = time.perf_counter() - start
+        estimate.update({'full_bits': full_bits, 'full_time': full_time,
+                         'speedup': full_time / elapsed if elapsed > 0 else float('inf')})
+    return estimate
+
+def combine_estimates(estimates, confidence=0.95):
+    """
+    Sums per-layer estimates into a model-wide estimate. Layers are sampled
+    independently, so their variances add.
+
+    Args:
+        estimates (list): Results of `estimate_compressed_bits`.
+        confidence (float): The confidence level of the combined interval.
+
+    Returns:
+        dict: 'bits', 'ci_low', 'ci_high', 'elapsed', 'sampled_fraction', 'projected_time'
+            and 'projected_speedup', and when every layer was calibrated 'full_bits',
+            'full_time' and 'speedup'.
+    """
+    bits = sum(e['bits'] for e in estimates)
+    std_err = float(np.sqrt(sum(e['std_err'] ** 2 for e in estimates)))
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    elapsed = sum(e['elapsed'] for e in estimates)
+    projected_time = sum(e['projected_time'] for e in estimates)
+    total = {
+        'bits': bits, 'ci_low': max(bits - z * std_err, 0.0), 'ci_high': bits + z * std_err, 'elapsed': elapsed,
+        'sampled_fraction': sum(e['sampled_values'] for e in estimates) / sum(e['total_values'] for e in estimates),
+        'projected_time': projected_time,
+        'projected_speedup': projected_time / elapsed if elapsed > 0 else float('inf'),
+    }
+    if all('speedup' in e for e in estimates):
+        full_time = sum(e['full_time'] for e in estimates)
+        total.update({'full_bits': sum(e['full_bits'] for e in estimates), 'full_time': full_time,
+                      'speedup': full_time / elapsed if elapsed > 0 else float('inf')})
+    return total
+
+def estimate_summary(row, input_array, estimate):
+    # Summary row of a sampled estimate, keeping the column names of the full summary
+    input_stream_length = len(input_array)
+    input_stream_length_bits = input_stream_length*8
+    compression_ratio = input_stream_length_bits/estimate['bits']
+    summary = {
+        'Model_Name': row['Model Name'],
+        'Layer_Number': row['Layer Number'],
+        'Type': row['Type'],
+        'Input_Stream_Length (values)': input_stream_length,
+        'Original (bits)': input_stream_length_bits,
+        'After Compression (bits)': estimate['bits'],
+        'CI_Low (bits)': estimate['ci_low'],
+        'CI_High (bits)': estimate['ci_high'],
+        'Sampled_Values': estimate['sampled_values'],
+        'Compression_Ratio': compression_ratio,
+        'Compression_Percentage': (1-(1/compression_ratio))*100,
+        'Sampled_Fraction': estimate['sampled_fraction'],
+        'Projected_Full_Time (s)': estimate['projected_time'],
+        'Projected_Speedup': estimate['projected_speedup'],
+    }
+    if 'speedup' in estimate:
+        # Measured against a full encode of the layer
+        summary.update({
+            'Full (bits)': estimate['full_bits'],
+            'Estimate_Error (%)': (estimate['bits'] / estimate['full_bits'] - 1) * 100 if estimate['full_bits'] else 0.0,
+            'Full_Time (s)': estimate['full_time'],
+            'Speedup': estimate['speedup'],
+        })
+    return summary
+
+def print_model_estimates(estimates_by_model):
+    # Model-wide estimate, its projected speedup, and the measured one when the full encode ran
+    for model_name, estimates in estimates_by_model.items():
+        total = combine_estimates(estimates)
+        line = (f"{model_name}: {total['bits']:.0f} bits [{total['ci_low']:.0f}, {total['ci_high']:.0f}] "
+                f"in {total['elapsed']:.2f}s from {total['sampled_fraction']:.1%} of the values "
+                f"(projected full encode {total['projected_time']:.2f}s, {total['projected_speedup']:.1f}x speedup)")
+        if 'speedup' in total:
+            line += (f"; full encode {total['full_bits']:.0f} bits in {total['full_time']:.2f}s "
+                     f"({total['speedup']:.1f}x speedup)")
+        print(line)
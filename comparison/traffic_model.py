@@ -0,0 +1,138 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(REPO_ROOT, 'data_prep'))
+from atalanta_numpy import TABLE_OVERHEAD
+
+# Off-chip transfers per inference: weights are read once, activations are written by
+# their layer and read back by the next one.
+ACCESSES = {'weights': 1, 'activations': 2}
+SCHEMES = ('Original', 'Atalanta', 'ShapeShifter')
+
+
+def read_summaries(paths):
+    # Per-layer rows of one codec's encoded summary CSVs (run_atalanta.py / shapeshifter_encode.py)
+    import pandas as pd
+    df = pd.concat([pd.read_csv(path) for path in paths], ignore_index=True)
+    return df[['Model_Name', 'Layer_Number', 'Type', 'Input_Stream_Length (values)',
+               'Original (bits)', 'After Compression (bits)']]
+
+def load_layer_sizes(atalanta_paths, shapeshifter_paths):
+    """
+    Joins the per-layer compressed sizes of both codecs.
+
+    Args:
+        atalanta_paths (list): Atalanta encoded summary CSVs.
+        shapeshifter_paths (list): ShapeShifter encoded summary CSVs.
+
+    Returns:
+        pd.DataFrame: One row per layer present in both: Model_Name, Layer_Number, Type,
+            Values, and the 'Original', 'Atalanta' and 'ShapeShifter' sizes in bits.
+    """
+    atalanta = read_summaries(atalanta_paths).rename(columns={
+        'Input_Stream_Length (values)': 'Values', 'Original (bits)': 'Original',
+        'After Compression (bits)': 'Atalanta'})
+    shapeshifter = read_summaries(shapeshifter_paths)[['Model_Name', 'Layer_Number', 'Type', 'After Compression (bits)']]
+    shapeshifter = shapeshifter.rename(columns={'After Compression (bits)': 'ShapeShifter'})
+    layers = atalanta.merge(shapeshifter, on=['Model_Name', 'Layer_Number', 'Type'], how='inner')
+
+    unmatched = len(atalanta) + len(shapeshifter) - 2 * len(layers)
+    if unmatched:
+        print(f"{unmatched} layers are only in one of the summaries and are left out of the traffic model.")
+    return layers
+
+def value_kind(vtype):
+    # 'weights' or 'activations', whatever spelling the summaries use for the type
+    return 'weights' if 'weight' in str(vtype).lower() else 'activations'
+
+def traffic_model(layers, bandwidth_gbps=25.6, burst_bytes=64, table_overhead_bits=TABLE_OVERHEAD):
+    """
+    Computes the off-chip traffic and transfer time of every layer per inference.
+
+    Every transfer of a layer moves its stream rounded up to whole bursts. An Atalanta
+    stream also carries its probability table (`table_overhead_bits`), which is moved
+    with every transfer. Weights are transferred once per inference and activations
+    twice (written, then read).
+
+    Args:
+        layers (pd.DataFrame): The result of `load_layer_sizes`.
+        bandwidth_gbps (float): Off-chip bandwidth in GB/s.
+        burst_bytes (int): The burst size in bytes.
+        table_overhead_bits (int): Bits of one Atalanta probability table.
+
+    Returns:
+        pd.DataFrame: The layers with, per scheme, the bytes moved per inference
+            ('<scheme> (bytes)'), the transfer time ('<scheme> (us)'), and the savings
+            of both codecs over the original data.
+    """
+    traffic = layers[['Model_Name', 'Layer_Number', 'Type', 'Values']].copy()
+    traffic['Accesses'] = [ACCESSES[value_kind(t)] for t in layers['Type']]
+    for scheme in SCHEMES:
+        bits = layers[scheme].astype(float)
+        if scheme == 'Atalanta':
+            bits = bits + table_overhead_bits
+        bursts = np.ceil(np.ceil(bits / 8) / burst_bytes)
+        traffic[f'{scheme} (bytes)'] = (bursts * burst_bytes * traffic['Accesses']).astype(np.int64)
+        traffic[f'{scheme} (us)'] = traffic[f'{scheme} (bytes)'] / (bandwidth_gbps * 1e3)
+    add_savings(traffic)
+    return traffic
+
+def add_savings(traffic):
+    # Traffic saved by each codec over the uncompressed data, and by Atalanta over ShapeShifter
+    original = traffic['Original (bytes)']
+    traffic['Atalanta_Savings (%)'] = (1 - traffic['Atalanta (bytes)'] / original) * 100
+    traffic['ShapeShifter_Savings (%)'] = (1 - traffic['ShapeShifter (bytes)'] / original) * 100
+    traffic['Atalanta_over_ShapeShifter (%)'] = (1 - traffic['Atalanta (bytes)'] / traffic['ShapeShifter (bytes)']) * 100
+
+def network_totals(traffic):
+    """
+    Sums the per-layer traffic into whole-network totals, per model and value kind
+    and per model overall.
+
+    Returns:
+        pd.DataFrame: One row per (model, kind) plus an 'all' row per model.
+    """
+    import pandas as pd
+
+    columns = [c for c in traffic.columns if c.endswith('(bytes)') or c.endswith('(us)')]
+    kinds = traffic.assign(Kind=[value_kind(t) for t in traffic['Type']])
+    per_kind = kinds.groupby(['Model_Name', 'Kind'], as_index=False)[columns].sum()
+    per_model = kinds.groupby('Model_Name', as_index=False)[columns].sum().assign(Kind='all')
+    totals = pd.concat([per_kind, per_model], ignore_index=True).sort_values(['Model_Name', 'Kind'], ignore_index=True)
+    add_savings(totals)
+    return totals
+
+def main(argv=None):
+    summaries = '/content/drive/MyDrive/CSCE_614/Project'
+    parser = argparse.ArgumentParser(description="Off-chip memory traffic of Atalanta and ShapeShifter per inference.")
+    parser.add_argument('--atalanta', nargs='+', default=[
+        os.path.join(summaries, 'atalanta_outputs/atalanta_encoded_summary_weights.csv'),
+        os.path.join(summaries, 'atalanta_outputs/atalanta_encoded_summary_activations.csv')])
+    parser.add_argument('--shapeshifter', nargs='+', default=[
+        os.path.join(summaries, 'shapeshifter_outputs/shapeshifter_encoded_summary_weights.csv'),
+        os.path.join(summaries, 'shapeshifter_outputs/shapeshifter_encoded_summary_activations.csv')])
+    parser.add_argument('--bandwidth', type=float, default=25.6, help="off-chip bandwidth in GB/s")
+    parser.add_argument('--burst', type=int, default=64, help="burst size in bytes")
+    parser.add_argument('--table-overhead', type=int, default=TABLE_OVERHEAD, help="bits of one Atalanta probability table")
+    parser.add_argument('--output', default=os.path.join(summaries, 'comparison_reports/traffic_model.csv'))
+    args = parser.parse_args(argv)
+
+    layers = load_layer_sizes(args.atalanta, args.shapeshifter)
+    traffic = traffic_model(layers, args.bandwidth, args.burst, args.table_overhead)
+    totals = network_totals(traffic)
+
+    from tabulate import tabulate
+    print(tabulate(totals, headers='keys', tablefmt="grid", showindex=False, floatfmt=".2f"))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    traffic.to_csv(args.output, index=False)
+    totals_path = args.output.replace('.csv', '_totals.csv')
+    totals.to_csv(totals_path, index=False)
+    print(f"Per-layer traffic written to {args.output}, network totals to {totals_path}")
+
+if __name__ == "__main__":
+    main()
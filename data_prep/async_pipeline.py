@@ -0,0 +1,141 @@
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+QUEUE_DEPTH = 4
+_DONE = object()  # End of the read stream
+_FAILED = object()  # Result of an item whose encode raised
+
+
+def run_pipeline(source, encode, sink, workers=1, queue_depth=QUEUE_DEPTH, skip=None, processes=True):
+    """
+    Runs read -> encode -> write as overlapping asyncio stages.
+
+    A reader task pulls the items of `source` (CSV parsing and planning) on its own
+    thread into a bounded queue; `workers` encoder tasks hand them to an executor; a
+    writer task calls `sink` on its own thread, in source order, as soon as every
+    earlier item is written. At most 2 * queue_depth + workers items are held at once
+    (queued, encoding, or waiting for an earlier item to be written), so memory is
+    bounded by the queue depth whatever the layer sizes and encode order.
+
+    Items whose encode raises are reported and dropped, as the sequential drivers do.
+    An exception in `source` or `sink` stops the pipeline and is raised.
+
+    Args:
+        source (iterable): The items, produced lazily.
+        encode (callable): Called with an item in the executor; must be picklable
+            (a module-level function or a partial of one) when `processes` is True.
+        sink (callable): Called with (item, result) for every item.
+        workers (int): Concurrent encodes.
+        queue_depth (int): Items the reader prefetches ahead of the encoders (and
+            results the encoders may finish ahead of the writer).
+        skip (callable, optional): Items for which it returns True go to the sink with
+            result None, without an encode (e.g. layers unchanged since the last run).
+        processes (bool): Encode in worker processes (pure-Python coders hold the GIL);
+            otherwise in threads.
+
+    Returns:
+        list: One utilization row per stage (see `stage_rows`).
+    """
+    return asyncio.run(_run_pipeline(source, encode, sink, workers, queue_depth, skip, processes))
+
+def stage_rows(stats, wall_seconds):
+    # Per stage: items, busy and waiting time, the share of the run its tasks were busy, and the
+    # deepest its output queue got (for the writer, the results held for an earlier item)
+    rows = []
+    for stage in stats.values():
+        capacity = wall_seconds * stage['Tasks']
+        rows.append(dict(stage, **{'Wall (s)': wall_seconds,
+                                   'Utilization (%)': stage['Busy (s)'] / capacity * 100 if capacity else 0.0}))
+    return rows
+
+def print_stage_utilization(rows):
+    from tabulate import tabulate
+    print(tabulate([list(row.values()) for row in rows], headers=rows[0].keys(), tablefmt="grid", floatfmt=".3f"))
+
+async def _run_pipeline(source, encode, sink, workers, queue_depth, skip, processes):
+    loop = asyncio.get_running_loop()
+    stats = {name: {'Stage': name, 'Tasks': tasks, 'Items': 0, 'Busy (s)': 0.0, 'Wait (s)': 0.0, 'Max_Queued': 0}
+             for name, tasks in (('read', 1), ('encode', workers), ('write', 1))}
+    inbox = asyncio.Queue(queue_depth)
+    outbox = asyncio.Queue(queue_depth)
+    held = asyncio.Semaphore(2 * queue_depth + workers)
+
+    reader = ThreadPoolExecutor(1)
+    writer = ThreadPoolExecutor(1)
+    pool = ProcessPoolExecutor(workers) if processes else ThreadPoolExecutor(workers)
+
+    async def timed(stage, key, awaitable):
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            stats[stage][key] += time.perf_counter() - start
+
+    async def read():
+        items = iter(source)
+        seq = 0
+        while True:
+            await timed('read', 'Wait (s)', held.acquire())
+            item = await timed('read', 'Busy (s)', loop.run_in_executor(reader, next, items, _DONE))
+            if item is _DONE:
+                break
+            await timed('read', 'Wait (s)', inbox.put((seq, item)))
+            stats['read']['Items'] += 1
+            stats['read']['Max_Queued'] = max(stats['read']['Max_Queued'], inbox.qsize())
+            seq += 1
+        for _ in range(workers):
+            await inbox.put(_DONE)
+
+    async def work():
+        while True:
+            job = await timed('encode', 'Wait (s)', inbox.get())
+            if job is _DONE:
+                return
+            seq, item = job
+            result = None
+            if skip is None or not skip(item):
+                try:
+                    result = await timed('encode', 'Busy (s)', loop.run_in_executor(pool, encode, item))
+                except Exception as e:
+                    print(f"Error processing row: {e}")
+                    result = _FAILED
+            stats['encode']['Items'] += 1
+            await timed('encode', 'Wait (s)', outbox.put((seq, item, result)))
+            stats['encode']['Max_Queued'] = max(stats['encode']['Max_Queued'], outbox.qsize())
+
+    async def produce():
+        await asyncio.gather(read(), *(work() for _ in range(workers)))
+        await outbox.put(_DONE)
+
+    async def write():
+        finished = {}
+        next_seq = 0
+        while True:
+            job = await timed('write', 'Wait (s)', outbox.get())
+            if job is _DONE:
+                return
+            seq, item, result = job
+            finished[seq] = (item, result)
+            stats['write']['Max_Queued'] = max(stats['write']['Max_Queued'], len(finished))
+            # Write every item whose predecessors are all written
+            while next_seq in finished:
+                item, result = finished.pop(next_seq)
+                if result is not _FAILED:
+                    await timed('write', 'Busy (s)', loop.run_in_executor(writer, sink, item, result))
+                    stats['write']['Items'] += 1
+                held.release()
+                next_seq += 1
+
+    start = time.perf_counter()
+    tasks = [asyncio.ensure_future(produce()), asyncio.ensure_future(write())]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    finally:
+        for executor in (reader, writer, pool):
+            executor.shutdown(wait=True)
+    return stage_rows(stats, time.perf_counter() - start)
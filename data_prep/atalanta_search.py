@@ -157,7 +157,7 @@ def search(bits, hist, ptab, in_verbose):
         search_try(hist, pnew, score_best, pbest, 2, -2)
         if verbose == 1:
             print(f"ENCODED: {score_best[0]:.6f}")
-        if score_best[0] / prev_best > 0.99:
+        if prev_best == 0 or score_best[0] / prev_best > 0.99:  # a zero-cost table cannot improve
             break
 
     if verbose > 1:
@@ -1,27 +1,13 @@
-import torchvision.models.quantization as models
-import torch
 import numpy as np
 import csv
-import pandas as pd
-import torchvision.transforms as transforms
-from torch.utils.data import DataLoader
-from torchvision import datasets
 from collections import defaultdict
-from PIL import Image
+from prettytable import PrettyTable
 import os
+import argparse
 
-sample_data_dir = "/content/drive/MyDrive/CSCE_614/Project/sample_activation_data"
-
-resnet50_weights = models.ResNet50_QuantizedWeights.DEFAULT
-mobilenet_v2_weights = models.MobileNet_V2_QuantizedWeights.DEFAULT
-googlenet_weights = models.GoogLeNet_QuantizedWeights.DEFAULT
+from extract_weights import MODEL_WEIGHTS, get_model_weights, load_model
 
-# Load pre-trained quantized models
-models_dict = {
-    "Resnet50": [models.resnet50(weights = resnet50_weights, quantize=True), resnet50_weights],
-    "Mobilenet_v2": [models.mobilenet_v2(weights = mobilenet_v2_weights, quantize=True), mobilenet_v2_weights],
-    "GoogLeNet": [models.googlenet(weights = googlenet_weights, quantize=True), googlenet_weights],
-}
+sample_data_dir = "/content/drive/MyDrive/CSCE_614/Project/sample_activation_data"
 
 def write_to_csv(results, filename):
     # Filepath for the CSV
@@ -60,6 +46,8 @@ def load_images_from_directory(directory):
     return image_paths
 
 def process_images(model_weights, images):
+    from PIL import Image
+
     preprocess = model_weights.transforms()
 
     processed_images = []
@@ -73,7 +61,8 @@ def process_images(model_weights, images):
 
 # Function to extract activations using hooks
 def extract_activations(model, image_batch):
-  
+    import torch
+
     activations = defaultdict(list)
 
     def add_hooks():
@@ -127,15 +116,21 @@ def extract_activations(model, image_batch):
     return final_activations
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract int8 activations of the quantized models.")
+    parser.add_argument("--images", default=sample_data_dir, help="directory of the sample input images")
+    parser.add_argument("--output", default="activations_all_layers.csv")
+    args = parser.parse_args()
+
     # Extract and save activations
     results = []
-    images = load_images_from_directory(sample_data_dir)
-    for model_name in models_dict:
+    images = load_images_from_directory(args.images)
+    for model_name in MODEL_WEIGHTS:
         print("--------------------------------------------")
         print(f"Model: {model_name}")
         print("--------------------------------------------")
-        processed_images = process_images(models_dict[model_name][1], images)
-        activations = extract_activations(models_dict[model_name][0], processed_images)
+        # Pre-trained quantized models are built one at a time, when they are needed
+        processed_images = process_images(get_model_weights(model_name), images)
+        activations = extract_activations(load_model(model_name), processed_images)
         for layer_name, values in activations.items():
             results.append({
                 "model": model_name,
@@ -144,4 +139,4 @@ if __name__ == "__main__":
                 "values": values
             })
 
-    write_to_csv(results, "activations_all_layers.csv")
+    write_to_csv(results, args.output)
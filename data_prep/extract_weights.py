@@ -1,27 +1,46 @@
-import torchvision.models.quantization as models
-import torch
-import numpy as np
+import argparse
 import csv
-import pandas as pd
-import torchvision.transforms as transforms
-from torch.utils.data import DataLoader
-from torchvision import datasets
-from collections import defaultdict
-from PIL import Image
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 from prettytable import PrettyTable
 
+from layer_store import LayerStore, LayerStoreWriter
 
-resnet50_weights = models.ResNet50_QuantizedWeights.DEFAULT
-mobilenet_v2_weights = models.MobileNet_V2_QuantizedWeights.DEFAULT
-googlenet_weights = models.GoogLeNet_QuantizedWeights.DEFAULT
 
-# Load pre-trained quantized models
-models_dict = {
-    "Resnet50": [models.resnet50(weights = resnet50_weights, quantize=True), resnet50_weights],
-    "Mobilenet_v2": [models.mobilenet_v2(weights = mobilenet_v2_weights, quantize=True), mobilenet_v2_weights],
-    "GoogLeNet": [models.googlenet(weights = googlenet_weights, quantize=True), googlenet_weights],
+# Model name -> (torchvision builder, quantized weights as "<enum>.<member>", the
+# DEFAULT of each enum). The names are static so that a cached snapshot is found
+# without importing torchvision; models are only built when their snapshot is
+# missing, inside the worker that needs them.
+MODEL_WEIGHTS = {
+    "Resnet50": ("resnet50", "ResNet50_QuantizedWeights.IMAGENET1K_FBGEMM_V2"),
+    "Mobilenet_v2": ("mobilenet_v2", "MobileNet_V2_QuantizedWeights.IMAGENET1K_QNNPACK_V1"),
+    "GoogLeNet": ("googlenet", "GoogLeNet_QuantizedWeights.IMAGENET1K_FBGEMM_V1"),
 }
 
+snapshot_dir = "weight_snapshots"
+# Bumped whenever the snapshot contents change, so older snapshots are re-extracted
+# instead of reused: v2 stores every tensor with its shape
+SNAPSHOT_VERSION = 2
+
+
+def get_model_weights(model_name):
+    import torchvision.models.quantization as models
+
+    weights_enum, member = MODEL_WEIGHTS[model_name][1].split(".")
+    return getattr(getattr(models, weights_enum), member)
+
+def load_model(model_name):
+    import torchvision.models.quantization as models
+
+    builder = getattr(models, MODEL_WEIGHTS[model_name][0])
+    return builder(weights=get_model_weights(model_name), quantize=True)
+
+def snapshot_path(store_dir, weights):
+    # e.g. weights_v2_ResNet50_QuantizedWeights.IMAGENET1K_FBGEMM_V2.bin
+    return os.path.join(store_dir, f"weights_v{SNAPSHOT_VERSION}_{weights}.bin")
+
 def write_to_csv(results, filename):
     # Filepath for the CSV
     output_file = filename
@@ -40,44 +59,94 @@ def write_to_csv(results, filename):
                 entry["layer_name"],
                 entry["type"],
             ] + entry["values"].tolist()
-            
+
             writer.writerow(row)
 
 def extract_weights(model):
     # Extract weights from the model
     weights_dict = {}
-    
+
     table = PrettyTable()
     table.field_names = ["Layer Name", "Number of Parameters"]
-    
-    layer_names = model.state_dict().keys()
-    for layer_name in layer_names:
+
+    # state_dict() rebuilds the whole dict on every call, so build it once.
+    state_dict = model.state_dict()
+    for layer_name, tensor in state_dict.items():
         if 'weight' in layer_name:
-            layer_weights = model.state_dict()[layer_name].int_repr().flatten().numpy()
-            normalized_array = layer_weights + 128
+            # Keep the tensor shape (output channels first) for per-channel encoding
+            layer_weights = tensor.int_repr().numpy()
+            normalized_array = (layer_weights.astype(np.int16) + 128).astype(np.uint8)
             weights_dict[layer_name] = normalized_array
-            table.add_row([layer_name, len(normalized_array)])
+            table.add_row([layer_name, normalized_array.size])
 
-    print(table)  
+    print(table)
 
     return weights_dict
 
+def snapshot_model_weights(model_name, store_dir):
+    """
+    Makes sure the int8 weight snapshot of a model exists in the layer store.
+
+    Args:
+        model_name (str): A key of MODEL_WEIGHTS.
+        store_dir (str): The directory holding the snapshots.
+
+    Returns:
+        tuple: (model_name, snapshot path, True if the model had to be loaded).
+    """
+    weights = MODEL_WEIGHTS[model_name][1]
+    path = snapshot_path(store_dir, weights)
+    if os.path.exists(path):
+        return model_name, path, False
+
+    print("--------------------------------------------")
+    print(f"Model: {model_name}")
+    print("--------------------------------------------")
+    weights_dict = extract_weights(load_model(model_name))
+
+    meta = {'model': model_name, 'weights': weights, 'snapshot_version': SNAPSHOT_VERSION}
+    with LayerStoreWriter(path, meta=meta) as store:
+        for layer_name, values in weights_dict.items():
+            store.add(model_name, layer_name, "weights", values)
+    return model_name, path, True
+
+def extract_all(model_names, store_dir, workers=None):
+    """
+    Snapshots the weights of several models, one worker process per model.
+
+    Returns:
+        dict: Model name -> snapshot path, in the order of `model_names`.
+    """
+    paths = {}
+    with ProcessPoolExecutor(max_workers=workers or len(model_names)) as executor:
+        futures = [executor.submit(snapshot_model_weights, name, store_dir) for name in model_names]
+        for future in futures:
+            model_name, path, loaded = future.result()
+            status = "extracted" if loaded else "cached snapshot"
+            print(f"{model_name}: {status} {path}")
+            paths[model_name] = path
+    return paths
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract int8 weights of the quantized models.")
+    parser.add_argument("--models", nargs="+", default=list(MODEL_WEIGHTS), choices=list(MODEL_WEIGHTS))
+    parser.add_argument("--store-dir", default=snapshot_dir)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default="weights_all_layers.csv")
+    args = parser.parse_args()
+
     # Extract and save weights
-    results = []
-    for model_name in models_dict:
-        print("--------------------------------------------")
-        print(f"Model: {model_name}")
-        print("--------------------------------------------")
-        weights = extract_weights(models_dict[model_name][0])
+    snapshots = extract_all(args.models, args.store_dir, args.workers)
 
-        for layer_name, values in weights.items():
+    results = []
+    for model_name, path in snapshots.items():
+        for model, layer_name, vtype, values in LayerStore(path):
             results.append({
-                "model": model_name,
+                "model": model,
                 "layer_name": layer_name,
-                "type": "weights",
+                "type": vtype,
                 "values": values
             })
 
-    write_to_csv(results, "weights_all_layers.csv")
+    write_to_csv(results, args.output)
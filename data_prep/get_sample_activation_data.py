@@ -1,7 +1,5 @@
-import tarfile
+import argparse
 import os
-import numpy as np
-import matplotlib.pyplot as plt
 import random
 
 # Path to the compressed CIFAR-10 dataset
@@ -15,42 +13,60 @@ def unpickle(file):
         data_dict = pickle.load(fo, encoding='bytes')
     return data_dict
 
-# Load a batch file
-batch_file = os.path.join(extract_dir, "data_batch_1")  # Load the first batch
-data_dict = unpickle(batch_file)
-images = data_dict[b'data']  # Image data
-labels = data_dict[b'labels']  # Corresponding labels
-
-# Step 2: Reshape images to (32, 32, 3) format
-images = images.reshape(-1, 3, 32, 32).transpose(0, 2, 3, 1)
-
-# Step 3: Randomly select 10 images
-indices = random.sample(range(len(images)), 10)
-selected_images = images[indices]
-selected_labels = [labels[i] for i in indices]
-
-# Step 4: Display the selected images
-fig, axes = plt.subplots(1, 10, figsize=(15, 2))
-for i, ax in enumerate(axes):
-    ax.imshow(selected_images[i])
-    ax.set_title(f"Label: {selected_labels[i]}")
-    ax.axis('off')
-plt.tight_layout()
-plt.show()
-
-
-# Step 5: Save selected images to the output folder
-if not os.path.exists(output_dir):
-    os.makedirs(output_dir)  # Create the folder if it doesn't exist
-
-# Save images
-for i, img in enumerate(selected_images):
-    # Convert the image from NumPy array to PIL Image format
-    image = Image.fromarray(img)
-    
-    # Save the image with a filename indicating the label
-    image_name = f"image_{i}_label_{selected_labels[i]}.png"
-    image_path = os.path.join(output_dir, image_name)
-    image.save(image_path)
-
-    print(f"Saved image {image_name} to {output_dir}")
\ No newline at end of file
+def show_images(selected_images, selected_labels):
+    # Step 4: Display the selected images
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(1, len(selected_images), figsize=(15, 2))
+    for i, ax in enumerate(axes):
+        ax.imshow(selected_images[i])
+        ax.set_title(f"Label: {selected_labels[i]}")
+        ax.axis('off')
+    plt.tight_layout()
+    plt.show()
+
+def main(argv=None):
+    from PIL import Image
+
+    parser = argparse.ArgumentParser(description="Save a random sample of CIFAR-10 images for the activation extraction.")
+    parser.add_argument("--batches", default=extract_dir, help="directory of the extracted CIFAR-10 python batches")
+    parser.add_argument("--output", default=output_dir)
+    parser.add_argument("--count", type=int, default=10)
+    parser.add_argument("--no-show", dest="show", action="store_false", help="do not display the selected images")
+    args = parser.parse_args(argv)
+
+    # Load a batch file
+    batch_file = os.path.join(args.batches, "data_batch_1")  # Load the first batch
+    data_dict = unpickle(batch_file)
+    images = data_dict[b'data']  # Image data
+    labels = data_dict[b'labels']  # Corresponding labels
+
+    # Step 2: Reshape images to (32, 32, 3) format
+    images = images.reshape(-1, 3, 32, 32).transpose(0, 2, 3, 1)
+
+    # Step 3: Randomly select the images
+    indices = random.sample(range(len(images)), args.count)
+    selected_images = images[indices]
+    selected_labels = [labels[i] for i in indices]
+
+    if args.show:
+        show_images(selected_images, selected_labels)
+
+    # Step 5: Save selected images to the output folder
+    if not os.path.exists(args.output):
+        os.makedirs(args.output)  # Create the folder if it doesn't exist
+
+    # Save images
+    for i, img in enumerate(selected_images):
+        # Convert the image from NumPy array to PIL Image format
+        image = Image.fromarray(img)
+
+        # Save the image with a filename indicating the label
+        image_name = f"image_{i}_label_{selected_labels[i]}.png"
+        image_path = os.path.join(args.output, image_name)
+        image.save(image_path)
+
+        print(f"Saved image {image_name} to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import json
+import os
+import struct
+
+import numpy as np
+
+# Binary layer store layout:
+#   MAGIC (4 bytes) | version (u32) | index offset (u64) | index length (u64)
+#   raw layer payloads, each aligned to PAYLOAD_ALIGN bytes
+#   JSON index (metadata + one entry per layer) at the end of the file
+MAGIC = b'ATLS'
+VERSION = 1
+HEADER = struct.Struct('<4sIQQ')
+PAYLOAD_ALIGN = 64
+
+
+class LayerStoreWriter:
+    """
+    Writes layers into a single binary layer store file.
+
+    The file is written under a temporary name and only moved into place by `close()`,
+    so a store that exists on disk is always complete.
+
+    Attributes:
+        path (str): The final path of the store.
+        meta (dict): Free-form metadata saved with the index (e.g. the weights enum).
+        entries (list): The index entries of the layers written so far.
+    """
+
+    def __init__(self, path, meta=None):
+        """
+        Opens a new layer store for writing.
+
+        Args:
+            path (str): Where the store is created.
+            meta (dict, optional): Metadata saved alongside the layer index.
+        """
+        self.path = path
+        self.meta = meta or {}
+        self.entries = []
+        self.tmp_path = path + '.tmp'
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.file = open(self.tmp_path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, 0, 0))
+
+    def add(self, model, layer_name, vtype, values):
+        """
+        Appends one layer to the store.
+
+        Args:
+            model (str): The model name.
+            layer_name (str): The layer name.
+            vtype (str): The value type ('weights' or 'activations').
+            values (np.ndarray): The layer values, in their tensor shape (saved in the index).
+        """
+        values = np.ascontiguousarray(values)
+        pad = -self.file.tell() % PAYLOAD_ALIGN
+        self.file.write(b'\0' * pad)
+        self.entries.append({
+            'model': model,
+            'layer': layer_name,
+            'type': vtype,
+            'dtype': values.dtype.str,
+            'count': int(values.size),
+            'shape': list(values.shape),
+            'offset': self.file.tell(),
+        })
+        self.file.write(values.tobytes())
+
+    def close(self):
+        """
+        Writes the index, patches the header and moves the store into place.
+        """
+        index = json.dumps({'meta': self.meta, 'layers': self.entries}).encode()
+        index_offset = self.file.tell()
+        self.file.write(index)
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, VERSION, index_offset, len(index)))
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # Never leave a half-written store behind.
+            self.file.close()
+            os.remove(self.tmp_path)
+
+
+class LayerStore:
+    """
+    Read-only view of a binary layer store. Layer values are memory-mapped, so opening
+    a store and reading one layer does not load the rest of the file.
+
+    Attributes:
+        path (str): The path of the store.
+        meta (dict): The metadata saved with the store.
+        entries (list): One index entry per layer, in write order.
+    """
+
+    def __init__(self, path):
+        """
+        Opens an existing layer store.
+
+        Args:
+            path (str): The path of the store.
+
+        Raises:
+            ValueError: If the file is not a layer store.
+        """
+        self.path = path
+        with open(path, 'rb') as file:
+            magic, version, index_offset, index_length = HEADER.unpack(file.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} layer store.")
+            file.seek(index_offset)
+            index = json.loads(file.read(index_length))
+        self.meta = index['meta']
+        self.entries = index['layers']
+        self.data = np.memmap(path, dtype=np.uint8, mode='r')
+        self.by_key = {(e['model'], e['layer'], e['type']): e for e in self.entries}
+
+    def read(self, entry, shaped=False):
+        """
+        Returns the values of the layer described by an index entry.
+
+        Args:
+            entry (dict): An entry of `self.entries`.
+            shaped (bool): Return the values in their tensor shape instead of flat.
+                Stores written before shapes were saved only have the flat shape.
+
+        Returns:
+            np.ndarray: A read-only view of the layer values.
+        """
+        dtype = np.dtype(entry['dtype'])
+        start = entry['offset']
+        values = self.data[start:start + entry['count'] * dtype.itemsize].view(dtype)
+        return values.reshape(entry.get('shape', [entry['count']])) if shaped else values
+
+    def get(self, model, layer_name, vtype, shaped=False):
+        """
+        Returns the values of a layer by name (see `read`).
+
+        Raises:
+            KeyError: If the layer is not in the store.
+        """
+        return self.read(self.by_key[(model, layer_name, vtype)], shaped)
+
+    def __iter__(self):
+        """
+        Yields (model, layer_name, vtype, values) for every layer in write order.
+        """
+        for entry in self.entries:
+            yield entry['model'], entry['layer'], entry['type'], self.read(entry)
+
+    def __len__(self):
+        return len(self.entries)
@@ -1,13 +1,21 @@
 import numpy as np
-import pandas as pd
 import time
 import subprocess
 import re
 import os
 import csv
+import sys
+import argparse
 
-results_path = '/content/drive/MyDrive/CSCE_614/Project/probability_table_gen_results'
-values_path = '/content/drive/MyDrive/CSCE_614/Project/'
+from run_manifest import RunManifest, hash_params, hash_values
+import atalanta_search
+from atalanta_search import Pte, search
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'atalanta'))
+from table_store import build_table_store
+from probability_table import ProbabilityModel
+
+project_dir = '/content/drive/MyDrive/CSCE_614/Project'
 
 def run_atalanta(input_array):
     # Handle non-finite values and ensure uint8 conversion
@@ -28,11 +36,20 @@ def run_atalanta(input_array):
             data.append([int(match.group(1)), int(match.group(2)), int(match.group(3)),
                          int(match.group(4)), int(match.group(5)), float(match.group(6))])
 
+    import pandas as pd
+
     # If no data is parsed, return an empty DataFrame
     if len(data) == 0:
         print("No data was parsed from Atalanta output.")
         return pd.DataFrame(columns=['v_min', 'v_max', 'OL', 't_low', 't_high', 'p'])
 
+    # Contiguous ranges, so that every row the layer uses can be decoded
+    return pd.DataFrame(contiguous_ranges(table_from_entries(data).to_dict(orient='records'), input_array))
+
+def table_from_entries(data):
+    # Probability table from the search entries [off, v_min, abits, obits, vcnt, vcnt/value_cnt]
+    import pandas as pd
+
     # Create and process DataFrame
     columns = ['off', 'v_min', 'abits', 'obits', 'vcnt', 'vcnt/value_cnt']
     df = pd.DataFrame(data, columns=columns)
@@ -56,65 +73,151 @@ def run_atalanta(input_array):
 
     return final_df
 
-values_dict = {'activations': os.path.join(values_path, 'activations_all_layers.csv'), 'weights': os.path.join(values_path, 'weights_all_layers.csv')}
-
-for type, path in values_dict.items():
-
-    # Create output directories and CSV for timing
-    csv_dir = type+'_probability_tables'
-    csv_dir = os.path.join(results_path, csv_dir)
-    os.makedirs(csv_dir, exist_ok=True)
-    timing_results = []
-
-    # Process CSV line by line
-    with open(path, 'r') as csvfile:
-        csvreader = csv.reader(csvfile)
-        headers = next(csvreader)  # Read header row
-
-        for row in csvreader:
-            try:
-                # Extract metadata
-                model_name = row[0]
-                layer_number = row[1]
-                row_type = row[2]
-
-                # Extract numeric values after the first three columns
-                numeric_values = np.array(row[3:], dtype=np.float32)
-
-                # Track time to generate the table
-                start_time = time.time()
-                final_df = run_atalanta(numeric_values)
-                end_time = time.time()
-                time_taken = end_time - start_time
-
-                # If the output DataFrame is empty, skip this row
-                if final_df.empty:
-                    print(f"Skipping {model_name}, Layer {layer_number}, Type {row_type} due to empty output.")
-                    continue
-
-                # Save the generated table to a CSV file
-                row_name = f"{model_name}_{layer_number}_{row_type}"
-                csv_path = os.path.join(results_path, csv_dir, f'pt_{row_name}.csv')
-                final_df.to_csv(csv_path, index=False)
-
-                # Append timing information to the results
-                timing_results.append({'Model': model_name, 'Layer': layer_number, 'Type': row_type, 'Time Taken (s)': time_taken})
-
-            except Exception as e:
-                print(f"Error processing row {row}: {e}")
-                continue
-
-    # Save timing results to a CSV file
-    timing_df = pd.DataFrame(timing_results)
-    timing_path = os.path.join(results_path, type+'_pt_gen_timing_results.csv')
-    timing_df.to_csv(timing_path, index=False)
-
-    # Clean up temporary file
-    if os.path.exists('temp_input.npy'):
-        os.remove('temp_input.npy')
-
-    print(f"Processing complete. {type} Probability Tables saved in {csv_dir} directory.")
-    print(f"Timing results saved to {timing_path}.")
-
-    # Zip the atalanta_tables directory
-    subprocess.run(['zip', '-r', os.path.join(results_path, csv_dir+'.zip'), os.path.join(results_path, csv_dir)])
\ No newline at end of file
+def contiguous_ranges(table, values=None, total=1024, histogram=None):
+    """
+    Rebuilds the t_low/t_high ranges of a table as contiguous ranges summing to `total`.
+
+    `table_from_entries` rounds every cumulative probability on its own, which can leave
+    rare rows with an empty range; their symbols encode but cannot be decoded. Here
+    every used row gets at least one unit, and the largest row absorbs the rounding.
+
+    Args:
+        table (list): Probability table rows with a 'p' field.
+        values (np.ndarray, optional): The values the table is for. Rows are then weighted
+            by how often the encoder actually picks them (the first covering row), which
+            can differ from 'p' when rows overlap.
+        total (int): The probability scale (the coder divides by 1024).
+        histogram (np.ndarray, optional): The count of every value, instead of `values`.
+
+    Returns:
+        list: The rows with new 't_low' and 't_high'.
+    """
+    if values is not None:
+        histogram = np.bincount(np.asarray(values, dtype=np.int64), minlength=1)
+    if histogram is not None:
+        histogram = np.asarray(histogram)
+        v_max = max(int(entry['v_max']) for entry in table)
+        rows = ProbabilityModel(table).row_lookup(max(v_max + 1, histogram.size))[:histogram.size]
+        p = np.bincount(rows[rows >= 0], weights=histogram[rows >= 0], minlength=len(table)).astype(float)
+    else:
+        p = np.array([float(entry['p']) for entry in table])
+    scaled = p * total / p.sum() if p.sum() > 0 else np.full(p.size, total / p.size)
+    freq = np.where(scaled > 0, np.maximum(np.floor(scaled), 1), 0).astype(np.int64)
+    freq[np.argmax(freq)] += total - freq.sum()
+    bounds = np.concatenate(([0], np.cumsum(freq)))
+    return [dict(entry, t_low=int(bounds[i]), t_high=int(bounds[i + 1])) for i, entry in enumerate(table)]
+
+def search_table(values):
+    # Probability table of a layer, searched in-process like atalanta_numpy.py does
+    return search_histogram(np.bincount(values, minlength=256))
+
+def search_histogram(histogram):
+    # Probability table of a value histogram (the search only looks at the counts)
+    atalanta_search.verbose = 0
+    n_values = int(np.sum(histogram))
+    entries = [Pte() for _ in range(atalanta_search.PROBS)]
+    search(8, np.asarray(histogram).tolist(), entries, 0)
+    data = [[pt.off, pt.vmin, round(pt.abits), round(pt.obits), pt.vcnt, pt.vcnt / n_values] for pt in entries]
+    return table_from_entries(data).to_dict(orient='records')
+
+def main(resume=True, project_dir=project_dir):
+    import pandas as pd
+
+    results_path = os.path.join(project_dir, 'probability_table_gen_results')
+    values_path = project_dir
+    values_dict = {'activations': os.path.join(values_path, 'activations_all_layers.csv'), 'weights': os.path.join(values_path, 'weights_all_layers.csv')}
+
+    for type, path in values_dict.items():
+
+        # Create output directories and CSV for timing
+        csv_dir = type+'_probability_tables'
+        csv_dir = os.path.join(results_path, csv_dir)
+        os.makedirs(csv_dir, exist_ok=True)
+        timing_results = []
+
+        # Layers whose values and table parameters are unchanged since the last run are reused
+        manifest = RunManifest(os.path.join(results_path, type+'_pt_gen_manifest.json'), resume)
+        params_hash = hash_params({'generator': 'atalanta_numpy.py', 'input_bits': 8, 'ranges': 'contiguous'})
+
+        try:
+            # Process CSV line by line
+            with open(path, 'r') as csvfile:
+                csvreader = csv.reader(csvfile)
+                headers = next(csvreader)  # Read header row
+
+                for row in csvreader:
+                    try:
+                        # Extract metadata
+                        model_name = row[0]
+                        layer_number = row[1]
+                        row_type = row[2]
+
+                        # Extract numeric values after the first three columns
+                        numeric_values = np.array(row[3:], dtype=np.float32)
+
+                        row_name = f"{model_name}_{layer_number}_{row_type}"
+                        csv_path = os.path.join(results_path, csv_dir, f'pt_{row_name}.csv')
+                        key = RunManifest.key(model_name, layer_number, row_type)
+                        input_hash = hash_values(numeric_values)
+                        entry = manifest.lookup(key, input_hash, params_hash, os.path.exists)
+                        if entry is not None:
+                            # The table on disk is still current: keep its original timing
+                            manifest.skip()
+                            timing_results.append(entry['result'])
+                            continue
+
+                        # Track time to generate the table
+                        start_time = time.time()
+                        final_df = run_atalanta(numeric_values)
+                        end_time = time.time()
+                        time_taken = end_time - start_time
+
+                        # If the output DataFrame is empty, skip this row
+                        if final_df.empty:
+                            print(f"Skipping {model_name}, Layer {layer_number}, Type {row_type} due to empty output.")
+                            continue
+
+                        # Save the generated table to a CSV file
+                        final_df.to_csv(csv_path, index=False)
+
+                        # Append timing information to the results
+                        timing = {'Model': model_name, 'Layer': layer_number, 'Type': row_type, 'Time Taken (s)': time_taken}
+                        timing_results.append(timing)
+                        manifest.record(key, input_hash, params_hash, csv_path, timing)
+                        if manifest.due():
+                            manifest.save()
+
+                    except Exception as e:
+                        print(f"Error processing row {row}: {e}")
+                        continue
+        finally:
+            # Every recorded table is already on disk
+            manifest.save()
+        manifest.report(type)
+
+        # Save timing results to a CSV file
+        timing_df = pd.DataFrame(timing_results)
+        timing_path = os.path.join(results_path, type+'_pt_gen_timing_results.csv')
+        timing_df.to_csv(timing_path, index=False)
+
+        # Clean up temporary file
+        if os.path.exists('temp_input.npy'):
+            os.remove('temp_input.npy')
+
+        # Consolidate the tables of every model into one store per value type; the
+        # encoders open it once and look the layers up by '<model>_<layer>_<type>'
+        store_path = csv_dir + '.pts'
+        build_table_store(csv_dir, store_path)
+
+        print(f"Processing complete. {type} Probability Tables saved in {csv_dir} directory and {store_path}.")
+        print(f"Timing results saved to {timing_path}.")
+
+        # Zip the atalanta_tables directory
+        subprocess.run(['zip', '-r', os.path.join(results_path, csv_dir+'.zip'), os.path.join(results_path, csv_dir)])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the Atalanta probability tables of every extracted layer.")
+    parser.add_argument("--no-resume", dest="resume", action="store_false", help="ignore the run manifest and regenerate every table")
+    parser.add_argument("--project-dir", default=project_dir, help="directory holding the extracted layers and the results")
+    args = parser.parse_args()
+    main(resume=args.resume, project_dir=args.project_dir)
@@ -0,0 +1,85 @@
+import csv
+import time
+from contextlib import nullcontext
+
+# Shared by every disabled timer, so switched-off timing costs one attribute check.
+_NO_TIMING = nullcontext()
+
+
+class _Timing:
+    # Context manager adding the time spent inside it to one stage of a StageTimer
+    __slots__ = ('timer', 'name', 'start')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.timer.add(self.name, time.perf_counter() - self.start)
+
+
+class StageTimer:
+    """
+    Accumulates the wall time of the named stages of a run (CSV parsing, table lookup,
+    coding, output writing, ...).
+
+    A disabled timer records nothing, so drivers can time their stages unconditionally.
+
+    Attributes:
+        enabled (bool): Whether time is recorded.
+        seconds (dict): Stage -> total seconds, in the order the stages first ran.
+        calls (dict): Stage -> number of timed sections.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.seconds = {}
+        self.calls = {}
+
+    def stage(self, name):
+        """
+        Times the enclosed block as part of stage `name`:
+
+            with timer.stage('encode'):
+                ...
+        """
+        if not self.enabled:
+            return _NO_TIMING
+        return _Timing(self, name)
+
+    def add(self, name, seconds, calls=1):
+        # Also used to merge times measured elsewhere (e.g. in worker processes)
+        if not self.enabled:
+            return
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + calls
+
+    def rows(self, label=None):
+        # One summary row per stage, with its share of the total timed time
+        total = sum(self.seconds.values())
+        rows = []
+        for name, seconds in self.seconds.items():
+            row = {'Run': label} if label is not None else {}
+            row.update({
+                'Stage': name,
+                'Calls': self.calls[name],
+                'Time (s)': seconds,
+                'Share (%)': seconds / total * 100 if total else 0.0,
+            })
+            rows.append(row)
+        return rows
+
+
+def write_rows(rows, output_file):
+    # Writes dict rows with the union of their keys as the header (counter rows differ per table size)
+    fieldnames = []
+    for row in rows:
+        fieldnames += [key for key in row if key not in fieldnames]
+    with open(output_file, mode='w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Data has been written to {output_file}")
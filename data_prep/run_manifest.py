@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+# How often long runs persist their progress.
+CHECKPOINT_SECONDS = 30
+
+
+def hash_values(values):
+    """
+    Hashes the contents of a layer (dtype and values).
+
+    Args:
+        values (np.ndarray): The layer values.
+
+    Returns:
+        str: A hex digest.
+    """
+    values = np.ascontiguousarray(values)
+    digest = hashlib.blake2b(values.dtype.str.encode(), digest_size=16)
+    digest.update(values.tobytes())
+    return digest.hexdigest()
+
+def hash_params(params):
+    """
+    Hashes the parameters a layer was processed with (table, mode, options, ...).
+
+    Args:
+        params: Any JSON-serializable object; numpy scalars are converted with str().
+
+    Returns:
+        str: A hex digest.
+    """
+    text = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+class RunManifest:
+    """
+    Records, per layer, the hash of its input values, the hash of the parameters it was
+    processed with, where its output went and its summary, so an interrupted or repeated
+    run only recomputes the layers that changed or are missing.
+
+    Attributes:
+        path (str): Where the manifest is saved (JSON).
+        layers (dict): Layer key -> {'input', 'params', 'output', 'result'}.
+        skipped (int): Layers reused in this run.
+        recomputed (int): Layers processed in this run.
+    """
+
+    def __init__(self, path, resume=True):
+        """
+        Loads the manifest at `path`, or starts an empty one.
+
+        Args:
+            path (str): The manifest file.
+            resume (bool): If False, previous records are ignored and every layer is recomputed.
+        """
+        self.path = path
+        self.layers = {}
+        if resume and os.path.exists(path):
+            with open(path) as file:
+                self.layers = json.load(file)['layers']
+        self.skipped = 0
+        self.recomputed = 0
+        self.last_save = time.monotonic()
+
+    @staticmethod
+    def key(model, layer_name, vtype):
+        return f"{model}/{layer_name}/{vtype}"
+
+    def lookup(self, key, input_hash, params_hash, output_exists=None):
+        """
+        Returns the record of an unchanged layer, or None if it has to be recomputed.
+
+        Args:
+            key (str): The layer key.
+            input_hash (str): `hash_values` of the current input.
+            params_hash (str): `hash_params` of the current parameters.
+            output_exists (callable, optional): Called with the recorded output location;
+                must return True if that output is still there.
+
+        Returns:
+            dict: The record, or None.
+        """
+        entry = self.layers.get(key)
+        if entry is None or entry['input'] != input_hash or entry['params'] != params_hash:
+            return None
+        if output_exists is not None and not output_exists(entry['output']):
+            return None
+        return entry
+
+    def record(self, key, input_hash, params_hash, output, result=None):
+        """
+        Records a freshly processed layer.
+
+        Args:
+            key (str): The layer key.
+            input_hash (str): `hash_values` of the input.
+            params_hash (str): `hash_params` of the parameters.
+            output: Where the output went (JSON-serializable).
+            result: The layer's summary, reused when the layer is skipped (JSON-serializable).
+        """
+        self.layers[key] = {'input': input_hash, 'params': params_hash, 'output': output, 'result': result}
+        self.recomputed += 1
+
+    def skip(self):
+        self.skipped += 1
+
+    def due(self):
+        # True when a long run should persist its progress
+        return time.monotonic() - self.last_save >= CHECKPOINT_SECONDS
+
+    def save(self):
+        """
+        Atomically writes the manifest. Call it only once the outputs it points to are on disk.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump({'layers': self.layers}, file, default=str)
+        os.replace(tmp_path, self.path)
+        self.last_save = time.monotonic()
+
+    def report(self, label):
+        print(f"{label}: {self.skipped} layers unchanged (skipped), {self.recomputed} recomputed")
@@ -0,0 +1,166 @@
+import argparse
+import csv
+import os
+import sys
+import time
+
+import numpy as np
+
+from atalanta_numpy import TABLE_OVERHEAD
+from probability_table_gen import contiguous_ranges, project_dir, search_histogram
+from profiling import write_rows
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'atalanta'))
+from atalanta_encode import AtalantaEncoder
+from table_store import write_table_store
+
+VALUE_RANGE = 256
+SMOOTHING = 0.5  # Pseudo count of every value in a cluster distribution, so the KL divergence to it stays finite
+MAX_ITERATIONS = 20
+DEFAULT_K = (1, 2, 4, 8)
+
+
+def read_layer_groups(values_csv_path):
+    # (model, type) -> [(layer name, values)] of a values CSV, in file order
+    groups = {}
+    with open(values_csv_path, 'r') as csvfile:
+        csvreader = csv.reader(csvfile)
+        next(csvreader)  # Header row
+        for row in csvreader:
+            model_name, layer_number, row_type = row[0], row[1], row[2]
+            values = np.array(row[3:], dtype=np.uint8)
+            groups.setdefault((model_name, row_type), []).append((f"{model_name}_{layer_number}_{row_type}", values))
+    return groups
+
+def code_lengths(histograms, centroids):
+    # Ideal bits of every layer (rows) coded with every cluster distribution (columns): n * (H(p) + KL(p || q))
+    smoothed = centroids + SMOOTHING
+    q = smoothed / smoothed.sum(axis=1, keepdims=True)
+    return histograms @ -np.log2(q).T
+
+def cluster_histograms(histograms, k, max_iterations=MAX_ITERATIONS):
+    """
+    Groups layers into at most `k` clusters sharing one value distribution.
+
+    This is k-means with the KL divergence: a layer joins the cluster whose pooled
+    histogram codes it in the fewest ideal bits, and a cluster's distribution is the
+    pooled histogram of its layers. Seeds are picked farthest-first (by the bits a
+    layer loses to its closest seed), starting from the largest layer, so the result
+    is deterministic.
+
+    Args:
+        histograms (np.ndarray): The value counts of every layer, (layers, VALUE_RANGE).
+        k (int): The most clusters to form.
+        max_iterations (int): Assignment rounds before giving up on convergence.
+
+    Returns:
+        np.ndarray: The cluster of every layer, numbered 0 to the number of clusters - 1.
+    """
+    histograms = np.asarray(histograms, dtype=np.float64)
+    own_bits = np.diag(code_lengths(histograms, histograms))
+    seeds = [int(np.argmax(histograms.sum(axis=1)))]
+    while len(seeds) < min(k, len(histograms)):
+        excess = code_lengths(histograms, histograms[seeds]).min(axis=1) - own_bits
+        if excess.max() <= 0:
+            break  # The remaining layers are coded as well by a seed as by themselves
+        seeds.append(int(np.argmax(excess)))
+
+    assignment = np.argmin(code_lengths(histograms, histograms[seeds]), axis=1)
+    for _ in range(max_iterations):
+        centroids = np.array([histograms[assignment == c].sum(axis=0) for c in range(len(seeds))])
+        new_assignment = np.argmin(code_lengths(histograms, centroids), axis=1)
+        if np.array_equal(new_assignment, assignment):
+            break
+        assignment = new_assignment
+    return np.unique(assignment, return_inverse=True)[1]
+
+def cluster_tables(histograms, assignment):
+    # One searched table per cluster, from its pooled histogram, with decodable ranges
+    tables = []
+    for c in range(int(assignment.max()) + 1):
+        pooled = histograms[assignment == c].sum(axis=0)
+        tables.append(contiguous_ranges(search_histogram(pooled), histogram=pooled))
+    return tables
+
+def encoded_bits(layers, assignment, tables):
+    # Symbol and offset bits of every layer coded with the table of its cluster
+    bits = []
+    for (_, values), c in zip(layers, assignment):
+        symbol_bits, _, offset_bits = AtalantaEncoder(tables[c]).count(values)
+        bits.append(symbol_bits + offset_bits)
+    return bits
+
+def share_tables(layers, k, max_iterations=MAX_ITERATIONS):
+    """
+    Clusters the layers of one model and value type into at most `k` shared tables.
+
+    Args:
+        layers (list): (layer name, values) of every layer.
+        k (int): The most tables to share, or None for one table per layer (the
+            probability_table_gen.py baseline).
+        max_iterations (int): Assignment rounds of the clustering.
+
+    Returns:
+        dict: 'assignment' (cluster of every layer), 'tables', 'bits' (encoded bits of
+            every layer), and the 'cluster_seconds' and 'search_seconds' spent.
+    """
+    histograms = np.array([np.bincount(values, minlength=VALUE_RANGE) for _, values in layers])
+    start = time.perf_counter()
+    assignment = np.arange(len(layers)) if k is None else cluster_histograms(histograms, k, max_iterations)
+    cluster_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    tables = cluster_tables(histograms, assignment)
+    search_seconds = time.perf_counter() - start
+    return {'assignment': assignment, 'tables': tables, 'bits': encoded_bits(layers, assignment, tables),
+            'cluster_seconds': cluster_seconds, 'search_seconds': search_seconds}
+
+def tradeoff_row(model_name, row_type, layers, k, result, baseline):
+    # Total bits (streams plus TABLE_OVERHEAD per table) and search time of one K, relative to one table per layer
+    n_tables = len(result['tables'])
+    total_bits = sum(result['bits']) + n_tables * TABLE_OVERHEAD
+    baseline_bits = sum(baseline['bits']) + len(baseline['tables']) * TABLE_OVERHEAD
+    return {
+        'Model': model_name, 'Type': row_type, 'Layers': len(layers), 'K': k if k is not None else 'per_layer',
+        'Tables': n_tables, 'Encoded_Bits': sum(result['bits']), 'Table_Bits': n_tables * TABLE_OVERHEAD,
+        'Total_Bits': total_bits, 'Bits_vs_Per_Layer': total_bits / baseline_bits if baseline_bits else 0,
+        'Cluster_Time (s)': result['cluster_seconds'], 'Search_Time (s)': result['search_seconds'],
+        'Search_Time_Reduction': baseline['search_seconds'] / result['search_seconds'] if result['search_seconds'] else 0,
+    }
+
+def main(project_dir=project_dir, ks=DEFAULT_K, max_iterations=MAX_ITERATIONS):
+    results_path = os.path.join(project_dir, 'probability_table_gen_results')
+    os.makedirs(results_path, exist_ok=True)
+    values_dict = {'activations': os.path.join(project_dir, 'activations_all_layers.csv'), 'weights': os.path.join(project_dir, 'weights_all_layers.csv')}
+
+    rows = []
+    assignments = []
+    for type, path in values_dict.items():
+        # Layer name -> its cluster's table, one store per K in place of the per-layer store
+        stores = {k: {} for k in ks}
+        for (model_name, row_type), layers in read_layer_groups(path).items():
+            baseline = share_tables(layers, None)
+            rows.append(tradeoff_row(model_name, row_type, layers, None, baseline, baseline))
+            for k in ks:
+                result = share_tables(layers, k, max_iterations)
+                rows.append(tradeoff_row(model_name, row_type, layers, k, result, baseline))
+                for (layer_name, _), c in zip(layers, result['assignment']):
+                    stores[k][layer_name] = result['tables'][c]
+                    assignments.append({'Layer': layer_name, 'K': k, 'Cluster': int(c)})
+        for k, tables in stores.items():
+            write_table_store(os.path.join(results_path, f'{type}_shared_tables_k{k}.pts'), tables)
+
+    if not rows:
+        print("No layers to cluster.")
+        return
+    from tabulate import tabulate
+    print(tabulate([list(row.values()) for row in rows], headers=rows[0].keys(), tablefmt="grid", floatfmt=".4f"))
+    write_rows(rows, os.path.join(results_path, 'shared_tables_tradeoff.csv'))
+    write_rows(assignments, os.path.join(results_path, 'shared_tables_assignment.csv'))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Share K probability tables between the layers of a model by clustering their histograms.")
+    parser.add_argument("--project-dir", default=project_dir, help="directory holding the extracted layers and the results")
+    parser.add_argument("--k", type=int, nargs='+', default=list(DEFAULT_K), help="numbers of shared tables to compare")
+    parser.add_argument("--max-iterations", type=int, default=MAX_ITERATIONS)
+    args = parser.parse_args()
+    main(project_dir=args.project_dir, ks=args.k, max_iterations=args.max_iterations)
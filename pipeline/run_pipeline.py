@@ -0,0 +1,322 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(REPO_ROOT, 'data_prep'))
+from run_manifest import hash_params
+
+PROJECT_DIR = '/content/drive/MyDrive/CSCE_614/Project'
+HASH_CHUNK = 1 << 20
+
+
+class Stage:
+    """
+    One step of the pipeline: a script run with arguments, the files it reads and the
+    files it writes. Dependencies between stages follow from their inputs and outputs.
+
+    Attributes:
+        name (str): The stage name.
+        script (str): The script, relative to the repository root. It runs from its own
+            directory, like the scripts are run by hand.
+        args (list): Command-line arguments of the script.
+        inputs (list): Files or directories the stage reads.
+        outputs (list): Files the stage writes; they are cached by content hash.
+        code (list): Repository directories whose Python files the stage runs.
+    """
+
+    def __init__(self, name, script, args, inputs, outputs, code=None):
+        self.name = name
+        self.script = script
+        self.args = [str(a) for a in args]
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.code = list(code) if code is not None else [os.path.dirname(script)]
+
+def build_stages(project_dir, images_dir=None, workers=1):
+    """
+    Declares the stages of the full project run under `project_dir`.
+
+    Args:
+        project_dir (str): Where the extracted layers, tables and results live.
+        images_dir (str, optional): The sample images of the activation extraction
+            (default: <project_dir>/sample_activation_data).
+        workers (int): Worker processes of the Atalanta encoding.
+
+    Returns:
+        list: The stages, in a valid run order.
+    """
+    def path(*parts):
+        return os.path.join(project_dir, *parts)
+
+    images_dir = images_dir or path('sample_activation_data')
+    layers = [path('weights_all_layers.csv'), path('activations_all_layers.csv')]
+    tables = [path('probability_table_gen_results', f'{t}_probability_tables.pts') for t in ('weights', 'activations')]
+    atalanta_summaries = [path('atalanta_outputs', f'atalanta_encoded_summary_{t}.csv') for t in ('weights', 'activations')]
+    atalanta_archives = [path('atalanta_outputs', f'atalanta_encoded_output_{t}.atl') for t in ('weights', 'activations')]
+    shapeshifter_summaries = [path('shapeshifter_outputs', f'shapeshifter_encoded_summary_{t}.csv') for t in ('weights', 'activations')]
+    shapeshifter_outputs = [path('shapeshifter_outputs', f'shapeshifter_encoded_output_{t}.csv') for t in ('weights', 'activations')]
+    traffic = path('comparison_reports', 'traffic_model.csv')
+
+    return [
+        Stage('extract_weights', 'data_prep/extract_weights.py',
+              ['--output', layers[0], '--store-dir', path('weight_snapshots')], [], [layers[0]]),
+        Stage('extract_activations', 'data_prep/extract_activations.py',
+              ['--images', images_dir, '--output', layers[1]], [images_dir], [layers[1]]),
+        Stage('probability_tables', 'data_prep/probability_table_gen.py',
+              ['--project-dir', project_dir], layers, tables, code=['data_prep', 'atalanta']),
+        Stage('atalanta', 'atalanta/run_atalanta.py',
+              ['--project-dir', project_dir, '--workers', workers], layers + tables,
+              atalanta_summaries + atalanta_archives, code=['atalanta', 'comparison', 'data_prep']),
+        Stage('shapeshifter', 'shapeshifter/shapeshifter_encode.py',
+              ['--project-dir', project_dir], layers,
+              shapeshifter_summaries + shapeshifter_outputs, code=['shapeshifter', 'atalanta', 'comparison', 'data_prep']),
+        Stage('comparison', 'comparison/traffic_model.py',
+              ['--atalanta', *atalanta_summaries, '--shapeshifter', *shapeshifter_summaries, '--output', traffic],
+              atalanta_summaries + shapeshifter_summaries, [traffic, traffic.replace('.csv', '_totals.csv')],
+              code=['comparison', 'data_prep']),
+    ]
+
+def stage_dependencies(stages):
+    # Stage name -> names of the stages that write one of its inputs
+    producers = {output: stage.name for stage in stages for output in stage.outputs}
+    return {stage.name: sorted({producers[i] for i in stage.inputs if i in producers}) for stage in stages}
+
+
+class ArtifactCache:
+    """
+    Content-addressed store of stage outputs.
+
+    A stage's key hashes its code, arguments and the contents of its inputs. When a key
+    was seen before, the outputs it produced are restored from the store instead of
+    running the stage. File hashes are remembered by (size, mtime) so unchanged files
+    are not read again.
+
+    Attributes:
+        root (str): The cache directory (objects/, logs/ and index.json).
+        files (dict): Path -> [size, mtime_ns, hash].
+        stages (dict): Stage key -> {output path: hash}.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.index_path = os.path.join(root, 'index.json')
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        os.makedirs(os.path.join(root, 'logs'), exist_ok=True)
+        self.files = {}
+        self.stages = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as file:
+                index = json.load(file)
+            self.files, self.stages = index['files'], index['stages']
+
+    def file_hash(self, path):
+        stat = os.stat(path)
+        known = self.files.get(path)
+        if known is not None and known[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return known[2]
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(HASH_CHUNK), b''):
+                digest.update(chunk)
+        self.files[path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def path_hash(self, path):
+        # Hash of a file, or of every file under a directory
+        if not os.path.isdir(path):
+            return self.file_hash(path)
+        entries = []
+        for directory, _, filenames in sorted(os.walk(path)):
+            for filename in sorted(filenames):
+                full = os.path.join(directory, filename)
+                entries.append([os.path.relpath(full, path), self.file_hash(full)])
+        return hash_params(entries)
+
+    def stage_key(self, stage):
+        code = {}
+        for code_dir in stage.code:
+            directory = os.path.join(REPO_ROOT, code_dir)
+            for filename in sorted(os.listdir(directory)):
+                if filename.endswith('.py'):
+                    code[f'{code_dir}/{filename}'] = self.file_hash(os.path.join(directory, filename))
+        inputs = {path: self.path_hash(path) for path in stage.inputs}
+        return hash_params({'script': stage.script, 'args': stage.args, 'code': code, 'inputs': inputs})
+
+    def object_path(self, digest):
+        return os.path.join(self.root, 'objects', digest)
+
+    def restore(self, key):
+        """
+        Puts back the outputs recorded under `key`. Returns False if the key is unknown
+        or one of its objects is missing.
+        """
+        outputs = self.stages.get(key)
+        if outputs is None or not all(os.path.exists(self.object_path(d)) for d in outputs.values()):
+            return False
+        for path, digest in outputs.items():
+            if os.path.exists(path) and self.file_hash(path) == digest:
+                continue
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            shutil.copyfile(self.object_path(digest), path)
+            self.file_hash(path)
+        return True
+
+    def store(self, key, stage):
+        """
+        Copies the outputs of a finished stage into the store under `key`.
+
+        Raises:
+            FileNotFoundError: If the stage did not write one of its declared outputs.
+        """
+        outputs = {}
+        for path in stage.outputs:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Stage {stage.name} did not write its output {path}.")
+            digest = self.file_hash(path)
+            if not os.path.exists(self.object_path(digest)):
+                shutil.copyfile(path, self.object_path(digest) + '.tmp')
+                os.replace(self.object_path(digest) + '.tmp', self.object_path(digest))
+            outputs[path] = digest
+        self.stages[key] = outputs
+
+    def save(self):
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump({'files': self.files, 'stages': self.stages}, file)
+        os.replace(tmp_path, self.index_path)
+
+
+def select_stages(stages, targets=None, skip=()):
+    # The targets and everything they need, minus the skipped stages, in run order
+    dependencies = stage_dependencies(stages)
+    needed = set()
+    todo = list(targets or [stage.name for stage in stages])
+    while todo:
+        name = todo.pop()
+        if name not in needed and name not in skip:
+            needed.add(name)
+            todo += dependencies[name]
+    return [stage for stage in stages if stage.name in needed]
+
+def run_pipeline(stages, cache, jobs=2, force=(), dry_run=False):
+    """
+    Runs the stages, as many at a time as `jobs` allows, each as soon as the stages it
+    depends on have finished. Stages whose key is in the cache are restored instead.
+
+    Args:
+        stages (list): The stages to run (see `select_stages`).
+        cache (ArtifactCache): The artifact cache.
+        jobs (int): How many stages may run concurrently.
+        force (iterable): Names of stages to run even if they are cached.
+        dry_run (bool): Only report which stages are cached; nothing is run.
+
+    Returns:
+        dict: Stage name -> 'cached', 'ran', 'failed' or 'blocked'.
+    """
+    dependencies = stage_dependencies(stages)
+    names = {stage.name for stage in stages}
+    status = {}
+    running = {}
+    pending = list(stages)
+    while pending or running:
+        for stage in list(pending):
+            deps = [d for d in dependencies[stage.name] if d in names]
+            if any(status.get(d) in ('failed', 'blocked') for d in deps):
+                status[stage.name] = 'blocked'
+                pending.remove(stage)
+                print(f"[{stage.name}] blocked by a failed dependency")
+                continue
+            if len(running) >= jobs or not all(status.get(d) in ('cached', 'ran') for d in deps):
+                continue
+            pending.remove(stage)
+            missing = [path for path in stage.inputs if not os.path.exists(path)]
+            if missing:
+                status[stage.name] = 'failed'
+                print(f"[{stage.name}] missing inputs: {', '.join(missing)}")
+                continue
+
+            key = cache.stage_key(stage)
+            if stage.name not in force and cache.restore(key):
+                status[stage.name] = 'cached'
+                print(f"[{stage.name}] cached")
+                continue
+            if dry_run:
+                # Pretend it ran so the stages after it are reported too
+                status[stage.name] = 'ran'
+                print(f"[{stage.name}] would run")
+                continue
+
+            log_path = os.path.join(cache.root, 'logs', f'{stage.name}.log')
+            log = open(log_path, 'w')
+            script = os.path.join(REPO_ROOT, stage.script)
+            process = subprocess.Popen([sys.executable, script, *stage.args], cwd=os.path.dirname(script),
+                                       stdout=log, stderr=subprocess.STDOUT)
+            running[stage.name] = (stage, key, process, log, time.perf_counter())
+            print(f"[{stage.name}] started (log: {log_path})")
+
+        for name, (stage, key, process, log, start) in list(running.items()):
+            if process.poll() is None:
+                continue
+            log.close()
+            del running[name]
+            elapsed = time.perf_counter() - start
+            if process.returncode != 0:
+                status[name] = 'failed'
+                print(f"[{name}] failed with exit code {process.returncode} after {elapsed:.1f}s")
+                continue
+            try:
+                cache.store(key, stage)
+            except FileNotFoundError as e:
+                status[name] = 'failed'
+                print(f"[{name}] {e}")
+                continue
+            cache.save()
+            status[name] = 'ran'
+            print(f"[{name}] finished in {elapsed:.1f}s")
+        if running:
+            time.sleep(0.2)
+    cache.save()
+    return status
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the project as a cached DAG of stages.")
+    parser.add_argument('--project-dir', default=PROJECT_DIR)
+    parser.add_argument('--images', default=None, help="sample images for the activation extraction")
+    parser.add_argument('--stages', nargs='+', default=None, help="target stages (default: all); their dependencies run too")
+    parser.add_argument('--skip', nargs='+', default=[], help="stages whose outputs are used as they are on disk")
+    parser.add_argument('--force', nargs='+', default=[], help="stages to rerun even if cached")
+    parser.add_argument('--jobs', type=int, default=2, help="stages run concurrently")
+    parser.add_argument('--workers', type=int, default=1, help="worker processes of the Atalanta encoding")
+    parser.add_argument('--cache-dir', default=None, help="default: <project-dir>/.pipeline_cache")
+    parser.add_argument('--dry-run', action='store_true', help="only report which stages are cached")
+    parser.add_argument('--list', action='store_true', help="list the stages with their inputs and outputs")
+    args = parser.parse_args(argv)
+
+    stages = build_stages(args.project_dir, args.images, args.workers)
+    names = [stage.name for stage in stages]
+    for name in (args.stages or []) + args.skip + args.force:
+        if name not in names:
+            parser.error(f"unknown stage {name}, expected one of {names}")
+    if args.list:
+        dependencies = stage_dependencies(stages)
+        for stage in stages:
+            print(f"{stage.name}: {stage.script} (after: {', '.join(dependencies[stage.name]) or '-'})")
+            for path in stage.inputs:
+                print(f"    in:  {path}")
+            for path in stage.outputs:
+                print(f"    out: {path}")
+        return 0
+
+    cache = ArtifactCache(args.cache_dir or os.path.join(args.project_dir, '.pipeline_cache'))
+    status = run_pipeline(select_stages(stages, args.stages, set(args.skip)), cache, args.jobs, set(args.force), args.dry_run)
+    print(', '.join(f"{name}: {result}" for name, result in status.items()))
+    return 0 if all(result in ('cached', 'ran') for result in status.values()) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import numpy as np
+
+from shapeshifter_decode import shapeshifter_unpack
+from shapeshifter_encode import shapeshifter_pack
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(REPO_ROOT, 'atalanta'))
+from codec import Codec, EncodedTensor, register_codec
+
+
+@register_codec
+class ShapeShifterCodec(Codec):
+    """
+    ShapeShifter as an array codec: the stream of `shapeshifter_pack`, with the group
+    size and variant in the tensor meta.
+
+    Attributes:
+        group_size (int): Values per group.
+        variant (str): One of shapeshifter_encode.VARIANTS.
+    """
+    __slots__ = ('group_size', 'variant')
+    name = 'shapeshifter'
+
+    def __init__(self, group_size=16, variant='baseline'):
+        self.group_size = group_size
+        self.variant = variant
+
+    def encode_array(self, values):
+        values = np.asarray(values)
+        payload, bits = shapeshifter_pack(values.ravel(), self.group_size, self.variant)
+        return EncodedTensor(self.name, values.shape, values.dtype, payload, bits,
+                             {'group_size': self.group_size, 'variant': self.variant})
+
+    def decode(self, tensor):
+        values = shapeshifter_unpack(tensor.payload, tensor.n_values, tensor.meta['group_size'],
+                                     np.dtype(tensor.dtype), tensor.meta['variant'])
+        return values.reshape(tensor.shape)
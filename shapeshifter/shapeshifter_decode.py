@@ -0,0 +1,99 @@
+import os
+import sys
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(REPO_ROOT, 'atalanta'))
+from bitpack import CHUNK, unpack_varwidth
+
+
+def unpack_groups(bits, widths, group_lengths, group_size):
+    # Values of every group at the group width, one vectorized step per width class
+    n_values = int(group_lengths.sum())
+    n_groups = widths.size
+    n_full = n_values // group_size
+    starts = np.concatenate(([0], np.cumsum(widths * group_lengths)))
+
+    values = np.zeros(n_groups * group_size, dtype=np.uint64)
+    full = values[:n_full * group_size].reshape(n_full, group_size)
+    for width in np.unique(widths[:n_full]).tolist():
+        if width == 0:
+            continue
+        shifts = np.arange(width - 1, -1, -1, dtype=np.uint64)
+        columns = np.arange(group_size * width)
+        groups = np.flatnonzero(widths[:n_full] == width)
+        step = max(CHUNK // (group_size * width), 1)
+        for start in range(0, groups.size, step):
+            g = groups[start:start + step]
+            group_bits = bits[starts[g, None] + columns].reshape(g.size, group_size, width)
+            full[g] = (group_bits.astype(np.uint64) << shifts).sum(axis=2)
+
+    if n_full < n_groups and widths[-1]:
+        # The last, shorter group (all zero at width 0)
+        tail = n_values - n_full * group_size
+        values[n_full * group_size:n_values] = unpack_varwidth(bits, np.full(tail, widths[-1]), int(starts[n_full]))
+    return values[:n_values]
+
+def read_bits(data, n_bits):
+    # The first n_bits of a byte section, and the bytes after it
+    n_bytes = -(-n_bits // 8)
+    if data.size < n_bytes:
+        raise ValueError("ShapeShifter stream is shorter than its width fields require.")
+    return np.unpackbits(data[:n_bytes], count=n_bits), data[n_bytes:]
+
+def shapeshifter_unpack(packed, n_values, group_size=16, dtype=np.uint8, variant='baseline'):
+    """
+    Decodes a stream written by `shapeshifter_encode.shapeshifter_pack`.
+
+    The width fields give the start of every group up front, so groups of the same
+    width are decoded together, one vectorized step per width class.
+
+    Args:
+        packed (bytes): The packed stream.
+        n_values (int): How many values the layer has.
+        group_size (int): Values per group, as used when packing.
+        dtype: The dtype of the returned values.
+        variant (str): The variant the stream was packed with.
+
+    Returns:
+        np.ndarray: The layer values.
+
+    Raises:
+        ValueError: If the stream is shorter than its width fields require, or the
+            variant is unknown.
+    """
+    n_groups = -(-n_values // group_size)
+    data = np.frombuffer(packed, dtype=np.uint8)
+    group_lengths = np.full(n_groups, group_size, dtype=np.int64)
+    if n_groups:
+        group_lengths[-1] = n_values - (n_groups - 1) * group_size
+
+    if variant == 'zero_group':
+        flags, data = read_bits(data, n_groups)
+        flags = flags.astype(bool)
+        n_widths = int(flags.sum())
+    elif variant in ('baseline', 'zero_bitmap'):
+        n_widths = n_groups
+    else:
+        raise ValueError(f"Unknown ShapeShifter variant {variant}.")
+    if data.size < n_widths:
+        raise ValueError("ShapeShifter stream is shorter than its width fields.")
+    widths = np.zeros(n_groups, dtype=np.int64)
+    if variant == 'zero_group':
+        widths[flags] = data[:n_widths]
+    else:
+        widths[:] = data[:n_widths]
+    data = data[n_widths:]
+
+    if variant == 'zero_bitmap':
+        nonzero, data = read_bits(data, n_values)
+        nonzero = nonzero.astype(bool)
+        value_widths = np.repeat(widths, group_lengths)[nonzero]
+        bits, _ = read_bits(data, int(value_widths.sum()))
+        values = np.zeros(n_values, dtype=np.uint64)
+        values[nonzero] = unpack_varwidth(bits, value_widths)
+        return values.astype(dtype)
+
+    bits, _ = read_bits(data, int(np.dot(widths, group_lengths)))
+    return unpack_groups(bits, widths, group_lengths, group_size).astype(dtype)
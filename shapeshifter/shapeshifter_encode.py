@@ -1,85 +1,496 @@
 import numpy as np
-import pandas as pd
 import os
-import dask.dataframe as dd
+import sys
+import argparse
 import csv
-from tabulate import tabulate
-import numpy as np
-import random
-import time
-
-
-def main():
-
-    def filename_to_key(filename):
-        # Remove the prefix and suffix
-        base_name = filename.removeprefix("pt_").removesuffix(".csv")
-        # Split the remaining part into components
-        #parts = base_name.split("_")
-        return base_name
-
-    def csv_to_dict(csv_path):
-        # Load the CSV into a DataFrame
-        df = pd.read_csv(csv_path)
-        # Convert the DataFrame to a list of dictionaries
-        data_dict = df.to_dict(orient='records')
-        return data_dict
-
-    def add_row_to_csv(row, output_file):
-        # Append the row to the file
-        with open(output_file, mode='a', newline='') as file:
-            writer = csv.DictWriter(file, fieldnames=['Model_Name', 'Layer', 'Type', 'Encoded_Stream'])
+from functools import partial
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_DIR = '/content/drive/MyDrive/CSCE_614/Project'
+sys.path.append(os.path.join(REPO_ROOT, 'comparison'))
+from sampled_estimate import estimate_compressed_bits, estimate_summary, print_model_estimates
+sys.path.append(os.path.join(REPO_ROOT, 'data_prep'))
+from run_manifest import RunManifest, hash_params, hash_values
+from profiling import StageTimer, write_rows
+from async_pipeline import QUEUE_DEPTH, print_stage_utilization, run_pipeline
+sys.path.append(os.path.join(REPO_ROOT, 'atalanta'))
+from bitpack import CHUNK, varwidth_bits
+
+
+def filename_to_key(filename):
+    # Remove the prefix and suffix
+    base_name = filename.removeprefix("pt_").removesuffix(".csv")
+    # Split the remaining part into components
+    #parts = base_name.split("_")
+    return base_name
+
+def csv_to_dict(csv_path):
+    import pandas as pd
+
+    # Load the CSV into a DataFrame
+    df = pd.read_csv(csv_path)
+    # Convert the DataFrame to a list of dictionaries
+    data_dict = df.to_dict(orient='records')
+    return data_dict
+
+def add_row_to_csv(row, output_file):
+    # Append the row to the file; returns where it went as (byte offset, byte length)
+    with open(output_file, mode='a', newline='') as file:
+        start = file.tell()
+        writer = csv.DictWriter(file, fieldnames=['Model_Name', 'Layer', 'Type', 'Encoded_Stream'])
+        writer.writerow(row)
+        return start, file.tell() - start
+
+def start_encoded_output(output_file, resume):
+    # Writes the header row, unless a resumed run keeps appending to an existing file
+    if resume and os.path.exists(output_file):
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    with open(output_file, mode='w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=['Model_Name', 'Layer', 'Type', 'Encoded_Stream'])
+        writer.writeheader()
+
+def output_row_exists(output):
+    # True if the encoded row a manifest entry points to is still in its file
+    return (output is not None and os.path.exists(output['path'])
+            and os.path.getsize(output['path']) >= output['offset'] + output['length'])
+
+def compact_encoded_output(output_file, manifest, keys):
+    """
+    Drops the rows of replaced layers from an encoded output CSV that resumed runs
+    appended to, keeping the rows of `keys` in that order and updating their manifest
+    entries.
+
+    Args:
+        output_file (str): The encoded output CSV.
+        manifest (RunManifest): The manifest pointing at the rows.
+        keys (list): Manifest keys of the layers to keep, in order.
+    """
+    with open(output_file, 'rb') as file:
+        header = file.readline()
+    outputs = [manifest.layers[key]['output'] for key in keys]
+    position = len(header)
+    in_place = True
+    for output in outputs:
+        in_place = in_place and output['offset'] == position
+        position += output['length']
+    if in_place and position == os.path.getsize(output_file):
+        return
+
+    tmp_path = output_file + '.tmp'
+    with open(output_file, 'rb') as old, open(tmp_path, 'wb') as new:
+        new.write(header)
+        for output in outputs:
+            old.seek(output['offset'])
+            offset = new.tell()
+            new.write(old.read(output['length']))
+            output['offset'] = offset
+    os.replace(tmp_path, output_file)
+
+def print_encoded_summary_table(summary_table):
+    from tabulate import tabulate
+
+    # Convert rows to tabulate format
+    table = [list(row.values()) for row in summary_table]
+    headers = summary_table[0].keys()  # Use keys of the first row as headers
+
+    # Pretty-print the table
+    print(tabulate(table, headers=headers, tablefmt="grid"))
+
+def print_stage_timings(timer):
+    # Where the time of a run went, per stage
+    from tabulate import tabulate
+    print(tabulate([list(row.values()) for row in timer.rows()], headers=['Stage', 'Calls', 'Time (s)', 'Share (%)'],
+                   tablefmt="grid", floatfmt=".3f"))
+
+def output_summary_to_csv(csv_table, output_file):
+
+    # Write to the CSV file
+    with open(output_file, mode='w', newline='') as file:
+        # Create a CSV DictWriter object
+        writer = csv.DictWriter(file, fieldnames=csv_table[0].keys())
+
+        # Write the header row
+        writer.writeheader()
+
+        # Write each row
+        for row in csv_table:
             writer.writerow(row)
 
-    def print_encoded_summary_table(summary_table):
-
-        # Convert rows to tabulate format
-        table = [list(row.values()) for row in summary_table]
-        headers = summary_table[0].keys()  # Use keys of the first row as headers
-
-        # Pretty-print the table
-        print(tabulate(table, headers=headers, tablefmt="grid"))
-
-    def output_summary_to_csv(csv_table, output_file):
-
-        # Write to the CSV file
-        with open(output_file, mode='w', newline='') as file:
-            # Create a CSV DictWriter object
-            writer = csv.DictWriter(file, fieldnames=csv_table[0].keys())
-
-            # Write the header row
-            writer.writeheader()
-
-            # Write each row
-            for row in csv_table:
-                writer.writerow(row)
-
-        print(f"Data has been written to {output_file}")
-
-    # ShapeShifter encoding function
-    def shapeshifter_encode(data, group_size=16):
-        encoded_data = []
-        encoded_size = 0 
-        for i in range(0, len(data), group_size):
-            group = data[i:i+group_size]
-            max_val = np.max(np.abs(group))
-            bits_needed = int(np.ceil(np.log2(max_val + 1))) if max_val > 0 else 0
-            encoded_data.append((bits_needed, group.tolist()))
-            encoded_size += bits_needed * len(group)
-        return encoded_data, encoded_size
-
-
+    print(f"Data has been written to {output_file}")
+
+# Bits of the width field stored in front of every group
+WIDTH_BITS = 8
+
+# 'baseline': width field and every value at the group width.
+# 'zero_group': a 1-bit all-zero flag per group; only non-zero groups have a width field and values.
+# 'zero_bitmap': width field, a 1-bit zero flag per value, and only the non-zero values at the group width.
+VARIANTS = ('baseline', 'zero_group', 'zero_bitmap')
+
+# Bit length of every byte value; wider magnitudes are looked up one byte at a time
+BIT_LENGTH = np.array([v.bit_length() for v in range(256)], dtype=np.uint8)
+
+def bit_lengths(values):
+    # Vectorized int.bit_length() of non-negative int64 values
+    lengths = BIT_LENGTH[values & 0xFF]
+    top = int(values.max()) if values.size else 0
+    shift = 8
+    while top >> shift:
+        high = values >> shift
+        wide = high > 0
+        lengths[wide] = shift + BIT_LENGTH[high[wide] & 0xFF]
+        shift += 8
+    return lengths
+
+def variant_size(widths, group_lengths, nonzeros, variant='baseline'):
+    """
+    Computes the encoded size of a layer from its per-group statistics.
+
+    Args:
+        widths (np.ndarray): The bit width of every group.
+        group_lengths (np.ndarray): The number of values of every group.
+        nonzeros (np.ndarray): The number of non-zero values of every group (only used
+            by 'zero_bitmap').
+        variant (str): One of VARIANTS.
+
+    Returns:
+        int: The size in bits.
+
+    Raises:
+        ValueError: If the variant is unknown.
+    """
+    widths = widths.astype(np.int64)
+    n_groups = widths.size
+    if variant == 'baseline':
+        return n_groups * WIDTH_BITS + int(np.dot(widths, group_lengths))
+    if variant == 'zero_group':
+        return n_groups + int(np.count_nonzero(widths)) * WIDTH_BITS + int(np.dot(widths, group_lengths))
+    if variant == 'zero_bitmap':
+        return n_groups * WIDTH_BITS + int(group_lengths.sum()) + int(np.dot(widths, nonzeros))
+    raise ValueError(f"Unknown ShapeShifter variant {variant}, expected one of {VARIANTS}.")
+
+def group_widths(data, group_size=16, variant='baseline'):
+    """
+    Computes the ShapeShifter bit width of every group of a layer.
+
+    The layer is zero padded to whole groups and viewed as (n_groups, group_size), so
+    all widths come from one max reduction and a bit length lookup.
+
+    Args:
+        data (np.ndarray): The layer values.
+        group_size (int): Values per group.
+        variant (str): The variant `encoded_size` is computed for, one of VARIANTS.
+
+    Returns:
+        tuple: (widths, group_lengths, encoded_size) - the uint8 width and the number of
+            values of every group, and the total size in bits (width fields and values).
+    """
+    data = np.asarray(data).astype(np.int64).ravel()
+    n_groups = -(-data.size // group_size)
+    groups = np.zeros(n_groups * group_size, dtype=np.int64)
+    groups[:data.size] = np.abs(data)
+    groups = groups.reshape(n_groups, group_size)
+    widths = bit_lengths(groups.max(axis=1))
+
+    group_lengths = np.full(n_groups, group_size, dtype=np.int64)
+    if n_groups:
+        group_lengths[-1] = data.size - (n_groups - 1) * group_size
+    nonzeros = np.count_nonzero(groups, axis=1) if variant == 'zero_bitmap' else None
+    encoded_size = variant_size(widths, group_lengths, nonzeros, variant)
+    return widths, group_lengths, encoded_size
+
+def pack_groups(values, widths, group_lengths, group_size):
+    # Bits of every group's values at the group width, one vectorized step per width class
+    n_full = values.size // group_size
+    starts = np.concatenate(([0], np.cumsum(widths.astype(np.int64) * group_lengths)))
+    bits = np.zeros(int(starts[-1]), dtype=np.uint8)
+
+    full = values[:n_full * group_size].reshape(n_full, group_size)
+    for width in np.unique(widths[:n_full]).tolist():
+        if width == 0:
+            continue
+        shifts = np.arange(width - 1, -1, -1, dtype=np.uint64)
+        columns = np.arange(group_size * width)
+        groups = np.flatnonzero(widths[:n_full] == width)
+        step = max(CHUNK // (group_size * width), 1)
+        for start in range(0, groups.size, step):
+            g = groups[start:start + step]
+            group_bits = ((full[g, :, None] >> shifts) & 1).astype(np.uint8)
+            bits[starts[g, None] + columns] = group_bits.reshape(g.size, -1)
+
+    if n_full < widths.size:
+        # The last, shorter group
+        tail = values[n_full * group_size:]
+        bits[starts[n_full]:] = varwidth_bits(tail, np.full(tail.size, widths[-1]))
+    return bits
+
+def shapeshifter_pack(data, group_size=16, variant='baseline'):
+    """
+    Packs a layer into a ShapeShifter stream.
+
+    Every group has a WIDTH_BITS width field and stores its values on that many bits,
+    MSB first. The per-group and per-value fields of all groups come first, followed
+    by the values of every group back to back:
+
+    - 'baseline': width bytes | values
+    - 'zero_group': all-zero group flags | width bytes of the non-zero groups | values
+    - 'zero_bitmap': width bytes | zero-value bitmap | non-zero values
+
+    Groups of the same width are packed together, one vectorized step per width class.
+    `shapeshifter_decode.shapeshifter_unpack` reads the stream back.
+
+    Args:
+        data (np.ndarray): The layer values (non-negative integers).
+        group_size (int): Values per group.
+        variant (str): One of VARIANTS.
+
+    Returns:
+        tuple: (packed, encoded_size) - the stream as bytes and its size in bits
+            without the padding of the sections to whole bytes.
+
+    Raises:
+        ValueError: If the layer has negative values or the variant is unknown.
+    """
+    data = np.asarray(data).ravel()
+    if data.size and data.min() < 0:
+        raise ValueError("ShapeShifter packing needs non-negative values.")
+    widths, group_lengths, encoded_size = group_widths(data, group_size, variant)
+    values = data.astype(np.uint64)
+
+    if variant == 'baseline':
+        return widths.tobytes() + np.packbits(pack_groups(values, widths, group_lengths, group_size)).tobytes(), encoded_size
+    if variant == 'zero_group':
+        # All-zero groups have width 0, so their values take no bits either
+        flags = np.packbits(widths > 0).tobytes()
+        payload = np.packbits(pack_groups(values, widths, group_lengths, group_size)).tobytes()
+        return flags + widths[widths > 0].tobytes() + payload, encoded_size
+    # 'zero_bitmap' (group_widths has rejected unknown variants)
+    nonzero = values != 0
+    value_widths = np.repeat(widths, group_lengths)
+    payload = np.packbits(varwidth_bits(values[nonzero], value_widths[nonzero])).tobytes()
+    return widths.tobytes() + np.packbits(nonzero).tobytes() + payload, encoded_size
+
+# ShapeShifter encoding function
+def shapeshifter_encode(data, group_size=16):
+    widths, group_lengths, encoded_size = group_widths(data, group_size)
+    values = np.asarray(data).tolist()
+    starts = range(0, len(values), group_size)
+    encoded_data = [(width, values[i:i+group_size]) for width, i in zip(widths.tolist(), starts)]
+    return encoded_data, encoded_size
+
+def shapeshifter_size(data, group_size=16, variant='baseline'):
+    # Compressed size in bits
+    return group_widths(data, group_size, variant)[2]
+
+def group_size_sweep(data, max_group_size=256, variant='baseline'):
+    """
+    Costs every power-of-two group size from 1 to `max_group_size` in one pass.
+
+    The bit width of every value is computed once. Each level of a max-pyramid then
+    halves the number of groups, the width of a group being the larger width of the
+    two groups below it, so no level goes back to the data. 'zero_bitmap' keeps a
+    matching sum-pyramid of non-zero counts.
+
+    Args:
+        data (np.ndarray): The layer values.
+        max_group_size (int): The largest group size, a power of two.
+        variant (str): One of VARIANTS.
+
+    Returns:
+        dict: Group size -> encoded size in bits, as `shapeshifter_size` computes it.
+
+    Raises:
+        ValueError: If `max_group_size` is not a power of two.
+    """
+    if max_group_size < 1 or max_group_size & (max_group_size - 1):
+        raise ValueError(f"Maximum group size {max_group_size} is not a power of two.")
+    data = np.asarray(data).astype(np.int64).ravel()
+    n = data.size
+    padded = -(-n // max_group_size) * max_group_size
+    widths = np.zeros(padded, dtype=np.uint8)
+    widths[:n] = bit_lengths(np.abs(data))
+    nonzeros = None
+    if variant == 'zero_bitmap':
+        nonzeros = np.zeros(padded, dtype=np.int64)
+        nonzeros[:n] = data != 0
+
+    curve = {}
+    group_size = 1
+    while True:
+        n_groups = -(-n // group_size)
+        # Every group is full except the last one, which only holds the remaining values
+        group_lengths = np.full(n_groups, group_size, dtype=np.int64)
+        if n_groups:
+            group_lengths[-1] = n - (n_groups - 1) * group_size
+        level_nonzeros = None if nonzeros is None else nonzeros[:n_groups]
+        curve[group_size] = variant_size(widths[:n_groups], group_lengths, level_nonzeros, variant)
+        if group_size == max_group_size:
+            return curve
+        widths = widths.reshape(-1, 2).max(axis=1)
+        if nonzeros is not None:
+            nonzeros = nonzeros.reshape(-1, 2).sum(axis=1)
+        group_size *= 2
+
+def sweep_layers(values_csv_path, sweep_file, max_group_size=256, variant='baseline'):
+    # Writes the size-vs-group-size curve of every layer and prints the per-model totals
+    curves = []
+    totals = {}
+    for row, input_array in read_layers(values_csv_path):
+        curve = group_size_sweep(input_array, max_group_size, variant)
+        curve_row = {
+            'Model_Name': row['Model Name'],
+            'Layer_Number': row['Layer Number'],
+            'Type': row['Type'],
+            'Input_Stream_Length (values)': len(input_array),
+        }
+        for group_size, bits in curve.items():
+            curve_row[f'G{group_size} (bits)'] = bits
+        curves.append(curve_row)
+
+        model_total = totals.setdefault(row['Model Name'], {'Model_Name': row['Model Name'], 'Original (bits)': 0})
+        model_total['Original (bits)'] += len(input_array)*8
+        for group_size, bits in curve.items():
+            model_total[f'G{group_size} (bits)'] = model_total.get(f'G{group_size} (bits)', 0) + bits
+
+    for model_total in totals.values():
+        sizes = {key: bits for key, bits in model_total.items() if key.startswith('G')}
+        model_total['Best_Group_Size'] = int(min(sizes, key=sizes.get).split(' ')[0][1:])
+    print_encoded_summary_table(list(totals.values()))
+    output_summary_to_csv(curves, sweep_file)
+
+def layer_counters(row, input_array, group_size=16, variant='baseline'):
+    """
+    Collects the per-layer counters of a ShapeShifter encoding.
+
+    Returns:
+        dict: Values, zero values, groups, all-zero groups, the metadata bits (width
+            fields, flags and bitmaps), the payload bits, and the number of groups of
+            every bit width.
+    """
+    widths, group_lengths, encoded_size = group_widths(input_array, group_size, variant)
+    n_groups = widths.size
+    if variant == 'zero_group':
+        metadata_bits = n_groups + int(np.count_nonzero(widths)) * WIDTH_BITS
+    elif variant == 'zero_bitmap':
+        metadata_bits = n_groups * WIDTH_BITS + int(group_lengths.sum())
+    else:
+        metadata_bits = n_groups * WIDTH_BITS
+
+    counters = {
+        'Model_Name': row['Model Name'],
+        'Layer_Number': row['Layer Number'],
+        'Type': row['Type'],
+        'Values': len(input_array),
+        'Zero_Values': int(np.count_nonzero(np.asarray(input_array) == 0)),
+        'Groups': n_groups,
+        'Zero_Groups': int(np.count_nonzero(widths == 0)),
+        'Metadata_Bits': metadata_bits,
+        'Payload_Bits': encoded_size - metadata_bits,
+    }
+    for width, n in enumerate(np.bincount(widths, minlength=9).tolist()):
+        counters[f'Width_{width}_Groups'] = n
+    return counters
+
+def read_layers(values_csv_path, timer=None):
+    # Yields (row, input_array) for every layer of the values CSV
+    timer = timer or StageTimer(enabled=False)
+    with open(values_csv_path, 'r') as csvfile:
+        csvreader = csv.reader(csvfile)
+        headers = next(csvreader)  # Read header row
+
+        while True:
+            with timer.stage('parse'):
+                row_data = next(csvreader, None)
+            if row_data is None:
+                break
+            try:
+                with timer.stage('parse'):
+                    row = {'Model Name':row_data[0] , 'Layer Number':row_data[1], 'Type':row_data[2]}
 
-    weights_csv_path = '/content/drive/MyDrive/CSCE_614/Project/weights_all_layers.csv'
-    act_csv_path = '/content/drive/MyDrive/CSCE_614/Project/activations_all_layers.csv'
+                    # Extract numeric values after the first three columns
+                    input_array = np.array(row_data[3:], dtype=np.uint8)
+            except Exception as e:
+                print(f"Error processing row: {e}")
+                continue
+            yield row, input_array
+
+def plan_layers(layers, manifest, params_hash, check_output=True, require_counters=False, timer=None):
+    """
+    Checks every layer against the run manifest.
+
+    Args:
+        layers (iterable): (row, input_array) tuples.
+        manifest (RunManifest): The manifest of the previous runs.
+        params_hash (str): `hash_params` of the run parameters.
+        check_output (bool): Also require the recorded output row to still be on disk.
+        require_counters (bool): Treat unchanged layers recorded without counters as changed.
+        timer (StageTimer, optional): Times the hashing as the 'plan' stage.
+
+    Yields:
+        dict: 'row', 'input_array', its manifest 'key', 'input_hash', and the manifest
+            'entry' if the layer is unchanged (None if it has to be encoded).
+    """
+    timer = timer or StageTimer(enabled=False)
+    for row, input_array in layers:
+        with timer.stage('plan'):
+            key = RunManifest.key(row['Model Name'], row['Layer Number'], row['Type'])
+            input_hash = hash_values(input_array)
+            entry = manifest.lookup(key, input_hash, params_hash, output_row_exists if check_output else None)
+            if entry is not None and require_counters and entry['result'].get('counters') is None:
+                entry = None
+        yield {'row': row, 'input_array': input_array, 'key': key, 'input_hash': input_hash, 'entry': entry}
+
+def encode_layer(row, input_array, estimate_args=None, variant='baseline', instrument=False):
+    """
+    Encodes one layer with ShapeShifter.
+
+    Args:
+        row (dict): The layer metadata ('Model Name', 'Layer Number', 'Type').
+        input_array (np.ndarray): The layer values.
+        estimate_args (dict, optional): Keyword arguments of `estimate_compressed_bits`.
+            When given, only a sample of the layer is encoded.
+        variant (str): One of VARIANTS.
+        instrument (bool): Also collect the layer counters and time the coding stages.
+
+    Returns:
+        dict: 'estimate' (None unless estimating), 'encoded_stream' and 'encoded_size'
+            (None when estimating), 'counters' (None unless instrumented) and 'timings'
+            (stage -> seconds, empty unless instrumented).
+    """
+    timer = StageTimer(instrument)
+    result = {'estimate': None, 'encoded_stream': None, 'encoded_size': None, 'counters': None}
+    if estimate_args is not None:
+        # Encode a random sample of blocks and extrapolate
+        with timer.stage('encode'):
+            result['estimate'] = estimate_compressed_bits(
+                input_array, lambda values: shapeshifter_size(values, variant=variant), **estimate_args)
+    else:
+        with timer.stage('encode'):
+            result['encoded_stream'], result['encoded_size'] = shapeshifter_pack(input_array, variant=variant)
+        if instrument:
+            with timer.stage('counters'):
+                result['counters'] = layer_counters(row, input_array, variant=variant)
+    result['timings'] = timer.seconds
+    return result
+
+def encode_planned(plan, estimate_args=None, variant='baseline', instrument=False):
+    # Encode stage of the asyncio pipeline: the layer of a `plan_layers` plan
+    return encode_layer(plan['row'], plan['input_array'], estimate_args, variant, instrument)
+
+def main(estimate=False, n_blocks=32, block_size=4096, confidence=0.95, seed=0, resume=True, sweep=False, max_group_size=256,
+         variant='baseline', project_dir=PROJECT_DIR, profile=False, pipeline=False, workers=1, queue_depth=QUEUE_DEPTH,
+         calibrate=False):
+
+    weights_csv_path = os.path.join(project_dir, 'weights_all_layers.csv')
+    act_csv_path = os.path.join(project_dir, 'activations_all_layers.csv')
 
     # Output file paths
-    weights_encoded_output_file = '/content/drive/MyDrive/CSCE_614/Project/shapeshifter_outputs/shapeshifter_encoded_output_weights.csv'
-    act_encoded_output_file = '/content/drive/MyDrive/CSCE_614/Project/shapeshifter_outputs/shapeshifter_encoded_output_activations.csv'
+    weights_encoded_output_file = os.path.join(project_dir, 'shapeshifter_outputs/shapeshifter_encoded_output_weights.csv')
+    act_encoded_output_file = os.path.join(project_dir, 'shapeshifter_outputs/shapeshifter_encoded_output_activations.csv')
 
     # Output CSV file paths
-    weights_summary_file = '/content/drive/MyDrive/CSCE_614/Project/shapeshifter_outputs/shapeshifter_encoded_summary_weights.csv'
-    act_summary_file = '/content/drive/MyDrive/CSCE_614/Project/shapeshifter_outputs/shapeshifter_encoded_summary_activations.csv'
+    weights_summary_file = os.path.join(project_dir, 'shapeshifter_outputs/shapeshifter_encoded_summary_weights.csv')
+    act_summary_file = os.path.join(project_dir, 'shapeshifter_outputs/shapeshifter_encoded_summary_activations.csv')
 
     file_path_dict = {
     'weights' : {'input_stream': weights_csv_path, 'encoded_output': weights_encoded_output_file, 'encoded_summary': weights_summary_file},
@@ -91,48 +502,71 @@ def main():
         encoded_output_file = file_path_dict[vtype]['encoded_output']
         csv_summary_file = file_path_dict[vtype]['encoded_summary']
 
-        # Write the header row (only once)
-        with open(encoded_output_file, mode='w', newline='') as file:
-            writer = csv.DictWriter(file, fieldnames=['Model_Name', 'Layer', 'Type', 'Encoded_Stream'])
-            writer.writeheader()
-        
-        summary_table = []
-        csv_file_out = []
-
-        # Process CSV line by line
-        with open(values_csv_path, 'r') as csvfile:
-            csvreader = csv.reader(csvfile)
-            headers = next(csvreader)  # Read header row
+        if variant != 'baseline':
+            # Variants are kept next to the baseline results
+            encoded_output_file = encoded_output_file.replace('.csv', f'_{variant}.csv')
+            csv_summary_file = csv_summary_file.replace('.csv', f'_{variant}.csv')
 
-            for row_data in csvreader:
-                try:
-                    row = {'Model Name':row_data[0] , 'Layer Number':row_data[1], 'Type':row_data[2]}
-
-                    # Extract numeric values after the first three columns
-                    input_array = np.array(row_data[3:], dtype=np.uint8)
+        if sweep:
+            # Size-vs-group-size curves only; nothing is encoded
+            sweep_layers(values_csv_path, csv_summary_file.replace('.csv', '_group_size_sweep.csv'), max_group_size, variant)
+            continue
 
+        if estimate:
+            # Estimates never overwrite the results of a full run
+            csv_summary_file = csv_summary_file.replace('.csv', '_estimated.csv')
+        else:
+            start_encoded_output(encoded_output_file, resume)
 
-                    # encode using Atalanta Encoder
-                    encoded_stream, encoded_size = shapeshifter_encode(input_array)
+        # Layers whose input and mode are unchanged since the last run are reused
+        manifest = RunManifest(os.path.splitext(csv_summary_file)[0] + '_manifest.json', resume)
+        params_hash = hash_params({'group_size': 16, 'width_bits': WIDTH_BITS, 'variant': variant, 'estimate': estimate and [n_blocks, block_size, confidence, seed, calibrate]})
 
+        summary_table = []
+        csv_file_out = []
+        estimates_by_model = {}
+        keys = []
+        counter_rows = []
+        timer = StageTimer(profile)
+        utilization = None
+
+        estimate_args = None
+        if estimate:
+            estimate_args = {'n_blocks': n_blocks, 'block_size': block_size, 'confidence': confidence, 'seed': seed,
+                             'calibrate': calibrate}
+
+        def write_result(plan, result):
+            # Records one layer's result (None if unchanged): its encoded row, manifest entry and summaries
+            row, input_array, key = plan['row'], plan['input_array'], plan['key']
+            if result is None:
+                # Unchanged since the last run: reuse the recorded summary
+                manifest.skip()
+                recorded = plan['entry']['result']
+            else:
+                for stage, seconds in result['timings'].items():
+                    timer.add(stage, seconds)
+                if result['estimate'] is not None:
+                    csv_summary = estimate_summary(row, input_array, result['estimate'])
+                    recorded = {'summary': csv_summary, 'csv_summary': csv_summary, 'estimate': result['estimate']}
+                    manifest.record(key, plan['input_hash'], params_hash, None, recorded)
+                else:
                     output_row = {
                         'Model_Name': row['Model Name'],
                         'Layer': row['Layer Number'],
                         'Type': row['Type'],
-                        'Encoded_Stream': encoded_stream,
+                        'Encoded_Stream': result['encoded_stream'].hex(),
                     }
 
                     # Append the row to the CSV file
-                    add_row_to_csv(output_row, encoded_output_file)
+                    with timer.stage('write'):
+                        offset, length = add_row_to_csv(output_row, encoded_output_file)
 
                     input_stream_length = len(input_array)
                     input_stream_length_bits = input_stream_length*8
-                    encoded_stream_length = encoded_size
+                    encoded_stream_length = result['encoded_size']
                     compression_ratio = (input_stream_length_bits)/encoded_stream_length
                     compression_percentage = (1-(1/compression_ratio))*100
 
-
-
                     output_summary = {
                         'Model_Name': row['Model Name'],
                         'Layer_Number': row['Layer Number'],
@@ -144,8 +578,6 @@ def main():
                         'Compression_Percentage': compression_percentage
                         }
 
-                    summary_table.append(output_summary)
-
                     csv_summary = {
                         'Model_Name': row['Model Name'],
                         'Layer_Number': row['Layer Number'],
@@ -157,15 +589,86 @@ def main():
                         'Compression_Percentage': compression_percentage
                         }
 
-                    csv_file_out.append(csv_summary)
-                except Exception as e:
-                    print(f"Error processing row: {e}")
-                    continue
-
+                    output = {'path': encoded_output_file, 'offset': offset, 'length': length}
+                    recorded = {'summary': output_summary, 'csv_summary': csv_summary, 'estimate': None,
+                                'counters': result['counters']}
+                    manifest.record(key, plan['input_hash'], params_hash, output, recorded)
+
+            keys.append(key)
+            if recorded['estimate'] is not None:
+                estimates_by_model.setdefault(row['Model Name'], []).append(recorded['estimate'])
+            summary_table.append(recorded['summary'])
+            csv_file_out.append(recorded['csv_summary'])
+            if profile and recorded.get('counters') is not None:
+                counter_rows.append(recorded['counters'])
+            if manifest.due():
+                manifest.save()
+
+        # Process CSV line by line, or overlap reading, encoding and writing in a pipeline
+        layers = read_layers(values_csv_path, timer)
+        planned = plan_layers(layers, manifest, params_hash, check_output=not estimate,
+                              require_counters=profile and not estimate, timer=timer)
+        try:
+            if pipeline:
+                encode = partial(encode_planned, estimate_args=estimate_args, variant=variant, instrument=profile)
+                utilization = run_pipeline(planned, encode, write_result, workers, queue_depth,
+                                           skip=lambda plan: plan['entry'] is not None)
+            else:
+                for plan in planned:
+                    try:
+                        result = None
+                        if plan['entry'] is None:
+                            result = encode_layer(plan['row'], plan['input_array'], estimate_args, variant, profile)
+                        write_result(plan, result)
+                    except Exception as e:
+                        print(f"Error processing row: {e}")
+        finally:
+            # Rows are appended as they are encoded, so the manifest can always be saved
+            manifest.save()
+        with timer.stage('write'):
+            if not estimate:
+                compact_encoded_output(encoded_output_file, manifest, keys)
+                manifest.save()
+        manifest.report(vtype)
 
         # Print the summary table
         print_encoded_summary_table(summary_table)
-        output_summary_to_csv(csv_file_out, csv_summary_file)
+        with timer.stage('write'):
+            output_summary_to_csv(csv_file_out, csv_summary_file)
+        if estimate:
+            print_model_estimates(estimates_by_model)
+        if utilization:
+            print_stage_utilization(utilization)
+        if profile:
+            # Counters and stage times go next to the summary
+            if counter_rows:
+                write_rows(counter_rows, csv_summary_file.replace('.csv', '_counters.csv'))
+            print_stage_timings(timer)
+            write_rows(timer.rows(vtype), csv_summary_file.replace('.csv', '_timings.csv'))
+            if utilization:
+                write_rows(utilization, csv_summary_file.replace('.csv', '_pipeline.csv'))
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Encode the extracted layers with ShapeShifter.")
+    parser.add_argument("--estimate", action="store_true", help="encode a random sample of blocks per layer and extrapolate")
+    parser.add_argument("--blocks", type=int, default=32, help="blocks sampled per layer in --estimate mode")
+    parser.add_argument("--block-size", type=int, default=4096, help="values per sampled block (multiple of the group size)")
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--calibrate", action="store_true",
+                        help="in --estimate mode, also encode every layer in full to measure the speedup and estimate error")
+    parser.add_argument("--no-resume", dest="resume", action="store_false", help="ignore the run manifest and recompute every layer")
+    parser.add_argument("--sweep", action="store_true", help="cost every power-of-two group size up to --max-group-size in one pass per layer")
+    parser.add_argument("--max-group-size", type=int, default=256)
+    parser.add_argument("--variant", choices=VARIANTS, default='baseline', help="ShapeShifter variant (zero-group flag or zero-value bitmap)")
+    parser.add_argument("--project-dir", default=PROJECT_DIR, help="directory holding the extracted layers and the outputs")
+    parser.add_argument("--profile", action="store_true", help="write per-layer counters and per-stage timings next to the summary")
+    parser.add_argument("--pipeline", action="store_true", help="overlap reading, encoding and writing with an asyncio pipeline")
+    parser.add_argument("--workers", type=int, default=1, help="encoder processes of the --pipeline")
+    parser.add_argument("--queue-depth", type=int, default=QUEUE_DEPTH, help="layers the --pipeline reader prefetches")
+    args = parser.parse_args()
+    main(estimate=args.estimate, n_blocks=args.blocks, block_size=args.block_size,
+         confidence=args.confidence, seed=args.seed, resume=args.resume,
+         sweep=args.sweep, max_group_size=args.max_group_size, variant=args.variant,
+         project_dir=args.project_dir, profile=args.profile, pipeline=args.pipeline, workers=args.workers,
+         queue_depth=args.queue_depth, calibrate=args.calibrate)